@@ -0,0 +1,11 @@
+# ==========================================
+# Module: Aggregator Initialization
+# File: aggregator/__init__.py
+# ==========================================
+# 🧩 模块功能：
+#   - 对外暴露增量结果聚合器与可视化渲染器注册接口；
+# ==========================================
+
+from aggregator.incremental_aggregator import IncrementalAggregator, register_renderer, RENDERERS
+
+__all__ = ["IncrementalAggregator", "register_renderer", "RENDERERS"]
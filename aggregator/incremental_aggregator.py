@@ -0,0 +1,230 @@
+# ==========================================
+# Module: Incremental Result Aggregator
+# File: aggregator/incremental_aggregator.py
+# ==========================================
+# 🧩 模块功能：
+#   - 各智能体结果到达即合并，按字段更新决策摘要而非整体重算；
+#   - 每次更新产生字段级增量（delta），可推送给界面逐步展示；
+#   - 可视化输出（地图 / 图表）按类型注册渲染器，在后台线程池中渲染（可按请求关闭）；
+#   - 渲染结果在需要时才收集，不阻塞请求线程；
+#   - 输出目录按总大小 / 文件年龄定期清理（VISUAL_MAX_BYTES / VISUAL_MAX_AGE_S）。
+# ==========================================
+
+import copy
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+VISUAL_DIR = Path(os.environ.get("VISUAL_OUTPUT_DIR", "output/visuals"))
+# 输出目录上限：总字节数（默认 200 MB）与文件最长保留时间（秒，默认 1 天），0 为不限
+VISUAL_MAX_BYTES = int(os.environ.get("VISUAL_MAX_BYTES", str(200 * 1024 * 1024)))
+VISUAL_MAX_AGE_S = float(os.environ.get("VISUAL_MAX_AGE_S", "86400"))
+# 两次清理的最小间隔（秒）
+VISUAL_PRUNE_INTERVAL = float(os.environ.get("VISUAL_PRUNE_INTERVAL", "60"))
+
+# 渲染器注册表：类型 → fn(data, out_path) -> 输出文件路径
+RENDERERS: Dict[str, Callable[[Dict[str, Any], Path], str]] = {}
+
+# 共享渲染线程池
+_RENDER_POOL = ThreadPoolExecutor(max_workers=int(os.environ.get("RENDER_WORKERS", "2")),
+                                  thread_name_prefix="render")
+
+# 意图阶段名：其字段直接合并到摘要顶层（保持原 final_summary 结构）
+PRIMARY_SOURCE = "intent"
+
+
+def register_renderer(kind: str, fn: Callable[[Dict[str, Any], Path], str]):
+    """注册可视化渲染器"""
+    RENDERERS[kind] = fn
+
+
+_last_prune = 0.0
+_prune_lock = threading.Lock()
+
+
+def prune_visuals(directory: Path = None, max_bytes: int = None, max_age: float = None) -> int:
+    """删除超过保留时间的输出文件，再按修改时间从旧到新删除直至总大小不超过上限；返回删除数"""
+    directory = Path(directory or VISUAL_DIR)
+    max_bytes = VISUAL_MAX_BYTES if max_bytes is None else max_bytes
+    max_age = VISUAL_MAX_AGE_S if max_age is None else max_age
+    files = []
+    for path in directory.glob("*"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue  # 并发删除
+        if path.is_file():
+            files.append((stat.st_mtime, stat.st_size, path))
+    files.sort()
+
+    cutoff = time.time() - max_age if max_age > 0 else None
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for mtime, size, path in files:
+        if not ((cutoff is not None and mtime < cutoff) or (max_bytes > 0 and total > max_bytes)):
+            break
+        try:
+            path.unlink()
+            removed += 1
+        except OSError:
+            pass
+        total -= size
+    return removed
+
+
+def _maybe_prune():
+    """渲染完成后按间隔触发清理（仅一个线程执行）"""
+    global _last_prune
+    now = time.monotonic()
+    if now - _last_prune < VISUAL_PRUNE_INTERVAL or not _prune_lock.acquire(blocking=False):
+        return
+    try:
+        _last_prune = now
+        removed = prune_visuals()
+        if removed:
+            print(f"[INFO] Pruned {removed} old visual outputs from {VISUAL_DIR}")
+    except Exception as e:
+        print(f"[⚠️ Aggregator] Pruning visual outputs failed: {e}")
+    finally:
+        _prune_lock.release()
+
+
+class IncrementalAggregator:
+    """增量结果聚合器（线程安全）"""
+
+    def __init__(self, request_id: str = "", render_visuals: bool = True):
+        """render_visuals=False 时忽略所有可视化请求（调用方未请求图表时不渲染、不写文件）"""
+        self.request_id = request_id or "adhoc"
+        self.render_visuals = render_visuals
+        self.summary: Dict[str, Any] = {}
+        self.version = 0
+        self._visuals: List[Tuple[str, Path, Future]] = []
+        self._lock = threading.Lock()
+
+    # -------------------------
+    # 结果合并
+    # -------------------------
+    def update(self, source: str, result: Any) -> Dict[str, Any]:
+        """
+        合并一个智能体的结果，返回本次变更的字段（delta）。
+        - 意图结果字段合并到摘要顶层；
+        - 其他智能体结果放在以阶段名为键的子字典中；
+        - 结果中的 "visuals": [{"kind", "data"}] 提交后台渲染。
+        """
+        if not isinstance(result, dict):
+            result = {"value": result}
+        visuals = result.get("visuals") or []
+        fields = {k: v for k, v in result.items() if k != "visuals"}
+
+        delta: Dict[str, Any] = {}
+        with self._lock:
+            if source == PRIMARY_SOURCE:
+                target = self.summary
+            else:
+                target = self.summary.setdefault(source, {})
+            for key, value in fields.items():
+                if target.get(key) != value:
+                    target[key] = copy.deepcopy(value)
+                    delta[key] = value
+            if delta:
+                self.version += 1
+        if source != PRIMARY_SOURCE and delta:
+            delta = {source: delta}
+
+        for spec in visuals:
+            self.request_visual(spec.get("kind", ""), spec.get("data", {}))
+        return delta
+
+    def on_stage_complete(self, name: str, stage_result: Dict[str, Any]):
+        """DAGScheduler 回调适配：成功阶段合并输出，失败阶段记录状态"""
+        if stage_result["status"] == "ok":
+            if name != "parse":
+                self.update(name, stage_result["output"])
+        elif name != "parse":
+            self.update(name, {"status": stage_result["status"], "error": stage_result["error"]})
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回当前摘要副本"""
+        with self._lock:
+            return copy.deepcopy(self.summary)
+
+    # -------------------------
+    # 可视化
+    # -------------------------
+    def request_visual(self, kind: str, data: Dict[str, Any]) -> Optional[Future]:
+        """提交一个可视化渲染任务（未启用渲染或未注册的类型忽略）"""
+        if not self.render_visuals:
+            return None
+        renderer = RENDERERS.get(kind)
+        if renderer is None:
+            print(f"[⚠️ Aggregator] No renderer registered for visual kind '{kind}'.")
+            return None
+        with self._lock:
+            out_path = VISUAL_DIR / f"{self.request_id}_{len(self._visuals)}_{kind}.png"
+            future = _RENDER_POOL.submit(self._render, renderer, copy.deepcopy(data), out_path)
+            self._visuals.append((kind, out_path, future))
+        return future
+
+    @staticmethod
+    def _render(renderer, data: Dict[str, Any], out_path: Path) -> str:
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            return renderer(data, out_path)
+        finally:
+            _maybe_prune()
+
+    def visual_futures(self) -> List[Future]:
+        """已提交的渲染任务（不等待）"""
+        with self._lock:
+            return [f for _, _, f in self._visuals]
+
+    def pending_visuals(self) -> List[str]:
+        """尚未完成的渲染任务的输出路径（完成后文件出现在该路径）"""
+        with self._lock:
+            return [str(path) for _, path, f in self._visuals if not f.done()]
+
+    def visual_outputs(self, timeout: Optional[float] = 0) -> List[str]:
+        """收集已完成的渲染结果（文件路径）；默认不等待，timeout 内未完成的跳过"""
+        futures = self.visual_futures()
+        if futures and timeout != 0:
+            wait(futures, timeout=timeout)
+        outputs = []
+        with self._lock:
+            visuals = list(self._visuals)
+        for kind, _, future in visuals:
+            if not future.done():
+                continue
+            error = future.exception()
+            if error is not None:
+                print(f"[⚠️ Aggregator] Rendering '{kind}' failed: {error}")
+                continue
+            outputs.append(future.result())
+        return outputs
+
+
+# -------------------------
+# 🎨 内置渲染器
+# -------------------------
+def render_confidence_bar(data: Dict[str, Any], out_path: Path) -> str:
+    """意图置信度条形图"""
+    from PIL import Image, ImageDraw
+
+    confidence = float(data.get("intent_confidence", 0.0) or 0.0)
+    # 默认字体不保证覆盖中文，标签仅保留 ASCII
+    label = str(data.get("explicit_intent", ""))[:60].encode("ascii", "replace").decode("ascii")
+    width, height = 480, 120
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    draw.text((12, 10), f"Intent confidence: {confidence:.2f}", fill="black")
+    draw.text((12, 30), label, fill="gray")
+    draw.rectangle((12, 60, width - 12, 90), outline="black")
+    color = "green" if confidence >= 0.7 else ("orange" if confidence >= 0.4 else "red")
+    draw.rectangle((12, 60, 12 + int((width - 24) * confidence), 90), fill=color)
+    img.save(out_path, format="PNG")
+    return str(out_path)
+
+
+register_renderer("confidence_bar", render_confidence_bar)
@@ -0,0 +1,339 @@
+# ==========================================
+# Module: Severity-aware Admission Control
+# File: app/admission.py
+# ==========================================
+# 🧩 功能概述：
+#   - 模型调用前的关键词严重度估计（火灾 / 化学品泄漏 / 被困等），零额外开销；
+#   - 有界优先级队列 + 可配置并发上限，严重度高的请求优先获得执行槽位；
+#   - 为危急请求预留槽位，常规流量无法占满全部并发；
+#   - 超出容量时：队列已满则丢弃最低优先级请求（shed），排队超时则延后（defer），
+#     均附带明确的状态提示与建议重试时间。
+#
+# 用法：
+#   severity = estimate_severity(text)
+#   with get_admission_controller().slot(severity.level):
+#       run_full_pipeline(...)
+# ==========================================
+
+import heapq
+import itertools
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from app.telemetry import Counter, Histogram, register_metric, register_collector
+
+# 严重度等级（数值越小越优先）
+CRITICAL = 0
+HIGH = 1
+NORMAL = 2
+SEVERITY_LABELS = {CRITICAL: "critical", HIGH: "high", NORMAL: "normal"}
+
+# 关键词表：英文按词边界匹配，中文按子串匹配
+_SEVERITY_KEYWORDS: Dict[int, Tuple[str, ...]] = {
+    CRITICAL: (
+        "fire", "explosion", "explode", "chemical leak", "gas leak", "toxic", "trapped", "collapse",
+        "collapsed", "unconscious", "not breathing", "cardiac", "bleeding", "drowning", "hostage",
+        "火灾", "起火", "着火", "爆炸", "泄漏", "泄露", "有毒", "被困", "坍塌", "倒塌", "昏迷", "呼吸", "溺水",
+    ),
+    HIGH: (
+        "flood", "smoke", "injury", "injured", "earthquake", "evacuate", "evacuation", "landslide",
+        "accident", "rescue", "hazard",
+        "洪水", "烟", "受伤", "地震", "疏散", "撤离", "滑坡", "事故", "救援", "危险",
+    ),
+}
+
+
+def _compile(words: Tuple[str, ...]) -> "re.Pattern[str]":
+    parts = [r"\b" + re.escape(w) + r"\b" if w.isascii() else re.escape(w) for w in words]
+    return re.compile("|".join(parts), re.IGNORECASE)
+
+
+_SEVERITY_PATTERNS = [(level, _compile(words)) for level, words in sorted(_SEVERITY_KEYWORDS.items())]
+
+
+class Severity:
+    """严重度估计结果"""
+
+    __slots__ = ("level", "keywords")
+
+    def __init__(self, level: int, keywords: List[str]):
+        self.level = level
+        self.keywords = keywords
+
+    @property
+    def label(self) -> str:
+        return SEVERITY_LABELS[self.level]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"severity": self.label, "keywords": self.keywords}
+
+
+def estimate_severity(text: Optional[str]) -> Severity:
+    """按关键词估计严重度（取命中的最高等级），无文本时为 normal"""
+    if text:
+        for level, pattern in _SEVERITY_PATTERNS:
+            found = sorted({m.group(0).lower() for m in pattern.finditer(text)})
+            if found:
+                return Severity(level, found)
+    return Severity(NORMAL, [])
+
+
+# -------------------------
+# 🚦 准入控制
+# -------------------------
+class AdmissionRejected(RuntimeError):
+    """请求未获准入：reason 为 "shed"（容量已满被丢弃）或 "deferred"（排队超时延后）"""
+
+    def __init__(self, reason: str, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """一次准入申请"""
+
+    __slots__ = ("priority", "seq", "enqueued_at", "admitted_at", "state", "event")
+
+    def __init__(self, priority: int, seq: int):
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.admitted_at: Optional[float] = None
+        self.state = "waiting"  # waiting / admitted / shed / cancelled / released
+        self.event = threading.Event()
+
+    def __lt__(self, other: "Ticket") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+ADMISSION_WAIT = Histogram("admission_wait_seconds", "Time spent queued before admission.", ["severity"])
+ADMISSION_REJECTED = Counter("admission_rejected_total", "Requests shed or deferred by admission control.",
+                             ["severity", "reason"])
+register_metric(ADMISSION_WAIT)
+register_metric(ADMISSION_REJECTED)
+
+
+class AdmissionController:
+    """有界优先级队列 + 并发槽位"""
+
+    def __init__(self,
+                 max_concurrency: int = 4,
+                 max_queue: int = 32,
+                 reserved_critical: int = 1,
+                 queue_timeouts: Optional[Dict[int, Optional[float]]] = None):
+        """
+        max_concurrency：同时执行的请求数；
+        max_queue：排队上限（满时丢弃最低优先级请求）；
+        reserved_critical：仅供 critical 使用的槽位数；
+        queue_timeouts：各等级最长排队秒数（None 表示一直等待）。
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.reserved_critical = min(max(0, reserved_critical), self.max_concurrency - 1)
+        self.queue_timeouts = queue_timeouts or {CRITICAL: None, HIGH: 60.0, NORMAL: 30.0}
+        self._queue: List[Ticket] = []
+        self._active = 0
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._service_ewma = 5.0  # 单个请求平均占用槽位的秒数（用于估计重试时间）
+        self._stats = {"admitted": 0, "shed": 0, "deferred": 0}
+
+    # -------------------------
+    # 内部实现（调用方持有锁）
+    # -------------------------
+    def _capacity_for(self, priority: int) -> int:
+        return self.max_concurrency if priority == CRITICAL else self.max_concurrency - self.reserved_critical
+
+    def _admit(self, ticket: Ticket):
+        ticket.state = "admitted"
+        ticket.admitted_at = time.monotonic()
+        self._active += 1
+        self._stats["admitted"] += 1
+        ADMISSION_WAIT.observe(ticket.admitted_at - ticket.enqueued_at, severity=SEVERITY_LABELS[ticket.priority])
+        ticket.event.set()
+
+    def _dispatch(self):
+        """按优先级放行队首请求，直到没有可用槽位"""
+        while self._queue and self._active < self._capacity_for(self._queue[0].priority):
+            self._admit(heapq.heappop(self._queue))
+
+    def _retry_after(self) -> float:
+        return round(max(1.0, self._service_ewma * (len(self._queue) + 1) / self.max_concurrency), 1)
+
+    def _reject(self, ticket: Ticket, reason: str) -> AdmissionRejected:
+        self._stats[reason] += 1
+        label = SEVERITY_LABELS[ticket.priority]
+        ADMISSION_REJECTED.inc(severity=label, reason=reason)
+        retry_after = self._retry_after()
+        if reason == "shed":
+            message = (f"System at capacity: {label}-priority request was not queued because the queue is "
+                       f"full of equal or more urgent reports. Please retry in ~{retry_after:.0f}s.")
+        else:
+            message = (f"System busy: {label}-priority request deferred after waiting "
+                       f"{time.monotonic() - ticket.enqueued_at:.0f}s. Please retry in ~{retry_after:.0f}s.")
+        return AdmissionRejected(reason, message, retry_after)
+
+    # -------------------------
+    # 公共接口
+    # -------------------------
+    def submit(self, priority: int) -> Ticket:
+        """
+        申请准入：有空闲槽位立即放行，否则入队。
+        队列已满时：新请求优先级更高则挤出队中最低优先级请求，否则直接拒绝（AdmissionRejected）。
+        """
+        with self._lock:
+            ticket = Ticket(priority, next(self._seq))
+            if not self._queue and self._active < self._capacity_for(priority):
+                self._admit(ticket)
+                return ticket
+            if len(self._queue) >= self.max_queue:
+                worst = max(self._queue) if self._queue else None
+                if worst is None or not ticket < worst:
+                    raise self._reject(ticket, "shed")
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                worst.state = "shed"
+                self._stats["shed"] += 1
+                ADMISSION_REJECTED.inc(severity=SEVERITY_LABELS[worst.priority], reason="shed")
+                worst.event.set()
+            heapq.heappush(self._queue, ticket)
+            self._dispatch()
+            return ticket
+
+    def wait(self, ticket: Ticket, timeout: Optional[float] = None) -> bool:
+        """
+        等待准入，最多 timeout 秒。
+        返回 True 表示已放行，False 表示仍在排队；
+        被挤出或超过该等级的最长排队时间时抛出 AdmissionRejected。
+        """
+        limit = self.queue_timeouts.get(ticket.priority)
+        if limit is not None:
+            remaining = ticket.enqueued_at + limit - time.monotonic()
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        ticket.event.wait(None if timeout is None else max(0.0, timeout))
+
+        with self._lock:
+            if ticket.state == "admitted":
+                return True
+            if ticket.state == "shed":
+                ticket.state = "cancelled"
+                raise self._reject_shed(ticket)
+            if limit is not None and time.monotonic() - ticket.enqueued_at >= limit:
+                self._remove(ticket)
+                raise self._reject(ticket, "deferred")
+            return False
+
+    def _reject_shed(self, ticket: Ticket) -> AdmissionRejected:
+        """被更高优先级请求挤出队列（计数已在挤出时记录）"""
+        retry_after = self._retry_after()
+        return AdmissionRejected(
+            "shed",
+            f"System at capacity: {SEVERITY_LABELS[ticket.priority]}-priority request was displaced by more "
+            f"urgent reports. Please retry in ~{retry_after:.0f}s.",
+            retry_after,
+        )
+
+    def _remove(self, ticket: Ticket):
+        if ticket in self._queue:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+        ticket.state = "cancelled"
+
+    def release(self, ticket: Ticket):
+        """释放槽位（已放行）或撤销排队（未放行）；可重复调用"""
+        with self._lock:
+            if ticket.state == "admitted":
+                ticket.state = "released"
+                self._active -= 1
+                held = time.monotonic() - ticket.admitted_at
+                self._service_ewma = 0.8 * self._service_ewma + 0.2 * held
+            elif ticket.state == "waiting":
+                self._remove(ticket)
+            self._dispatch()
+
+    def position(self, ticket: Ticket) -> int:
+        """排队位置（1 起；已放行或不在队中返回 0）"""
+        with self._lock:
+            if ticket.state != "waiting":
+                return 0
+            return 1 + sum(1 for other in self._queue if other < ticket)
+
+    @contextmanager
+    def slot(self, priority: int) -> Iterator[Ticket]:
+        """阻塞直到获得槽位（或抛出 AdmissionRejected），退出时释放"""
+        ticket = self.submit(priority)
+        try:
+            while not self.wait(ticket, timeout=1.0):
+                pass
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queued = {label: 0 for label in SEVERITY_LABELS.values()}
+            for ticket in self._queue:
+                queued[SEVERITY_LABELS[ticket.priority]] += 1
+            return {
+                **self._stats,
+                "active": self._active,
+                "queued": queued,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "reserved_critical": self.reserved_critical,
+                "avg_service_seconds": round(self._service_ewma, 3),
+            }
+
+
+def _env_timeout(name: str, default: str) -> Optional[float]:
+    value = float(os.environ.get(name, default))
+    return value if value > 0 else None
+
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    获取进程级共享准入控制器。
+    环境变量：
+      - ADMISSION_MAX_CONCURRENCY：并发执行上限（默认 4）；
+      - ADMISSION_MAX_QUEUE：排队上限（默认 32）；
+      - ADMISSION_RESERVED_CRITICAL：critical 专用槽位（默认 1）；
+      - ADMISSION_TIMEOUT_CRITICAL / _HIGH / _NORMAL：最长排队秒数（0 为不限，默认 0 / 60 / 30）。
+    """
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController(
+                max_concurrency=int(os.environ.get("ADMISSION_MAX_CONCURRENCY", "4")),
+                max_queue=int(os.environ.get("ADMISSION_MAX_QUEUE", "32")),
+                reserved_critical=int(os.environ.get("ADMISSION_RESERVED_CRITICAL", "1")),
+                queue_timeouts={
+                    CRITICAL: _env_timeout("ADMISSION_TIMEOUT_CRITICAL", "0"),
+                    HIGH: _env_timeout("ADMISSION_TIMEOUT_HIGH", "60"),
+                    NORMAL: _env_timeout("ADMISSION_TIMEOUT_NORMAL", "30"),
+                },
+            )
+        return _controller
+
+
+def _admission_collector():
+    """/metrics 抓取时导出当前并发与排队深度（控制器尚未创建时不导出）"""
+    if _controller is None:
+        return []
+    stats = _controller.stats()
+    return [
+        ("admission_active", "gauge", "Requests currently holding an execution slot.", [({}, stats["active"])]),
+        ("admission_queued", "gauge", "Requests waiting for a slot by severity.",
+         [({"severity": label}, count) for label, count in stats["queued"].items()]),
+    ]
+
+
+register_collector(_admission_collector)
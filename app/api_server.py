@@ -0,0 +1,271 @@
+# ==========================================
+# Module: Headless API Server
+# File: app/api_server.py
+# ==========================================
+# 🧩 功能概述：
+#   - 无界面的 HTTP/JSON 入口，直接暴露 run_full_pipeline，不导入 Gradio；
+#   - 重型依赖（numpy / PIL / pydub / openai / httpx）仅在对应模态或首次模型调用时才导入；
+#   - 启动时测量并报告冷启动耗时（进程启动 → 可接收请求），/healthz 可查询；
+#   - 同端口提供 /metrics（Prometheus 文本格式）；
+#   - 经准入控制排队（按文本严重度优先），被丢弃 / 延后时返回 503 + Retry-After；
+#   - PIPELINE_WORKERS > 0 时请求交给预热的工作进程池执行，/healthz 附带进程池状态；
+#   - /v1/incidents 查询事件库中的历史记录（category / last_minutes / min_confidence / q / limit），
+#     /v1/incidents/<request_id> 返回单条完整记录。
+#
+# 用法：
+#   python -m app.api_server --host 0.0.0.0 --port 8080
+#   curl -X POST localhost:8080/v1/pipeline -d '{"text": "Fire on floor 3, two people trapped"}'
+#   curl "localhost:8080/v1/incidents?category=chemical_leak&last_minutes=60"
+#
+# 请求体字段：text / image_base64 / audio_base64（+ audio_format）/ api_key / deadline_s / visuals（是否渲染图表，默认否）；
+# image / audio 为服务器本地路径，仅在 API_ALLOW_LOCAL_PATHS=1 时接受。
+# ==========================================
+
+import time
+
+_MODULE_START = time.perf_counter()
+
+import argparse
+import base64
+import binascii
+import json
+import os
+import tempfile
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+from app.admission import AdmissionRejected
+
+API_HOST = os.environ.get("API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("API_PORT", "8080"))
+MAX_BODY_BYTES = int(os.environ.get("API_MAX_BODY_BYTES", str(32 * 1024 * 1024)))
+ALLOW_LOCAL_PATHS = os.environ.get("API_ALLOW_LOCAL_PATHS", "0") in ("1", "true", "True")
+
+# 启动耗时报告（main 中填充）
+STARTUP: Dict[str, Optional[float]] = {}
+
+
+class BadRequest(ValueError):
+    """请求内容不合法（返回 400）"""
+
+
+def _process_age() -> Optional[float]:
+    """进程自创建以来的秒数（含解释器启动，仅 Linux /proc 可用）"""
+    try:
+        with open("/proc/self/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        start_ticks = int(fields[19])  # 第 22 个字段 starttime（去掉 pid 与 comm 后的下标 19）
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return round(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 3)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _decode_b64(value: str, field: str) -> bytes:
+    if "," in value[:100] and value.startswith("data:"):  # data URL
+        value = value.split(",", 1)[1]
+    try:
+        return base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        raise BadRequest(f"'{field}' is not valid base64")
+
+
+def _local_path(value: Any, field: str) -> Optional[str]:
+    if value is None:
+        return None
+    if not ALLOW_LOCAL_PATHS:
+        raise BadRequest(f"'{field}' local paths are disabled; send '{field}_base64' instead")
+    if not Path(str(value)).is_file():
+        raise BadRequest(f"'{field}' file not found: {value}")
+    return str(value)
+
+
+def build_inputs(body: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    将请求体转换为 run_full_pipeline 的输入。
+    返回 (输入字典, 需在请求结束后删除的临时文件路径)。
+    """
+    text = body.get("text")
+    if text is not None and not isinstance(text, str):
+        raise BadRequest("'text' must be a string")
+
+    image = _local_path(body.get("image"), "image")
+    if body.get("image_base64"):
+        # parse_image 支持 {"data": bytes} 形式，无需落盘
+        image = {"data": _decode_b64(body["image_base64"], "image_base64"),
+                 "name": body.get("image_name", "uploaded_image")}
+
+    audio = _local_path(body.get("audio"), "audio")
+    temp_audio = None
+    if body.get("audio_base64"):
+        # 音频解析按文件路径读取，写入临时文件（解析时会复制进媒体库）
+        data = _decode_b64(body["audio_base64"], "audio_base64")
+        suffix = "." + str(body.get("audio_format", "wav")).lstrip(".").lower()
+        fd, temp_audio = tempfile.mkstemp(suffix=suffix, prefix="api-audio-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        audio = temp_audio
+
+    if not (text or image is not None or audio):
+        raise BadRequest("Provide at least one of text / image / audio")
+    return {"text": text, "image": image, "audio": audio}, temp_audio
+
+
+class PipelineHandler(BaseHTTPRequestHandler):
+    """/v1/pipeline · /v1/incidents · /healthz · /metrics"""
+
+    server_version = "EmergencyPipelineAPI/1.0"
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/healthz":
+            from app.worker_pool import worker_pool_enabled, get_worker_pool
+            payload = {"status": "ok", "startup": STARTUP,
+                       "uptime_seconds": round(time.perf_counter() - _MODULE_START, 3)}
+            if worker_pool_enabled():
+                payload["workers"] = get_worker_pool().health()
+            self._send_json(200, payload)
+        elif path == "/metrics":
+            from app.telemetry import render_prometheus
+            body = render_prometheus().encode("utf-8")
+            self._send(200, body, "text/plain; version=0.0.4; charset=utf-8")
+        elif path == "/v1/incidents" or path.startswith("/v1/incidents/"):
+            self._handle_incidents(path)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _handle_incidents(self, path: str):
+        from urllib.parse import parse_qs, unquote
+        from app.incident_store import get_incident_store
+        store = get_incident_store()
+        if store is None:
+            self._send_json(404, {"error": "incident store is disabled"})
+            return
+        if path.startswith("/v1/incidents/"):
+            record = store.get(unquote(path[len("/v1/incidents/"):]))
+            if record is None:
+                self._send_json(404, {"error": "incident not found"})
+            else:
+                self._send_json(200, record)
+            return
+        params = {k: v[-1] for k, v in parse_qs(self.path.partition("?")[2]).items()}
+        try:
+            records = store.query(
+                category=params.get("category"),
+                last_seconds=float(params["last_minutes"]) * 60 if params.get("last_minutes") else None,
+                min_confidence=float(params["min_confidence"]) if params.get("min_confidence") else None,
+                tier=params.get("tier"),
+                text_contains=params.get("q"),
+                limit=min(int(params.get("limit", 100)), 1000),
+            )
+        except ValueError as e:
+            self._send_json(400, {"error": f"invalid query parameter: {e}"})
+            return
+        self._send_json(200, {"count": len(records), "incidents": records})
+
+    def do_POST(self):
+        if self.path.split("?")[0] != "/v1/pipeline":
+            self._send_json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {"error": f"request body exceeds {MAX_BODY_BYTES} bytes"})
+            return
+
+        temp_audio = None
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(body, dict):
+                raise BadRequest("request body must be a JSON object")
+            inputs, temp_audio = build_inputs(body)
+            api_key = body.get("api_key") or self._bearer_token()
+            kwargs = {"deadline_s": float(body["deadline_s"])} if body.get("deadline_s") else {}
+            if body.get("visuals"):
+                kwargs["visuals"] = True  # 图表仅在请求时渲染（写入服务端 VISUAL_OUTPUT_DIR）
+
+            from app.pipeline import run_full_pipeline
+            from app.admission import estimate_severity, get_admission_controller
+            from app.worker_pool import worker_pool_enabled, get_worker_pool
+            run = get_worker_pool().run if worker_pool_enabled() else run_full_pipeline
+            severity = estimate_severity(inputs["text"])
+            with get_admission_controller().slot(severity.level):
+                result = run(api_key=api_key, **inputs, **kwargs)
+            self._send_json(200, {**result, "severity": severity.to_dict()})
+        except (BadRequest, json.JSONDecodeError) as e:
+            self._send_json(400, {"error": str(e)})
+        except AdmissionRejected as e:
+            headers = {"Retry-After": str(max(1, round(e.retry_after)))} if e.retry_after else {}
+            self._send_json(503, {"error": str(e), "reason": e.reason}, headers)
+        except Exception as e:
+            print(f"[⚠️ APIServer] Pipeline failed: {e}")
+            self._send_json(500, {"error": str(e)})
+        finally:
+            if temp_audio:
+                Path(temp_audio).unlink(missing_ok=True)
+
+    def _bearer_token(self) -> Optional[str]:
+        auth = self.headers.get("Authorization", "")
+        if auth.lower().startswith("bearer "):
+            return auth[7:].strip() or None
+        return None
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        self._send(status, json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"),
+                   "application/json; charset=utf-8", headers)
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_server(host: str = API_HOST, port: int = API_PORT) -> ThreadingHTTPServer:
+    """导入 pipeline 并创建服务（记录各阶段启动耗时）"""
+    import_start = time.perf_counter()
+    import app.pipeline  # noqa: F401  仅加载轻量依赖；重型依赖按需导入
+    import_seconds = time.perf_counter() - import_start
+
+    server = ThreadingHTTPServer((host, port), PipelineHandler)
+    server.daemon_threads = True
+    STARTUP.update({
+        "pipeline_import_seconds": round(import_seconds, 3),
+        "module_to_ready_seconds": round(time.perf_counter() - _MODULE_START, 3),
+        "process_to_ready_seconds": _process_age(),
+    })
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless HTTP/JSON entry point for the pipeline (no Gradio).")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port)
+    from app.worker_pool import worker_pool_enabled, get_worker_pool
+    if worker_pool_enabled():
+        get_worker_pool()  # 后台预热工作进程
+    from app.log_sink import log_event
+    log_event("server_start", entry="api_server", **STARTUP)
+    print(f"[INFO] API server ready on http://{args.host}:{args.port} "
+          f"(startup {STARTUP['process_to_ready_seconds']}s total, "
+          f"{STARTUP['pipeline_import_seconds']}s importing the pipeline)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# ==========================================
+# Module: Batch Pipeline Runner
+# File: app/batch_runner.py
+# ==========================================
+# 🧩 功能概述：
+#   - 以流式方式读取 JSONL 事件流，逐条执行 run_full_pipeline；
+#   - 有界并发（线程池 + 固定大小在途窗口），内存占用与文件大小无关；
+#   - 结果按输入顺序增量写入输出 JSONL；
+#   - 检查点记录已完成的输入偏移，崩溃后可断点续跑。
+#
+# 用法：
+#   python -m app.batch_runner requests.jsonl output/batch/results.jsonl --concurrency 8
+# ==========================================
+
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+from app.pipeline import run_full_pipeline
+
+
+def iter_jsonl(path: str, start_offset: int = 0) -> Iterator[Tuple[int, Optional[Dict[str, Any]], str]]:
+    """
+    流式读取 JSONL。
+    逐条返回 (该行结束处的字节偏移, 解析后的记录或 None, 解析错误信息)。
+    """
+    with open(path, "rb") as f:
+        f.seek(start_offset)
+        for raw in iter(f.readline, b""):
+            end_offset = f.tell()
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                yield end_offset, json.loads(line), ""
+            except ValueError as e:
+                yield end_offset, None, f"Invalid JSON: {e}"
+
+
+def record_to_inputs(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    将事件记录映射为 pipeline 输入。
+    支持 text/image/audio 字段；无 text 时使用 title + body（兼容 requests.jsonl 格式）。
+    """
+    text = record.get("text")
+    if not text:
+        text = "\n".join(part for part in (record.get("title"), record.get("body")) if part)
+    return {
+        "text": text,
+        "image": record.get("image"),
+        "audio": record.get("audio"),
+    }
+
+
+class BatchRunner:
+    """JSONL 批量执行器"""
+
+    def __init__(self,
+                 input_path: str,
+                 output_path: str,
+                 concurrency: int = 4,
+                 api_key: str = None):
+        self.input_path = input_path
+        self.output_path = Path(output_path)
+        self.checkpoint_path = Path(f"{output_path}.ckpt")
+        self.concurrency = max(1, concurrency)
+        self.api_key = api_key
+
+    # -------------------------
+    # 检查点
+    # -------------------------
+    def _load_checkpoint(self) -> Dict[str, int]:
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"input_offset": 0, "output_bytes": 0, "records": 0}
+
+    def _save_checkpoint(self, state: Dict[str, int]):
+        tmp_path = self.checkpoint_path.with_suffix(".ckpt.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    # -------------------------
+    # 单条执行
+    # -------------------------
+    def _process(self, record: Optional[Dict[str, Any]], parse_error: str) -> Dict[str, Any]:
+        if record is None:
+            return {"status": "error", "error": parse_error}
+        start = time.perf_counter()
+        try:
+            result = run_full_pipeline(api_key=self.api_key, **record_to_inputs(record))
+            status, error = "ok", ""
+        except Exception as e:
+            result, status, error = None, "error", str(e)
+        out = {
+            "request_id": record.get("request_id"),
+            "status": status,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+            "result": result,
+        }
+        if error:
+            out["error"] = error
+        return out
+
+    # -------------------------
+    # 主流程
+    # -------------------------
+    def run(self, resume: bool = True) -> Dict[str, int]:
+        """
+        执行批处理。
+        resume=True 时从检查点恢复：截断输出中检查点之后的残留行，并从对应输入偏移继续。
+        """
+        state = self._load_checkpoint() if resume else {"input_offset": 0, "output_bytes": 0, "records": 0}
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        if not self.output_path.exists():
+            self.output_path.touch()
+        with open(self.output_path, "r+b") as out:
+            out.truncate(state["output_bytes"])
+
+        print(f"[BatchRunner] Start at offset {state['input_offset']} "
+              f"({state['records']} records done, concurrency={self.concurrency})")
+
+        window = self.concurrency * 2
+        pending = deque()  # (输入行结束偏移, 任务 Future)，按输入顺序
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool, \
+                open(self.output_path, "ab") as out:
+
+            def drain_one():
+                end_offset, future = pending.popleft()
+                line = json.dumps(future.result(), ensure_ascii=False) + "\n"
+                out.write(line.encode("utf-8"))
+                out.flush()
+                state["input_offset"] = end_offset
+                state["output_bytes"] = out.tell()
+                state["records"] += 1
+                self._save_checkpoint(state)
+
+            for end_offset, record, parse_error in iter_jsonl(self.input_path, state["input_offset"]):
+                pending.append((end_offset, pool.submit(self._process, record, parse_error)))
+                if len(pending) >= window:
+                    drain_one()
+            while pending:
+                drain_one()
+
+        print(f"[BatchRunner] Done: {state['records']} records → {self.output_path}")
+        return state
+
+
+def run_batch(input_path: str, output_path: str, concurrency: int = 4,
+              api_key: str = None, resume: bool = True) -> Dict[str, int]:
+    """统一模块接口"""
+    return BatchRunner(input_path, output_path, concurrency=concurrency, api_key=api_key).run(resume=resume)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the pipeline over a JSONL incident feed.")
+    parser.add_argument("input", help="Input JSONL file")
+    parser.add_argument("output", help="Output JSONL file (checkpoint stored at <output>.ckpt)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Max in-flight pipeline runs")
+    parser.add_argument("--api-key", default=None, help="API key (defaults to OPENAI_API_KEY)")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore checkpoint and start over")
+    args = parser.parse_args()
+    run_batch(args.input, args.output, concurrency=args.concurrency,
+              api_key=args.api_key, resume=not args.no_resume)
+
+
+if __name__ == "__main__":
+    main()
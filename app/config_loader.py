@@ -5,7 +5,8 @@
 # 🧩 功能概述：
 #   - 动态、安全地加载 OpenAI API Key；
 #   - 支持用户输入与系统环境变量两种方式；
-#   - 确保 key 仅存储于内存环境中，不写入磁盘。
+#   - 确保 key 仅存储于内存环境中，不写入磁盘；
+#   - resolve_api_key 无副作用，供多会话并发场景按请求解析 key。
 # ==========================================
 
 import os
@@ -25,3 +26,18 @@ def load_api_key(user_key: str = None) -> str:
         return os.environ["OPENAI_API_KEY"]
 
     raise EnvironmentError("❌ Missing OpenAI API Key. Please input or set environment variable.")
+
+
+def resolve_api_key(user_key: str = None) -> str:
+    """
+    解析 OpenAI API Key（无副作用版本）。
+    不写入 os.environ，避免不同会话的 key 相互覆盖。
+    """
+    if user_key:
+        return user_key
+
+    env_key = os.environ.get("OPENAI_API_KEY")
+    if env_key:
+        return env_key
+
+    raise EnvironmentError("❌ Missing OpenAI API Key. Please input or set environment variable.")
@@ -0,0 +1,299 @@
+# ==========================================
+# Module: Incident Store
+# File: app/incident_store.py
+# ==========================================
+# 🧩 功能概述：
+#   - 持久化记录每次 pipeline 的结果（SQLite，WAL 模式）：request_id、时间、输入概览、
+#     媒体摘要、意图字段、置信度、作答层级、事件类别及完整摘要 JSON；
+#   - 写入经后台线程批量提交（按条数 / 时间间隔），不阻塞请求；
+#   - 时间、(类别, 时间)、置信度、request_id 建立索引，
+#     "最近一小时的所有化学品泄漏事件" 在百万行规模下为毫秒级查询；
+#   - 提供查询接口，供界面历史页与脚本使用。
+#
+# 环境变量：INCIDENT_DB_PATH（默认 output/incidents.db，为空则不记录）、
+#           INCIDENT_BATCH_SIZE（默认 200）、INCIDENT_FLUSH_INTERVAL（秒，默认 0.5）。
+# ==========================================
+
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from planner.fast_intent import classify_intent
+
+DB_PATH = os.environ.get("INCIDENT_DB_PATH", "output/incidents.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    id                  INTEGER PRIMARY KEY,
+    request_id          TEXT NOT NULL,
+    ts                  REAL NOT NULL,
+    input_summary       TEXT,
+    text                TEXT,
+    image_digest        TEXT,
+    audio_digest        TEXT,
+    category            TEXT,
+    explicit_intent     TEXT,
+    implicit_intent     TEXT,
+    environment_context TEXT,
+    intent_confidence   REAL,
+    intent_tier         TEXT,
+    summary_json        TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_incidents_ts ON incidents (ts);
+CREATE INDEX IF NOT EXISTS idx_incidents_category_ts ON incidents (category, ts);
+CREATE INDEX IF NOT EXISTS idx_incidents_confidence ON incidents (intent_confidence);
+CREATE INDEX IF NOT EXISTS idx_incidents_request_id ON incidents (request_id);
+"""
+
+_COLUMNS = ("request_id", "ts", "input_summary", "text", "image_digest", "audio_digest", "category",
+            "explicit_intent", "implicit_intent", "environment_context", "intent_confidence", "intent_tier",
+            "summary_json")
+_INSERT = f"INSERT INTO incidents ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})"
+
+_STOP = object()
+
+
+def incident_category(intent: Dict[str, Any], text: str = "") -> str:
+    """
+    事件类别：本地分类器已给出时直接使用；
+    否则先对原始报告文本做规则分类（微秒级），文本无法判断时再用模型给出的意图字段。
+    """
+    if intent.get("category"):
+        return intent["category"]
+    category = classify_intent(text)["category"]
+    if category == "unknown":
+        fields = " ".join(str(intent.get(k, "")) for k in ("explicit_intent", "environment_context"))
+        category = classify_intent(fields)["category"]
+    return category
+
+
+def escape_like(value: str) -> str:
+    """转义 LIKE 模式中的特殊字符（配合 ESCAPE '\\' 使用）"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class IncidentStore:
+    """SQLite 事件库：后台批量写入 + 多线程只读查询"""
+
+    def __init__(self, path: str = DB_PATH, batch_size: int = 200, flush_interval: float = 0.5):
+        self.path = str(path)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        conn.close()
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._local = threading.local()
+        self._stats = {"recorded": 0, "written": 0, "batches": 0, "write_errors": 0}
+        self._stats_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._write_loop, name="incident-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # WAL 下仅检查点时 fsync
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # -------------------------
+    # 写入
+    # -------------------------
+    def record(self, request_id: str, multimodal_data: Dict[str, Any], intent: Dict[str, Any],
+               summary: Optional[Dict[str, Any]] = None, ts: Optional[float] = None):
+        """记录一次结果（仅入队，由后台线程批量写入）"""
+        text = multimodal_data.get("text", {}).get("text_content", "")
+        confidence = intent.get("intent_confidence")
+        row = (
+            request_id,
+            ts if ts is not None else time.time(),
+            multimodal_data.get("input_summary", ""),
+            text,
+            multimodal_data.get("image", {}).get("image_digest"),
+            multimodal_data.get("audio", {}).get("audio_digest"),
+            incident_category(intent, text),
+            intent.get("explicit_intent"),
+            intent.get("implicit_intent"),
+            intent.get("environment_context"),
+            float(confidence) if isinstance(confidence, (int, float)) else None,
+            intent.get("intent_tier"),
+            json.dumps(summary if summary is not None else intent, ensure_ascii=False, default=str),
+        )
+        with self._stats_lock:
+            self._stats["recorded"] += 1
+        self._queue.put(row)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待已入队的记录全部落盘"""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join(5.0)
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            item = self._queue.get()
+            batch, waiters, stop = [], [], False
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stop or waiters or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(conn, batch)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                conn.close()
+                return
+
+    def _write(self, conn: sqlite3.Connection, rows: List[Tuple]):
+        try:
+            with conn:
+                conn.executemany(_INSERT, rows)
+            with self._stats_lock:
+                self._stats["written"] += len(rows)
+                self._stats["batches"] += 1
+        except sqlite3.Error as e:
+            with self._stats_lock:
+                self._stats["write_errors"] += len(rows)
+            print(f"[⚠️ IncidentStore] Failed to write {len(rows)} records: {e}")
+
+    # -------------------------
+    # 查询
+    # -------------------------
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def query(self,
+              category: Optional[str] = None,
+              since: Optional[float] = None,
+              until: Optional[float] = None,
+              last_seconds: Optional[float] = None,
+              min_confidence: Optional[float] = None,
+              max_confidence: Optional[float] = None,
+              tier: Optional[str] = None,
+              text_contains: Optional[str] = None,
+              limit: int = 100,
+              include_summary: bool = False) -> List[Dict[str, Any]]:
+        """
+        按条件查询，结果按时间倒序。
+        since / until 为 Unix 时间戳；last_seconds 为"最近 N 秒"的简写。
+        category / 时间 / 置信度条件走索引；text_contains 为子串匹配（需扫描，宜配合时间条件）。
+        """
+        if last_seconds is not None:
+            since = time.time() - last_seconds
+        clauses, params = [], []
+        for clause, value in (("category = ?", category), ("ts >= ?", since), ("ts < ?", until),
+                              ("intent_confidence >= ?", min_confidence),
+                              ("intent_confidence <= ?", max_confidence), ("intent_tier = ?", tier)):
+            if value is not None and value != "":
+                clauses.append(clause)
+                params.append(value)
+        if text_contains:
+            # 按字面子串匹配：转义 LIKE 通配符 % / _ 及转义符本身
+            clauses.append("(text LIKE ? ESCAPE '\\' OR explicit_intent LIKE ? ESCAPE '\\')")
+            params.extend([f"%{escape_like(text_contains)}%"] * 2)
+
+        columns = [c for c in _COLUMNS if include_summary or c != "summary_json"]
+        sql = f"SELECT id, {', '.join(columns)} FROM incidents"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY ts DESC LIMIT ?"
+        params.append(int(limit))
+
+        rows = []
+        for row in self._reader().execute(sql, params):
+            record = dict(row)
+            if include_summary and record.get("summary_json"):
+                record["summary"] = json.loads(record.pop("summary_json"))
+            rows.append(record)
+        return rows
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """按 request_id 取单条记录（含完整摘要）"""
+        row = self._reader().execute(
+            f"SELECT id, {', '.join(_COLUMNS)} FROM incidents WHERE request_id = ? ORDER BY ts DESC LIMIT 1",
+            (request_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record["summary"] = json.loads(record.pop("summary_json") or "{}")
+        return record
+
+    def count_by_category(self, last_seconds: Optional[float] = None) -> Dict[str, int]:
+        """各类别事件数（可限定最近 N 秒）"""
+        sql, params = "SELECT category, COUNT(*) FROM incidents", []
+        if last_seconds is not None:
+            sql += " WHERE ts >= ?"
+            params.append(time.time() - last_seconds)
+        sql += " GROUP BY category"
+        return {category or "unknown": n for category, n in self._reader().execute(sql, params)}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["pending"] = self._queue.qsize()
+        stats["path"] = self.path
+        return stats
+
+
+# -------------------------
+# 🔧 全局默认实例（环境变量配置）
+# -------------------------
+_default_store: Optional[IncidentStore] = None
+_default_lock = threading.Lock()
+
+
+def get_incident_store() -> Optional[IncidentStore]:
+    """获取进程级共享事件库（INCIDENT_DB_PATH 为空时返回 None）"""
+    global _default_store
+    if not DB_PATH:
+        return None
+    with _default_lock:
+        if _default_store is None:
+            _default_store = IncidentStore(
+                DB_PATH,
+                batch_size=int(os.environ.get("INCIDENT_BATCH_SIZE", "200")),
+                flush_interval=float(os.environ.get("INCIDENT_FLUSH_INTERVAL", "0.5")),
+            )
+            atexit.register(_default_store.close)
+        return _default_store
+
+
+def record_incident(request_id: str, multimodal_data: Dict[str, Any], intent: Dict[str, Any],
+                    summary: Optional[Dict[str, Any]] = None):
+    """记录一次 pipeline 结果（未启用或失败时不影响主流程）"""
+    try:
+        store = get_incident_store()
+        if store is not None:
+            store.record(request_id, multimodal_data, intent, summary)
+    except Exception as e:
+        print(f"[⚠️ IncidentStore] Record skipped: {e}")
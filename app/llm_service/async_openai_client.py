@@ -0,0 +1,114 @@
+# ==========================================
+# Module: Async OpenAI GPT Client
+# File: app/llm_service/async_openai_client.py
+# ==========================================
+# 🧩 模块功能：
+#   - asyncio 原生的 GPT 调用实现（OpenAI 兼容 chat/completions 接口）；
+#   - 同一事件循环内共享 keep-alive HTTP 连接池；
+#   - 凭证随每个请求的 Header 传递，不写入任何全局状态；
+#   - 通过信号量限制并发中的请求数量；
+#   - httpx 在首次建立连接池时才导入，不拖慢进程冷启动；
+#   - 调用计时、token 用量计入 telemetry。
+# ==========================================
+
+import asyncio
+import weakref
+from typing import Dict, Any, Optional
+
+from app.llm_service.base_client import AsyncBaseLLMClient
+from app.llm_service.openai_client import DEFAULT_API_BASE, SYSTEM_PROMPT
+from app.config_loader import resolve_api_key
+from app.telemetry import span, record_tokens
+
+# 默认连接池 / 并发配置
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE = 20
+DEFAULT_MAX_CONCURRENCY = 64
+DEFAULT_TIMEOUT = 60.0
+
+
+class _LoopPool:
+    """单个事件循环内共享的 HTTP 连接池与并发信号量"""
+
+    def __init__(self, max_connections: int, max_keepalive: int, max_concurrency: int, timeout: float):
+        import httpx
+
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+            ),
+            timeout=timeout,
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+
+# 连接池与事件循环绑定；循环被回收时连接池引用随之释放
+_POOLS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopPool]" = weakref.WeakKeyDictionary()
+
+
+def _get_pool(max_connections: int, max_keepalive: int, max_concurrency: int, timeout: float) -> _LoopPool:
+    """获取当前事件循环的共享连接池（首次调用时创建，以首个配置为准）"""
+    loop = asyncio.get_running_loop()
+    pool = _POOLS.get(loop)
+    if pool is None:
+        pool = _LoopPool(max_connections, max_keepalive, max_concurrency, timeout)
+        _POOLS[loop] = pool
+    return pool
+
+
+async def aclose_pool():
+    """关闭当前事件循环的共享连接池（应用退出时调用）"""
+    pool = _POOLS.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool.client.aclose()
+
+
+class AsyncOpenAIClient(AsyncBaseLLMClient):
+    """基于 httpx.AsyncClient 的异步 GPT 调用实现"""
+
+    def __init__(self,
+                 api_key: str = None,
+                 model_name: str = "gpt-4o",
+                 temperature: float = 0.3,
+                 api_base: str = None,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 max_keepalive: int = DEFAULT_MAX_KEEPALIVE,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 timeout: float = DEFAULT_TIMEOUT):
+        super().__init__(resolve_api_key(api_key), temperature)
+        self.api_base = (api_base or DEFAULT_API_BASE).rstrip("/")
+        self.model_name = model_name
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+
+    def _payload(self, prompt: str) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "temperature": self.temperature,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+        }
+
+    async def send_request(self, prompt: str, api_key: Optional[str] = None) -> str:
+        """
+        异步发送 prompt 并返回原始模型响应文本。
+        api_key 可按请求覆盖实例凭证。
+        """
+        pool = _get_pool(self.max_connections, self.max_keepalive, self.max_concurrency, self.timeout)
+        headers = {"Authorization": f"Bearer {api_key or self.api_key}"}
+        with span("send_request", model=self.model_name):
+            async with pool.semaphore:
+                response = await pool.client.post(
+                    f"{self.api_base}/chat/completions",
+                    json=self._payload(prompt),
+                    headers=headers,
+                )
+            response.raise_for_status()
+        data = response.json()
+        record_tokens(self.model_name, data.get("usage"))
+        return data["choices"][0]["message"]["content"].strip()
@@ -4,11 +4,111 @@
 # ==========================================
 # 🧩 模块功能：
 #   - 提供统一的大模型客户端抽象；
-#   - 所有模型适配器需继承此类并实现 send_request。
+#   - 所有模型适配器需继承此类并实现 send_request；
+#   - 支持流式输出的适配器可覆盖 stream_request；
+#   - send_with_policy：截止时间内的抖动指数退避重试与对冲请求；
+#     仅重试暂时性错误（超时 / 连接错误 / 429 / 5xx），鉴权、参数等错误立即抛出；
+#   - stream_with_policy：流式请求的同一策略——首段输出前可重试 / 对冲，之后按剩余截止时间限时；
+#   - AsyncBaseLLMClient 为 asyncio 原生变体（async send_request / send_with_policy，策略相同）。
 # ==========================================
 
+import asyncio
+import os
+import queue
+import random
+import sys
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+from contextvars import copy_context
+from typing import Dict, Any, Iterator, Optional, Union, Deque, Tuple
+
+from app.llm_service.json_extract import parse_json_response
+
+# 重试 / 对冲默认配置（环境变量可覆盖）
+DEFAULT_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+DEFAULT_BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", "0.2"))
+DEFAULT_BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", "2.0"))
+# 对冲延迟：空 = 关闭；数字 = 固定秒数；"p95" = 按该客户端历史 p95 延迟
+DEFAULT_HEDGE_AFTER = os.environ.get("LLM_HEDGE_AFTER", "") or None
+# 对冲至少需要的历史样本数
+_HEDGE_MIN_SAMPLES = 10
+
+# 请求执行线程池：超时 / 被对冲淘汰的调用在后台自然结束，不阻塞调用方
+_CALL_POOL = ThreadPoolExecutor(max_workers=int(os.environ.get("LLM_CALL_WORKERS", "32")),
+                                thread_name_prefix="llm-call")
+
+# 各客户端 (类名, 模型名) 的最近成功延迟，用于 p95 对冲
+_LATENCIES: Dict[Tuple[str, str], Deque[float]] = {}
+_LATENCY_LOCK = threading.Lock()
+
+
+class DeadlineExceeded(TimeoutError):
+    """请求截止时间已到"""
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    是否为值得重试的暂时性错误：超时、连接错误、限流（429）、服务端错误（5xx）。
+    鉴权失败、请求参数错误、cassette 未命中等重试无意义，直接失败。
+    openai / httpx 仅在已被导入时才参与判断（不为此导入）。
+    """
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    openai_error = sys.modules.get("openai.error")
+    if openai_error is not None and isinstance(error, (
+            openai_error.Timeout, openai_error.APIConnectionError, openai_error.RateLimitError,
+            openai_error.ServiceUnavailableError, openai_error.TryAgain)):
+        return True
+    httpx = sys.modules.get("httpx")
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return True
+    status = getattr(error, "http_status", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _submit(fn, *args) -> Future:
+    """提交到调用线程池，并携带当前上下文（如 request_id）"""
+    return _CALL_POOL.submit(copy_context().run, fn, *args)
+
+
+class _StreamAttempt:
+    """在调用线程池中消费一路流式请求，片段 / 结束 / 异常以 (序号, 类型, 内容) 放入共享队列"""
+
+    def __init__(self, client: "BaseLLMClient", prompt: str, events: "queue.Queue", index: int):
+        self.index = index
+        self.cancelled = threading.Event()
+        _submit(self._run, client, prompt, events)
+
+    def _run(self, client: "BaseLLMClient", prompt: str, events: "queue.Queue"):
+        stream = None
+        try:
+            stream = client.stream_request(prompt)
+            for delta in stream:
+                if self.cancelled.is_set():
+                    return
+                events.put((self.index, "chunk", delta))
+            events.put((self.index, "done", None))
+        except Exception as e:
+            events.put((self.index, "error", e))
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+
+    def cancel(self):
+        self.cancelled.set()
+
 
 class BaseLLMClient(ABC):
     """统一大模型调用接口"""
@@ -22,17 +122,291 @@ class BaseLLMClient(ABC):
         """发送请求到 LLM 并返回原始响应文本"""
         pass
 
+    def stream_request(self, prompt: str) -> Iterator[str]:
+        """流式发送请求，逐段返回响应文本（默认退化为一次性返回）"""
+        yield self.send_request(prompt)
+
+    # -------------------------
+    # 截止时间 / 重试 / 对冲
+    # -------------------------
+    def _latency_key(self) -> Tuple[str, str]:
+        return type(self).__name__, getattr(self, "model_name", "")
+
+    def _record_latency(self, latency: float):
+        with _LATENCY_LOCK:
+            _LATENCIES.setdefault(self._latency_key(), deque(maxlen=200)).append(latency)
+
+    def latency_p95(self) -> Optional[float]:
+        """该客户端最近成功调用的 p95 延迟（样本不足时返回 None）"""
+        with _LATENCY_LOCK:
+            samples = sorted(_LATENCIES.get(self._latency_key(), ()))
+        if len(samples) < _HEDGE_MIN_SAMPLES:
+            return None
+        return samples[int(0.95 * (len(samples) - 1))]
+
+    def _timed_send(self, prompt: str) -> str:
+        start = time.monotonic()
+        text = self.send_request(prompt)
+        self._record_latency(time.monotonic() - start)
+        return text
+
+    def _attempt(self, prompt: str, deadline: Optional[float], hedge_delay: Optional[float]) -> str:
+        """单次尝试：可选对冲，先返回者胜出；两路均失败时抛出首个异常"""
+        futures = [_submit(self._timed_send, prompt)]
+        first_error: Optional[BaseException] = None
+
+        if hedge_delay is not None:
+            wait_for = hedge_delay if deadline is None else min(hedge_delay, max(0.0, _remaining(deadline)))
+            done, _ = wait(futures, timeout=wait_for)
+            if not done and (deadline is None or _remaining(deadline) > 0):
+                print(f"[LLM] No response after {hedge_delay:.2f}s, sending hedged request.")
+                futures.append(_submit(self._timed_send, prompt))
+
+        pending = set(futures)
+        while pending:
+            remaining = _remaining(deadline)
+            if remaining is not None and remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    return future.result()
+                if not is_transient_error(error):
+                    raise error  # 另一路对冲请求多半同样失败，无需等待
+                first_error = first_error or error
+        if pending:
+            raise DeadlineExceeded("LLM request deadline exceeded")
+        raise first_error
+
+    def send_with_policy(self,
+                         prompt: str,
+                         deadline: Optional[float] = None,
+                         max_retries: int = DEFAULT_MAX_RETRIES,
+                         backoff_base: float = DEFAULT_BACKOFF_BASE,
+                         backoff_max: float = DEFAULT_BACKOFF_MAX,
+                         hedge_after: Union[float, str, None] = DEFAULT_HEDGE_AFTER) -> str:
+        """
+        带截止时间的请求：
+          - deadline：time.monotonic() 绝对时间，None 表示不限；
+          - 暂时性错误按全抖动指数退避重试，退避不会越过截止时间；其余错误立即抛出；
+          - hedge_after：超过该延迟仍无响应时并发一个重复请求，取先返回者；
+            可为秒数或 "p95"（使用该客户端历史 p95 延迟）。
+        """
+        hedge_delay = self._hedge_delay(hedge_after)
+        for attempt in range(max_retries + 1):
+            try:
+                return self._attempt(prompt, deadline, hedge_delay)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                if attempt >= max_retries or not is_transient_error(e):
+                    raise
+                self._backoff(attempt, e, deadline, backoff_base, backoff_max)
+        raise DeadlineExceeded("LLM request deadline exceeded")
+
+    def stream_with_policy(self,
+                           prompt: str,
+                           deadline: Optional[float] = None,
+                           max_retries: int = DEFAULT_MAX_RETRIES,
+                           backoff_base: float = DEFAULT_BACKOFF_BASE,
+                           backoff_max: float = DEFAULT_BACKOFF_MAX,
+                           hedge_after: Union[float, str, None] = DEFAULT_HEDGE_AFTER) -> Iterator[str]:
+        """
+        带截止时间的流式请求，策略同 send_with_policy：
+          - 首段输出之前：暂时性错误退避重试；超过 hedge_after 仍无首段时并发一路对冲，先出首段者胜出；
+          - 首段输出之后：不再重试（已向调用方输出），每段按剩余截止时间等待，超时抛出 DeadlineExceeded。
+        """
+        hedge_delay = self._hedge_delay(hedge_after)
+        for attempt in range(max_retries + 1):
+            try:
+                events, winner, first = self._first_chunk(prompt, deadline, hedge_delay)
+                break
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                if attempt >= max_retries or not is_transient_error(e):
+                    raise
+                self._backoff(attempt, e, deadline, backoff_base, backoff_max)
+        else:
+            raise DeadlineExceeded("LLM request deadline exceeded")
+
+        try:
+            while first is not None:
+                yield first
+                first = None
+                while True:
+                    remaining = _remaining(deadline)
+                    if remaining is not None and remaining <= 0:
+                        raise DeadlineExceeded("LLM stream deadline exceeded")
+                    try:
+                        index, kind, payload = events.get(timeout=remaining)
+                    except queue.Empty:
+                        raise DeadlineExceeded("LLM stream deadline exceeded") from None
+                    if index != winner.index:
+                        continue
+                    if kind == "error":
+                        raise payload
+                    if kind == "done":
+                        return
+                    yield payload
+        finally:
+            winner.cancel()
+
+    def _first_chunk(self, prompt: str, deadline: Optional[float],
+                     hedge_delay: Optional[float]) -> Tuple["queue.Queue", _StreamAttempt, Optional[str]]:
+        """单次流式尝试：等待首段输出（可对冲），返回 (事件队列, 胜出的一路, 首段；空响应为 None)"""
+        events: "queue.Queue" = queue.Queue()
+        attempts = [_StreamAttempt(self, prompt, events, 0)]
+        hedge_at = None if hedge_delay is None else time.monotonic() + hedge_delay
+        failed: Dict[int, BaseException] = {}
+        try:
+            while True:
+                waits = [t for t in (_remaining(deadline), _remaining(hedge_at)) if t is not None]
+                timeout = max(0.0, min(waits)) if waits else None
+                try:
+                    index, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    if deadline is not None and _remaining(deadline) <= 0:
+                        raise DeadlineExceeded("LLM stream deadline exceeded before the first chunk") from None
+                    if hedge_at is not None and _remaining(hedge_at) <= 0:
+                        print(f"[LLM] No stream output after {hedge_delay:.2f}s, sending hedged request.")
+                        attempts.append(_StreamAttempt(self, prompt, events, len(attempts)))
+                        hedge_at = None
+                    continue
+                if kind == "error":
+                    if not is_transient_error(payload):
+                        raise payload
+                    failed[index] = payload
+                    if len(failed) == len(attempts) and hedge_at is None:
+                        raise failed[0] if 0 in failed else payload
+                    continue
+                winner = attempts[index]
+                for attempt in attempts:
+                    if attempt is not winner:
+                        attempt.cancel()
+                return events, winner, payload if kind == "chunk" else None
+        except BaseException:
+            for attempt in attempts:
+                attempt.cancel()
+            raise
+
+    def _hedge_delay(self, hedge_after: Union[float, str, None]) -> Optional[float]:
+        if hedge_after == "p95":
+            return self.latency_p95()
+        return None if hedge_after is None else float(hedge_after)
+
+    @staticmethod
+    def _backoff_delay(attempt: int, error: BaseException, deadline: Optional[float],
+                       backoff_base: float, backoff_max: float) -> float:
+        """全抖动指数退避时长；剩余时间不足以退避时抛出 DeadlineExceeded"""
+        backoff = random.uniform(0, min(backoff_max, backoff_base * (2 ** attempt)))
+        remaining = _remaining(deadline)
+        if remaining is not None and remaining <= backoff:
+            raise DeadlineExceeded(f"No time left to retry after error: {error}") from error
+        print(f"[LLM] Attempt {attempt + 1} failed ({error}); retrying in {backoff:.2f}s.")
+        return backoff
+
+    @classmethod
+    def _backoff(cls, attempt: int, error: BaseException, deadline: Optional[float],
+                 backoff_base: float, backoff_max: float):
+        time.sleep(cls._backoff_delay(attempt, error, deadline, backoff_base, backoff_max))
+
     @staticmethod
     def safe_json_parse(text: str) -> Dict[str, Any]:
-        """通用 JSON 解析工具"""
-        import json, re
+        """通用 JSON 解析工具（单遍花括号匹配提取，失败返回 {"error": ...}）"""
+        return parse_json_response(text)
+
+
+class AsyncBaseLLMClient(BaseLLMClient):
+    """异步大模型调用接口：send_request / send_with_policy 为协程，适合单进程承载大量并发请求"""
+
+    @abstractmethod
+    async def send_request(self, prompt: str) -> str:
+        """异步发送请求到 LLM 并返回原始响应文本"""
+        pass
+
+    async def _timed_send(self, prompt: str) -> str:
+        start = time.monotonic()
+        text = await self.send_request(prompt)
+        self._record_latency(time.monotonic() - start)
+        return text
+
+    async def _attempt(self, prompt: str, deadline: Optional[float], hedge_delay: Optional[float]) -> str:
+        """单次尝试（同 BaseLLMClient._attempt），以任务代替线程；返回前取消未完成的一路"""
+        tasks = [asyncio.ensure_future(self._timed_send(prompt))]
+        first_error: Optional[BaseException] = None
         try:
-            return json.loads(text)
-        except Exception:
-            match = re.search(r"\{[\s\S]*\}", text)
-            if match:
-                try:
-                    return json.loads(match.group(0))
-                except Exception:
-                    pass
-        return {"error": "Invalid JSON response"}
+            if hedge_delay is not None:
+                wait_for = hedge_delay if deadline is None else min(hedge_delay, max(0.0, _remaining(deadline)))
+                done, _ = await asyncio.wait(tasks, timeout=wait_for)
+                if not done and (deadline is None or _remaining(deadline) > 0):
+                    print(f"[LLM] No response after {hedge_delay:.2f}s, sending hedged request.")
+                    tasks.append(asyncio.ensure_future(self._timed_send(prompt)))
+
+            pending = set(tasks)
+            while pending:
+                remaining = _remaining(deadline)
+                if remaining is not None and remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        return task.result()
+                    if not is_transient_error(error):
+                        raise error
+                    first_error = first_error or error
+            if pending:
+                raise DeadlineExceeded("LLM request deadline exceeded")
+            raise first_error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def send_with_policy(self,
+                               prompt: str,
+                               deadline: Optional[float] = None,
+                               max_retries: int = DEFAULT_MAX_RETRIES,
+                               backoff_base: float = DEFAULT_BACKOFF_BASE,
+                               backoff_max: float = DEFAULT_BACKOFF_MAX,
+                               hedge_after: Union[float, str, None] = DEFAULT_HEDGE_AFTER) -> str:
+        """send_with_policy 的协程版本：相同的暂时性错误判断、抖动退避、对冲与截止时间"""
+        hedge_delay = self._hedge_delay(hedge_after)
+        for attempt in range(max_retries + 1):
+            try:
+                return await self._attempt(prompt, deadline, hedge_delay)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                if attempt >= max_retries or not is_transient_error(e):
+                    raise
+                await asyncio.sleep(self._backoff_delay(attempt, e, deadline, backoff_base, backoff_max))
+        raise DeadlineExceeded("LLM request deadline exceeded")
+
+
+class ThreadedAsyncClient(AsyncBaseLLMClient):
+    """
+    将同步客户端适配为异步接口（在线程中执行），用于没有原生异步实现的模型。
+    send_with_policy 直接使用同步客户端的重试 / 对冲策略，并传入截止时间：
+    调用方放弃等待后，线程中的重试不会越过截止时间。
+    """
+
+    def __init__(self, client: BaseLLMClient):
+        super().__init__(client.api_key, client.temperature)
+        self.client = client
+        self.model_name = getattr(client, "model_name", "")
+        self.api_base = getattr(client, "api_base", None)
+
+    async def send_request(self, prompt: str) -> str:
+        return await asyncio.to_thread(self.client.send_request, prompt)
+
+    async def send_with_policy(self,
+                               prompt: str,
+                               deadline: Optional[float] = None,
+                               max_retries: int = DEFAULT_MAX_RETRIES,
+                               backoff_base: float = DEFAULT_BACKOFF_BASE,
+                               backoff_max: float = DEFAULT_BACKOFF_MAX,
+                               hedge_after: Union[float, str, None] = DEFAULT_HEDGE_AFTER) -> str:
+        return await asyncio.to_thread(self.client.send_with_policy, prompt, deadline,
+                                       max_retries, backoff_base, backoff_max, hedge_after)
@@ -0,0 +1,273 @@
+# ==========================================
+# Module: Request Coalescing
+# File: app/llm_service/coalescing.py
+# ==========================================
+# 🧩 模块功能：
+#   - Singleflight：相同 Prompt 的并发请求共享同一次上游模型调用；
+#   - 近重复聚类：短时间窗口内措辞略有差异的报告（"Fire detected in east building..."）
+#     经 SimHash 分段索引快速找出候选，再以词片段 Jaccard 相似度确认，归入同一事件簇；
+#   - 同簇报告共享一次分析结果，并逐条标注（簇 ID、角色、相似度、簇内报告数）；
+#   - 突发事件期间大量重复报告只触发少量上游调用。
+#
+# 说明：
+#   - 仅在媒体内容相同（或均无媒体）且凭证相同时才合并 / 聚类：
+#     不同账号 / 端点的请求各自调用上游，结果不跨凭证共享；
+#   - 上游失败不缓存：仅在途的等待者共享该异常，之后的报告重新发起调用。
+# ==========================================
+
+import copy
+import hashlib
+import itertools
+import os
+import re
+import threading
+import time
+from typing import Dict, Any, FrozenSet, List, Optional, Tuple
+
+from app.telemetry import Counter, register_metric
+
+# 英文按词、中文按字切分；去掉不影响语义的常见虚词
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[一-鿿]")
+_STOPWORDS = frozenset(
+    "a an the in on at of to is are was were and or with from for by there this that it be been has have".split()
+)
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4  # 4 段 × 16 位：汉明距离 ≤ 3 的指纹必然至少有一段完全相同
+
+COALESCED = Counter("coalesced_requests_total",
+                    "Requests served by another request's upstream call.", ["kind"])
+register_metric(COALESCED)
+
+
+# -------------------------
+# 🔍 文本指纹
+# -------------------------
+def shingles(text: str) -> FrozenSet[str]:
+    """词（字）及相邻二元组集合"""
+    words = [w for w in _TOKEN_RE.findall((text or "").lower()) if w not in _STOPWORDS]
+    return frozenset(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+
+def simhash(features: FrozenSet[str]) -> int:
+    """64 位 SimHash 指纹"""
+    weights = [0] * SIMHASH_BITS
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for i in range(SIMHASH_BITS):
+            weights[i] += 1 if (h >> i) & 1 else -1
+    return sum(1 << i for i, w in enumerate(weights) if w > 0)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _bands(fingerprint: int) -> List[Tuple[int, int]]:
+    width = SIMHASH_BITS // SIMHASH_BANDS
+    mask = (1 << width) - 1
+    return [(i, (fingerprint >> (i * width)) & mask) for i in range(SIMHASH_BANDS)]
+
+
+# -------------------------
+# ✈️ 在途调用
+# -------------------------
+class Flight:
+    """一次共享的上游调用：首个请求执行，其余请求等待其结果"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+        self.completed_at: Optional[float] = None
+        self._done = threading.Event()
+
+    def finish(self, result: Dict[str, Any]):
+        self.result = result
+        self.completed_at = time.monotonic()
+        self._done.set()
+
+    def fail(self, error: BaseException):
+        self.error = error
+        self.completed_at = time.monotonic()
+        self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """等待结果（返回副本）；上游失败时抛出同一异常，超时抛出 TimeoutError"""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Timed out waiting for shared call {self.key[:12]}")
+        if self.error is not None:
+            raise self.error
+        return copy.deepcopy(self.result)
+
+
+class _Cluster:
+    """近重复报告簇"""
+
+    __slots__ = ("cluster_id", "scope", "features", "fingerprint", "flight", "reports")
+
+    def __init__(self, cluster_id: str, scope: str, features: FrozenSet[str], fingerprint: int, flight: Flight):
+        self.cluster_id = cluster_id
+        self.scope = scope
+        self.features = features
+        self.fingerprint = fingerprint
+        self.flight = flight
+        self.reports = 1
+
+
+class Coalescer:
+    """Singleflight + 近重复聚类（线程安全）"""
+
+    def __init__(self, window_seconds: float = 30.0, min_similarity: float = 0.8):
+        """
+        window_seconds：近重复聚类窗口（簇的分析结果完成后可复用的秒数，0 为只做 singleflight）；
+        min_similarity：归入同一簇所需的最小 Jaccard 相似度。
+        """
+        self.window_seconds = window_seconds
+        self.min_similarity = min_similarity
+        self._flights: Dict[str, Flight] = {}
+        self._clusters: Dict[str, _Cluster] = {}
+        self._band_index: Dict[Tuple[str, int, int], List[str]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "exact": 0, "near": 0}
+
+    # -------------------------
+    # 公共接口
+    # -------------------------
+    def begin(self, key: str, text: str = "", scope: str = "",
+              credential: str = "") -> Tuple[Flight, bool, Dict[str, Any]]:
+        """
+        登记一次调用，返回 (flight, 是否由本请求执行, 标注信息)。
+        key 为精确键（Prompt + 媒体哈希）；text / scope 用于近重复聚类（scope 为媒体哈希）；
+        credential 为凭证作用域哈希（response_cache.credential_scope），同时限定精确合并与聚类。
+        执行方须调用 finish()；非执行方调用 flight.wait() 获取共享结果。
+        """
+        if credential:
+            key, scope = f"{credential}:{key}", f"{credential}|{scope}"
+        features = shingles(text) if self.window_seconds > 0 else frozenset()
+        fingerprint = simhash(features) if features else 0
+        with self._lock:
+            self._expire()
+
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats["exact"] += 1
+                COALESCED.inc(kind="exact")
+                return flight, False, {"role": "member", "match": "exact"}
+
+            cluster, similarity = self._match(scope, features, fingerprint) if features else (None, 0.0)
+            if cluster is not None:
+                cluster.reports += 1
+                self._stats["near"] += 1
+                COALESCED.inc(kind="near")
+                return cluster.flight, False, {
+                    "role": "member", "match": "near", "cluster_id": cluster.cluster_id,
+                    "similarity": round(similarity, 3), "cluster_reports": cluster.reports,
+                }
+
+            flight = Flight(key)
+            self._flights[key] = flight
+            self._stats["leaders"] += 1
+            info = {"role": "leader"}
+            if features:
+                cluster = self._add_cluster(scope, features, fingerprint, flight)
+                info.update(cluster_id=cluster.cluster_id, cluster_reports=1)
+            return flight, True, info
+
+    def finish(self, flight: Flight, result: Optional[Dict[str, Any]] = None,
+               error: Optional[BaseException] = None, share: bool = True):
+        """
+        执行方完成调用：唤醒等待者并移出在途表。
+        share=False（或失败）时结果只交给在途等待者，不再供窗口内后续报告复用。
+        """
+        if error is not None:
+            flight.fail(error)
+        else:
+            flight.finish(copy.deepcopy(result))
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+            if error is not None or not share:
+                for cluster_id in [cid for cid, c in self._clusters.items() if c.flight is flight]:
+                    self._drop_cluster(cluster_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights)
+            stats["clusters"] = len(self._clusters)
+        requests = stats["leaders"] + stats["exact"] + stats["near"]
+        stats["coalesce_rate"] = round((stats["exact"] + stats["near"]) / requests, 4) if requests else 0.0
+        return stats
+
+    # -------------------------
+    # 内部实现（调用方持有锁）
+    # -------------------------
+    def _match(self, scope: str, features: FrozenSet[str], fingerprint: int) -> Tuple[Optional[_Cluster], float]:
+        """SimHash 分段索引取候选，Jaccard 确认，返回最相似的簇"""
+        candidates = set()
+        for band, value in _bands(fingerprint):
+            candidates.update(self._band_index.get((scope, band, value), ()))
+        best, best_similarity = None, 0.0
+        for cluster_id in candidates:
+            cluster = self._clusters[cluster_id]
+            similarity = jaccard(features, cluster.features)
+            if similarity >= self.min_similarity and similarity > best_similarity:
+                best, best_similarity = cluster, similarity
+        return best, best_similarity
+
+    def _add_cluster(self, scope: str, features: FrozenSet[str], fingerprint: int, flight: Flight) -> _Cluster:
+        cluster = _Cluster(f"c{next(self._ids)}", scope, features, fingerprint, flight)
+        self._clusters[cluster.cluster_id] = cluster
+        for band, value in _bands(cluster.fingerprint):
+            self._band_index.setdefault((scope, band, value), []).append(cluster.cluster_id)
+        return cluster
+
+    def _drop_cluster(self, cluster_id: str):
+        cluster = self._clusters.pop(cluster_id)
+        for band, value in _bands(cluster.fingerprint):
+            ids = self._band_index.get((cluster.scope, band, value))
+            if ids is not None:
+                ids.remove(cluster_id)
+                if not ids:
+                    del self._band_index[(cluster.scope, band, value)]
+
+    def _expire(self):
+        """移除结果已超出复用窗口的簇（在途的簇保留）"""
+        cutoff = time.monotonic() - self.window_seconds
+        for cluster_id in [cid for cid, c in self._clusters.items()
+                           if c.flight.completed_at is not None and c.flight.completed_at < cutoff]:
+            self._drop_cluster(cluster_id)
+
+
+# -------------------------
+# 🔧 全局默认实例（环境变量配置）
+# -------------------------
+_default_coalescer: Optional[Coalescer] = None
+_default_lock = threading.Lock()
+
+
+def coalescing_enabled() -> bool:
+    """INTENT_COALESCE=0 时关闭合并（如基准测试需要每次请求都真正调用上游）"""
+    return os.environ.get("INTENT_COALESCE", "1") not in ("0", "false", "False")
+
+
+def get_default_coalescer() -> Coalescer:
+    """
+    获取进程级共享合并器。
+    环境变量：
+      - INTENT_COALESCE：是否启用（默认 1）；
+      - COALESCE_WINDOW：近重复聚类窗口秒数（默认 30，0 为只合并完全相同的在途请求）；
+      - COALESCE_MIN_SIMILARITY：归入同簇的最小 Jaccard 相似度（默认 0.8）。
+    """
+    global _default_coalescer
+    with _default_lock:
+        if _default_coalescer is None:
+            _default_coalescer = Coalescer(
+                window_seconds=float(os.environ.get("COALESCE_WINDOW", "30")),
+                min_similarity=float(os.environ.get("COALESCE_MIN_SIMILARITY", "0.8")),
+            )
+        return _default_coalescer
@@ -0,0 +1,230 @@
+# ==========================================
+# Module: LLM JSON Extraction
+# File: app/llm_service/json_extract.py
+# ==========================================
+# 🧩 模块功能：
+#   - 单遍、感知字符串 / 转义的花括号匹配，从模型输出中提取首个 JSON 对象；
+#   - 支持流式增量输入（逐段 feed，无需重复扫描已处理文本）；
+#   - 按意图 Schema 校验并规范化字段；
+#   - 可用时使用 orjson 加速解析；
+#   - 统计解析耗时与失败率，并计入 telemetry span。
+# ==========================================
+
+import json
+import re
+import threading
+import time
+from typing import Dict, Any, Optional, List, Tuple
+
+from app.telemetry import span
+
+try:
+    import orjson as _orjson
+except ImportError:  # 可选依赖
+    _orjson = None
+
+JSON_BACKEND = "orjson" if _orjson is not None else "json"
+
+# 意图 Schema：字段 → 类型
+INTENT_SCHEMA: Dict[str, type] = {
+    "explicit_intent": str,
+    "implicit_intent": str,
+    "environment_context": str,
+    "intent_confidence": float,
+}
+
+# 影响括号匹配的结构字符
+_STRUCTURAL = re.compile(r'[{}"\\]')
+
+_STATS_LOCK = threading.Lock()
+_STATS: Dict[str, float] = {
+    "parses": 0,          # 解析次数
+    "direct": 0,          # 整段即为合法 JSON
+    "extracted": 0,       # 需从多余文本中提取
+    "invalid_json": 0,    # 未找到合法 JSON
+    "schema_errors": 0,   # JSON 合法但不符合 Schema
+    "seconds": 0.0,       # 累计解析耗时
+}
+
+
+def loads(text: str) -> Any:
+    """使用最快的可用后端解析 JSON"""
+    if _orjson is not None:
+        return _orjson.loads(text)
+    return json.loads(text)
+
+
+class IncrementalJSONExtractor:
+    """
+    增量 JSON 对象提取器。
+    逐段 feed 文本，跟踪花括号深度与字符串 / 转义状态；
+    首个完整且可解析的顶层对象出现后即可通过 result 获取。
+    """
+
+    def __init__(self):
+        self._buf: List[str] = []
+        self._pos = 0            # 已扫描的字符数（全局偏移）
+        self._depth = 0
+        self._in_string = False
+        self._skip_pos = -1      # 下一个需跳过（被转义）的字符位置
+        self._start: Optional[int] = None
+        self.result: Optional[Dict[str, Any]] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._buf)
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """追加文本片段；找到完整对象时返回该对象"""
+        if self.result is not None or not chunk:
+            return self.result
+        base = self._pos
+        self._buf.append(chunk)
+        self._pos += len(chunk)
+
+        # 仅在结构字符处停留，普通字符由正则整段跳过
+        for m in _STRUCTURAL.finditer(chunk):
+            pos = base + m.start()
+            if pos == self._skip_pos:  # 被反斜杠转义的字符
+                continue
+            ch = m.group()
+            if self._in_string:
+                if ch == "\\":
+                    self._skip_pos = pos + 1
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                if self._depth > 0:
+                    self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._start = pos
+                self._depth += 1
+            elif ch == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate = self.text[self._start:pos + 1]
+                    self._start = None
+                    try:
+                        obj = loads(candidate)
+                    except ValueError:
+                        continue  # 非法片段，继续向后扫描
+                    if isinstance(obj, dict):
+                        self.result = obj
+                        return obj
+        return None
+
+
+def extract_json_object(text: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    提取 JSON 对象。
+    返回 (对象或 None, 是否需要从多余文本中提取)。
+    """
+    stripped = text.strip()
+    if stripped.startswith("{") and stripped.endswith("}"):
+        try:
+            obj = loads(stripped)
+            if isinstance(obj, dict):
+                return obj, False
+        except ValueError:
+            pass
+    extractor = IncrementalJSONExtractor()
+    return extractor.feed(text), True
+
+
+def _coerce_confidence(value: Any) -> Optional[float]:
+    try:
+        conf = float(str(value).strip().rstrip("%")) if isinstance(value, str) else float(value)
+    except (TypeError, ValueError):
+        return None
+    if conf > 1.0 and conf <= 100.0:  # 百分制
+        conf /= 100.0
+    return min(1.0, max(0.0, conf))
+
+
+def validate_intent(obj: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    按 INTENT_SCHEMA 校验并规范化。
+    返回 (规范化后的结果, 错误列表)；缺失 / 非法字段以默认值补齐。
+    """
+    result = dict(obj)
+    errors: List[str] = []
+    for field, field_type in INTENT_SCHEMA.items():
+        value = obj.get(field)
+        if field_type is float:
+            conf = _coerce_confidence(value) if value is not None else None
+            if conf is None:
+                errors.append(f"{field}: expected number, got {value!r}")
+                conf = 0.0
+            result[field] = conf
+        elif value is None or value == "":
+            errors.append(f"{field}: missing")
+            result[field] = "unknown"
+        elif not isinstance(value, str):
+            result[field] = json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else str(value)
+    return result, errors
+
+
+def _record(outcome: str, elapsed: float):
+    with _STATS_LOCK:
+        _STATS["parses"] += 1
+        _STATS[outcome] += 1
+        _STATS["seconds"] += elapsed
+
+
+def parse_json_response(text: str) -> Dict[str, Any]:
+    """通用解析：返回首个 JSON 对象，失败时返回 {"error": ...}"""
+    with span("safe_json_parse"):
+        return _parse_json_response(text)
+
+
+def _parse_json_response(text: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    obj, extracted = extract_json_object(text or "")
+    if obj is None:
+        _record("invalid_json", time.perf_counter() - start)
+        return {"error": "Invalid JSON response"}
+    _record("extracted" if extracted else "direct", time.perf_counter() - start)
+    return obj
+
+
+def parse_intent_response(text: str, obj: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    解析并校验意图结果。
+    obj 可传入增量提取器已得到的对象，跳过重复扫描。
+    Schema 不符时结果中附带 schema_errors。
+    """
+    with span("safe_json_parse", schema="intent"):
+        return _parse_intent_response(text, obj)
+
+
+def _parse_intent_response(text: str, obj: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    extracted = True
+    if obj is None:
+        obj, extracted = extract_json_object(text or "")
+    if obj is None:
+        _record("invalid_json", time.perf_counter() - start)
+        return {"error": "Invalid JSON response"}
+
+    result, errors = validate_intent(obj)
+    if errors:
+        result["schema_errors"] = errors
+        _record("schema_errors", time.perf_counter() - start)
+    else:
+        _record("extracted" if extracted else "direct", time.perf_counter() - start)
+    return result
+
+
+def get_parse_stats() -> Dict[str, Any]:
+    """返回解析统计（含失败率与平均耗时）"""
+    with _STATS_LOCK:
+        stats = dict(_STATS)
+    parses = stats["parses"]
+    stats["backend"] = JSON_BACKEND
+    stats["bad_output_rate"] = round((stats["invalid_json"] + stats["schema_errors"]) / parses, 4) if parses else 0.0
+    stats["avg_ms"] = round(stats["seconds"] * 1000 / parses, 4) if parses else 0.0
+    stats["seconds"] = round(stats["seconds"], 6)
+    return stats
@@ -0,0 +1,27 @@
+# ==========================================
+# Module: Local LLM Client
+# File: app/llm_service/local_client.py
+# ==========================================
+# 🧩 模块功能：
+#   - 调用本地部署的 OpenAI 兼容推理服务（如 vLLM / llama.cpp server）；
+#   - 作为远端模型降级时的本地备用后端；
+#   - 本地服务通常无需真实 API Key。
+# ==========================================
+
+import os
+from app.llm_service.openai_client import OpenAIClient
+from app.llm_service.base_client import BaseLLMClient
+
+LOCAL_API_BASE = os.environ.get("LOCAL_LLM_API_BASE", "http://localhost:8000/v1")
+LOCAL_MODEL_NAME = os.environ.get("LOCAL_LLM_MODEL", "local-model")
+
+
+class LocalOpenAIClient(OpenAIClient):
+    """本地 OpenAI 兼容接口客户端"""
+
+    def __init__(self, api_key: str = None, model_name: str = "local", temperature: float = 0.3,
+                 api_base: str = None):
+        BaseLLMClient.__init__(self, os.environ.get("LOCAL_LLM_API_KEY", "local"), temperature)
+        self.api_base = api_base or LOCAL_API_BASE
+        # 注册名 "local" 映射到本地服务实际加载的模型名
+        self.model_name = LOCAL_MODEL_NAME if model_name == "local" else model_name
@@ -4,16 +4,35 @@
 # ==========================================
 # 🧩 模块功能：
 #   - 注册与动态选择可用的大模型客户端；
+#   - 同步 / 异步客户端分别注册；没有原生异步实现的模型在线程中执行同步客户端；
+#   - "auto" 为延迟感知路由（多后端自动切换），"local" 为本地兼容服务；
+#   - "replay" 为录制 / 回放客户端（离线、确定性的 pipeline 运行）；
 #   - 未来可支持多厂商模型（OpenAI, Anthropic, Google, etc）。
 # ==========================================
 
+import os
 from typing import Dict, Type
-from app.llm_service.base_client import BaseLLMClient
+from app.llm_service.base_client import BaseLLMClient, AsyncBaseLLMClient, ThreadedAsyncClient
 from app.llm_service.openai_client import OpenAIClient
+from app.llm_service.async_openai_client import AsyncOpenAIClient
+from app.llm_service.local_client import LocalOpenAIClient
+from app.llm_service.model_router import RoutedLLMClient
+from app.llm_service.replay_client import ReplayLLMClient
+
+# 默认使用的模型名（可设为 "auto" 启用多后端路由）
+DEFAULT_MODEL = os.environ.get("LLM_DEFAULT_MODEL", "gpt-4o")
 
 # 全局模型注册表
 MODEL_REGISTRY: Dict[str, Type[BaseLLMClient]] = {
     "gpt-4o": OpenAIClient,
+    "local": LocalOpenAIClient,
+    "auto": RoutedLLMClient,
+    "replay": ReplayLLMClient,
+}
+
+# 异步模型注册表（asyncio 原生客户端）
+ASYNC_MODEL_REGISTRY: Dict[str, Type[AsyncBaseLLMClient]] = {
+    "gpt-4o": AsyncOpenAIClient,
 }
 
 def get_llm_client(model_name: str, api_key: str = None, temperature: float = 0.3) -> BaseLLMClient:
@@ -22,3 +41,16 @@ def get_llm_client(model_name: str, api_key: str = None, temperature: float = 0.
     if not client_cls:
         raise ValueError(f"Unsupported model: {model_name}")
     return client_cls(api_key=api_key, model_name=model_name, temperature=temperature)
+
+def get_async_llm_client(model_name: str, api_key: str = None, temperature: float = 0.3,
+                         **kwargs) -> AsyncBaseLLMClient:
+    """
+    根据模型名动态实例化对应异步客户端（kwargs 透传连接池 / 并发配置）。
+    仅注册了同步客户端的模型（如 "auto" / "replay"）以 ThreadedAsyncClient 适配。
+    """
+    client_cls = ASYNC_MODEL_REGISTRY.get(model_name)
+    if not client_cls:
+        if model_name in MODEL_REGISTRY:
+            return ThreadedAsyncClient(get_llm_client(model_name, api_key=api_key, temperature=temperature))
+        raise ValueError(f"Unsupported async model: {model_name}")
+    return client_cls(api_key=api_key, model_name=model_name, temperature=temperature, **kwargs)
@@ -0,0 +1,202 @@
+# ==========================================
+# Module: Latency-Aware Model Router
+# File: app/llm_service/model_router.py
+# ==========================================
+# 🧩 模块功能：
+#   - 在多个已注册后端之间路由请求；
+#   - 按后端维护滚动 p50 / p95 延迟与错误率；
+#   - 优先选择最快的健康后端，出错或变慢时自动切换；
+#   - 不健康后端冷却一段时间后重新探测。
+# ==========================================
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Iterator, Deque, Tuple
+
+from app.llm_service.base_client import BaseLLMClient
+
+DEFAULT_BACKENDS = [b.strip() for b in os.environ.get("ROUTER_BACKENDS", "gpt-4o,local").split(",") if b.strip()]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+class BackendStats:
+    """单个后端的滚动窗口统计"""
+
+    def __init__(self, window: int):
+        self.samples: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    def latencies(self) -> List[float]:
+        return [lat for lat, ok in self.samples if ok]
+
+    def p50(self) -> float:
+        return _percentile(self.latencies(), 50)
+
+    def p95(self) -> float:
+        return _percentile(self.latencies(), 95)
+
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+
+class ModelRouter:
+    """基于延迟与错误率的后端选择器（线程安全，进程内共享）"""
+
+    def __init__(self,
+                 backends: List[str] = None,
+                 window: int = 50,
+                 min_samples: int = 5,
+                 max_error_rate: float = 0.5,
+                 max_consecutive_failures: int = 3,
+                 slow_p95_seconds: float = float(os.environ.get("ROUTER_SLOW_P95", "20")),
+                 cooldown_seconds: float = 30.0):
+        self.backends = list(backends or DEFAULT_BACKENDS)
+        self.window = window
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.max_consecutive_failures = max_consecutive_failures
+        self.slow_p95_seconds = slow_p95_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self._stats: Dict[str, BackendStats] = {name: BackendStats(window) for name in self.backends}
+        self._lock = threading.Lock()
+
+    # -------------------------
+    # 统计
+    # -------------------------
+    def record(self, name: str, latency: float, ok: bool):
+        """记录一次调用结果；触发阈值时进入冷却并清空窗口（冷却结束后重新探测）"""
+        with self._lock:
+            stats = self._stats.setdefault(name, BackendStats(self.window))
+            stats.samples.append((latency, ok))
+            stats.consecutive_failures = 0 if ok else stats.consecutive_failures + 1
+
+            degraded = stats.consecutive_failures >= self.max_consecutive_failures
+            if len(stats.samples) >= self.min_samples:
+                degraded = degraded or stats.error_rate() > self.max_error_rate
+                degraded = degraded or stats.p95() > self.slow_p95_seconds
+            if degraded:
+                print(f"[⚠️ ModelRouter] Backend '{name}' degraded "
+                      f"(p95={stats.p95():.2f}s, error_rate={stats.error_rate():.2f}); cooling down.")
+                stats.cooldown_until = time.monotonic() + self.cooldown_seconds
+                stats.samples.clear()
+                stats.consecutive_failures = 0
+
+    def ranked(self) -> List[str]:
+        """
+        返回尝试顺序：健康后端按 p50 升序（无样本的后端优先探测），
+        冷却中的后端按冷却结束时间排在最后作为兜底。
+        """
+        now = time.monotonic()
+        with self._lock:
+            healthy, cooling = [], []
+            for name in self.backends:
+                stats = self._stats[name]
+                if stats.cooldown_until <= now:
+                    healthy.append((stats.p50() if stats.latencies() else -1.0, name))
+                else:
+                    cooling.append((stats.cooldown_until, name))
+        return [name for _, name in sorted(healthy)] + [name for _, name in sorted(cooling)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回各后端当前统计"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name: {
+                    "healthy": stats.cooldown_until <= now,
+                    "samples": len(stats.samples),
+                    "p50": round(stats.p50(), 3),
+                    "p95": round(stats.p95(), 3),
+                    "error_rate": round(stats.error_rate(), 3),
+                }
+                for name, stats in self._stats.items()
+            }
+
+
+_default_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    """获取进程级共享路由器（后端列表由 ROUTER_BACKENDS 配置）"""
+    global _default_router
+    with _router_lock:
+        if _default_router is None:
+            _default_router = ModelRouter()
+        return _default_router
+
+
+class RoutedLLMClient(BaseLLMClient):
+    """通过 ModelRouter 在多个后端之间自动选择与故障切换的客户端"""
+
+    def __init__(self, api_key: str = None, model_name: str = "auto", temperature: float = 0.3,
+                 router: ModelRouter = None):
+        super().__init__(api_key, temperature)
+        self.model_name = model_name
+        self.router = router or get_router()
+        self._clients: Dict[str, BaseLLMClient] = {}
+
+    def _client(self, name: str) -> BaseLLMClient:
+        # 延迟导入：model_registry 注册了本类
+        from app.llm_service.model_registry import get_llm_client
+        if name not in self._clients:
+            self._clients[name] = get_llm_client(model_name=name, api_key=self.api_key,
+                                                 temperature=self.temperature)
+        return self._clients[name]
+
+    def send_request(self, prompt: str) -> str:
+        """按路由顺序依次尝试后端，首个成功的结果即返回"""
+        last_error: Optional[Exception] = None
+        for name in self.router.ranked():
+            start = time.perf_counter()
+            try:
+                text = self._client(name).send_request(prompt)
+            except Exception as e:
+                self.router.record(name, time.perf_counter() - start, ok=False)
+                print(f"[⚠️ ModelRouter] Backend '{name}' failed: {e}; failing over.")
+                last_error = e
+                continue
+            self.router.record(name, time.perf_counter() - start, ok=True)
+            return text
+        self._raise_last(last_error)
+
+    def stream_request(self, prompt: str) -> Iterator[str]:
+        """流式请求：首段输出之前出错可切换后端，之后的错误直接抛出"""
+        last_error: Optional[Exception] = None
+        for name in self.router.ranked():
+            start = time.perf_counter()
+            started = False
+            try:
+                for delta in self._client(name).stream_request(prompt):
+                    started = True
+                    yield delta
+            except Exception as e:
+                self.router.record(name, time.perf_counter() - start, ok=False)
+                if started:
+                    raise
+                print(f"[⚠️ ModelRouter] Backend '{name}' failed: {e}; failing over.")
+                last_error = e
+                continue
+            self.router.record(name, time.perf_counter() - start, ok=True)
+            return
+        self._raise_last(last_error)
+
+    @staticmethod
+    def _raise_last(last_error: Optional[Exception]):
+        """所有后端均失败：抛出最后一个后端的原始异常（保留异常链与暂时性分类，便于上层重试）"""
+        if last_error is None:
+            raise RuntimeError("No backends configured for the model router")
+        print(f"[⚠️ ModelRouter] All backends failed; last error: {last_error}")
+        raise last_error
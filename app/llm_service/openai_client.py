@@ -5,32 +5,93 @@
 # 🧩 模块功能：
 #   - 负责 GPT 系列模型（包括 GPT-4o）调用；
 #   - 兼容 openai==0.28.0；
-#   - 支持自定义 API Base（如 Nuwa API）。
+#   - 支持自定义 API Base（如 Nuwa API）；
+#   - 凭证按请求传入，不修改 openai 模块全局状态；
+#   - 支持 stream=True 流式返回；
+#   - 调用计时、token 用量计入 telemetry；
+#   - openai SDK 在首次调用时才导入（导入耗时约 0.2s），缩短冷启动。
 # ==========================================
 
-import openai
-from typing import Dict, Any
+import os
+import time
+from typing import Dict, Any, Iterator
 from app.llm_service.base_client import BaseLLMClient
-from app.config_loader import load_api_key
+from app.config_loader import resolve_api_key
+from app.telemetry import span, record_span, record_tokens, observe_payload
+
+# 默认 API Base，可通过环境变量 OPENAI_API_BASE 覆盖
+DEFAULT_API_BASE = os.environ.get("OPENAI_API_BASE", "https://api.nuwaapi.com/v1")
+
+# 单次 HTTP 请求超时（秒），避免被放弃的调用无限占用线程
+REQUEST_TIMEOUT = float(os.environ.get("LLM_REQUEST_TIMEOUT", "60"))
+
+SYSTEM_PROMPT = "You are an intelligent reasoning agent for emergency tasks."
 
 
 class OpenAIClient(BaseLLMClient):
     """基于 openai==0.28.0 的 GPT 调用实现"""
 
-    def __init__(self, api_key: str = None, model_name: str = "gpt-4o", temperature: float = 0.3):
-        super().__init__(api_key, temperature)
-        openai.api_key = load_api_key(api_key)
-        openai.api_base = "https://api.nuwaapi.com/v1"
+    def __init__(self, api_key: str = None, model_name: str = "gpt-4o", temperature: float = 0.3,
+                 api_base: str = None):
+        super().__init__(resolve_api_key(api_key), temperature)
+        self.api_base = api_base or DEFAULT_API_BASE
         self.model_name = model_name
 
+    def _messages(self, prompt: str):
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ]
+
     def send_request(self, prompt: str) -> str:
         """发送 prompt 并返回原始模型响应文本"""
-        response = openai.ChatCompletion.create(
-            model=self.model_name,
-            temperature=self.temperature,
-            messages=[
-                {"role": "system", "content": "You are an intelligent reasoning agent for emergency tasks."},
-                {"role": "user", "content": prompt},
-            ],
-        )
-        return response["choices"][0]["message"]["content"].strip()
+        import openai
+
+        with span("send_request", model=self.model_name):
+            response = openai.ChatCompletion.create(
+                model=self.model_name,
+                temperature=self.temperature,
+                messages=self._messages(prompt),
+                api_key=self.api_key,
+                api_base=self.api_base,
+                request_timeout=REQUEST_TIMEOUT,
+            )
+        record_tokens(self.model_name, response.get("usage"))
+        text = response["choices"][0]["message"]["content"].strip()
+        observe_payload("llm_response_chars", len(text))
+        return text
+
+    def stream_request(self, prompt: str) -> Iterator[str]:
+        """流式发送 prompt，逐段返回模型输出（首段延迟与总耗时分别计时）"""
+        import openai
+
+        # 生成器跨多次 yield，不能持有 span 上下文，结束后直接记录
+        start = time.perf_counter()
+        first_chunk = None
+        chars = 0
+        error = None
+        try:
+            response = openai.ChatCompletion.create(
+                model=self.model_name,
+                temperature=self.temperature,
+                messages=self._messages(prompt),
+                api_key=self.api_key,
+                api_base=self.api_base,
+                request_timeout=REQUEST_TIMEOUT,
+                stream=True,
+            )
+            for chunk in response:
+                choices = chunk.get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    if first_chunk is None:
+                        first_chunk = time.perf_counter() - start
+                        record_span("stream_first_chunk", first_chunk, model=self.model_name)
+                    chars += len(delta)
+                    yield delta
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            record_span("stream_request", time.perf_counter() - start, error, model=self.model_name)
+            observe_payload("llm_response_chars", chars)
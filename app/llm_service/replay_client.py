@@ -0,0 +1,182 @@
+# ==========================================
+# Module: Record / Replay LLM Client
+# File: app/llm_service/replay_client.py
+# ==========================================
+# 🧩 模块功能：
+#   - 录制上游模型的 (Prompt → 响应) 到紧凑的 cassette 文件（JSONL，每行一条，只存 Prompt 哈希）；
+#   - 回放时按归一化 Prompt 哈希（折叠空白）在内存中查表，微秒级返回，不依赖网络与 API Key；
+#   - 可按比例模拟录制时的上游延迟；
+#   - 用于离线回归 / 性能剖析：大量重复运行 pipeline，只测量本项目自身代码路径。
+#
+# 启用：LLM_DEFAULT_MODEL=replay（注册名 "replay"）
+# 环境变量：
+#   - LLM_CASSETTE：cassette 路径（默认 output/cassettes/llm.jsonl）；
+#   - LLM_REPLAY_MODE：replay（仅回放，未命中报错）/ record（总是调用上游并录制）/
+#                      auto（命中回放，未命中调用上游并录制，默认）；
+#   - LLM_REPLAY_UPSTREAM：录制时使用的上游注册名（默认 gpt-4o）；
+#   - LLM_REPLAY_LATENCY_SCALE：回放时模拟录制延迟的比例（默认 0 不等待，1 为原始延迟）。
+# ==========================================
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+from app.llm_service.base_client import BaseLLMClient
+from app.telemetry import Counter, register_metric
+
+DEFAULT_CASSETTE = os.environ.get("LLM_CASSETTE", "output/cassettes/llm.jsonl")
+REPLAY_MODES = ("replay", "record", "auto")
+
+# 流式回放时每段输出的字符数
+_STREAM_CHUNK = 32
+_WHITESPACE_RE = re.compile(r"\s+")
+
+REPLAY_CALLS = Counter("llm_replay_calls_total", "Replay client calls by outcome.", ["result"])
+register_metric(REPLAY_CALLS)
+
+
+class CassetteMiss(LookupError):
+    """回放模式下 cassette 中没有对应的录制"""
+
+
+def normalize_prompt(prompt: str) -> str:
+    """折叠空白（Prompt 模板缩进 / 换行变化不影响命中）"""
+    return _WHITESPACE_RE.sub(" ", prompt).strip()
+
+
+def prompt_key(upstream: str, temperature: float, prompt: str) -> str:
+    """录制键：(上游模型, 温度, 归一化 Prompt) 的哈希"""
+    raw = f"{upstream}|{temperature:.4f}|{normalize_prompt(prompt)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class Cassette:
+    """录制文件：启动时整体载入内存，新录制追加写入（线程安全）"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._entries: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    self._entries[record["k"]] = (record["r"], float(record.get("l", 0.0)))
+                except (ValueError, KeyError) as e:
+                    print(f"[⚠️ Cassette] Skipping malformed line {line_no} in {self.path}: {e}")
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """返回 (响应文本, 录制延迟秒数)"""
+        return self._entries.get(key)
+
+    def put(self, key: str, response: str, latency: float):
+        record = json.dumps({"k": key, "r": response, "l": round(latency, 4)}, ensure_ascii=False)
+        with self._lock:
+            self._entries[key] = (response, latency)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(record + "\n")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(path: str = DEFAULT_CASSETTE) -> Cassette:
+    """按路径获取进程级共享 cassette（只载入一次）"""
+    key = str(Path(path).resolve())
+    with _cassettes_lock:
+        if key not in _cassettes:
+            _cassettes[key] = Cassette(path)
+        return _cassettes[key]
+
+
+class ReplayLLMClient(BaseLLMClient):
+    """录制 / 回放客户端：命中时直接返回录制的响应，未命中时按模式调用上游并录制"""
+
+    def __init__(self, api_key: str = None, model_name: str = "replay", temperature: float = 0.3,
+                 cassette: Optional[str] = None, mode: Optional[str] = None, upstream: Optional[str] = None,
+                 latency_scale: Optional[float] = None):
+        super().__init__(api_key, temperature)
+        self.model_name = model_name
+        self.mode = mode or os.environ.get("LLM_REPLAY_MODE", "auto")
+        if self.mode not in REPLAY_MODES:
+            raise ValueError(f"Unsupported replay mode '{self.mode}', expected one of {REPLAY_MODES}")
+        self.upstream_name = upstream or os.environ.get("LLM_REPLAY_UPSTREAM", "gpt-4o")
+        self.latency_scale = (latency_scale if latency_scale is not None
+                              else float(os.environ.get("LLM_REPLAY_LATENCY_SCALE", "0")))
+        self.cassette = get_cassette(cassette or DEFAULT_CASSETTE)
+        self._upstream: Optional[BaseLLMClient] = None
+
+    def _upstream_client(self) -> BaseLLMClient:
+        # 延迟导入：model_registry 注册了本类；回放模式下不创建上游客户端（无需 API Key）
+        from app.llm_service.model_registry import get_llm_client
+        if self._upstream is None:
+            self._upstream = get_llm_client(model_name=self.upstream_name, api_key=self.api_key,
+                                            temperature=self.temperature)
+        return self._upstream
+
+    def _lookup(self, prompt: str) -> Tuple[str, Optional[Tuple[str, float]]]:
+        key = prompt_key(self.upstream_name, self.temperature, prompt)
+        if self.mode == "record":
+            return key, None
+        recorded = self.cassette.get(key)
+        if recorded is None and self.mode == "replay":
+            REPLAY_CALLS.inc(result="miss")
+            raise CassetteMiss(f"No recording for prompt {key} in {self.cassette.path}")
+        return key, recorded
+
+    def _simulate_latency(self, latency: float):
+        if self.latency_scale > 0 and latency > 0:
+            time.sleep(latency * self.latency_scale)
+
+    def send_request(self, prompt: str) -> str:
+        key, recorded = self._lookup(prompt)
+        if recorded is not None:
+            REPLAY_CALLS.inc(result="hit")
+            self._simulate_latency(recorded[1])
+            return recorded[0]
+
+        start = time.perf_counter()
+        text = self._upstream_client().send_request(prompt)
+        self.cassette.put(key, text, time.perf_counter() - start)
+        REPLAY_CALLS.inc(result="recorded")
+        return text
+
+    def stream_request(self, prompt: str) -> Iterator[str]:
+        """回放时按固定长度分段输出（覆盖流式解析路径）；录制时透传上游片段并在结束后写入"""
+        key, recorded = self._lookup(prompt)
+        if recorded is not None:
+            REPLAY_CALLS.inc(result="hit")
+            self._simulate_latency(recorded[1])
+            text = recorded[0]
+            for i in range(0, len(text), _STREAM_CHUNK):
+                yield text[i:i + _STREAM_CHUNK]
+            return
+
+        start = time.perf_counter()
+        parts = []
+        for delta in self._upstream_client().stream_request(prompt):
+            parts.append(delta)
+            yield delta
+        self.cassette.put(key, "".join(parts), time.perf_counter() - start)
+        REPLAY_CALLS.inc(result="recorded")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "cassette": str(self.cassette.path), "recordings": len(self.cassette),
+                "upstream": self.upstream_name}
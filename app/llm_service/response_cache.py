@@ -0,0 +1,241 @@
+# ==========================================
+# Module: LLM Response Cache
+# File: app/llm_service/response_cache.py
+# ==========================================
+# 🧩 模块功能：
+#   - 缓存结构化的大模型识别结果，避免重复 Prompt 反复调用；
+#   - 缓存键：(model_name, temperature, prompt 哈希, 媒体内容哈希, 凭证哈希)；
+#     凭证（API Key + API Base）参与键：不同账号 / 服务端点互不共享结果，
+#     无效密钥也无法借缓存绕过上游鉴权；
+#   - 内存 LRU + TTL 过期，可选磁盘层（重启后仍可命中）；
+#   - 磁盘层有条目上限：写入时按间隔清理过期文件，超出上限时按写入时间从旧到新删除；
+#   - 统计命中 / 未命中次数与节省的调用耗时。
+# ==========================================
+
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+
+def hash_text(text: str) -> str:
+    """计算文本 SHA-256 摘要"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def credential_scope(api_key: Optional[str], api_base: Optional[str] = None) -> str:
+    """凭证作用域：API Key 与 API Base 的哈希（不保存明文密钥）"""
+    return hash_text(f"{api_base or ''}|{api_key or ''}")[:16]
+
+
+def make_cache_key(model_name: str, temperature: float, prompt: str, media_hash: str = "",
+                   credential: str = "") -> str:
+    """由 (模型, 温度, prompt 哈希, 媒体哈希, 凭证作用域) 生成缓存键"""
+    raw = f"{model_name}|{temperature:.4f}|{hash_text(prompt)}|{media_hash}|{credential}"
+    return hash_text(raw)
+
+
+class ResponseCache:
+    """内存 LRU + TTL + 可选磁盘层的响应缓存（线程安全）"""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600.0, disk_dir: Optional[str] = None,
+                 max_disk_entries: int = 10000, sweep_interval: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self.max_disk_entries = max_disk_entries
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._writes_since_sweep = 0
+        self._sweep_lock = threading.Lock()
+
+        # key -> (expires_at, value, cost_seconds)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "disk_evictions": 0,
+            "saved_seconds": 0.0,
+        }
+
+    # -------------------------
+    # 读写接口
+    # -------------------------
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存；命中返回结果副本，未命中返回 None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value, cost = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    self._stats["saved_seconds"] += cost
+                    return copy.deepcopy(value)
+                del self._entries[key]
+                self._stats["expirations"] += 1
+
+        entry = self._disk_get(key, now)
+        with self._lock:
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            expires_at, value, cost = entry
+            self._stats["disk_hits"] += 1
+            self._stats["saved_seconds"] += cost
+            self._put_memory(key, expires_at, value, cost)
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: Dict[str, Any], cost_seconds: float = 0.0):
+        """写入缓存；cost_seconds 为生成该结果的实际耗时（用于统计节省时间）"""
+        expires_at = time.time() + self.ttl_seconds
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._put_memory(key, expires_at, value, cost_seconds)
+        self._disk_set(key, expires_at, value, cost_seconds)
+
+    def clear(self):
+        """清空内存层（磁盘层保留）"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        stats["saved_seconds"] = round(stats["saved_seconds"], 3)
+        return stats
+
+    # -------------------------
+    # 内部实现
+    # -------------------------
+    def _put_memory(self, key: str, expires_at: float, value: Dict[str, Any], cost: float):
+        """写入内存层并按 LRU 淘汰（调用方持有锁）"""
+        self._entries[key] = (expires_at, value, cost)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.json"
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, Dict[str, Any], float]]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get("expires_at", 0) <= now:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+        return record["expires_at"], record["value"], record.get("cost", 0.0)
+
+    def _disk_set(self, key: str, expires_at: float, value: Dict[str, Any], cost: float):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"expires_at": expires_at, "cost": cost, "value": value}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[⚠️ ResponseCache] Disk write failed: {e}")
+            return
+        self._maybe_sweep()
+
+    def _maybe_sweep(self):
+        """写入后按时间间隔或写入量触发磁盘清理（同一时刻只有一个线程清理）"""
+        with self._lock:
+            self._writes_since_sweep += 1
+            due = (time.monotonic() - self._last_sweep >= self.sweep_interval
+                   or (self.max_disk_entries > 0 and self._writes_since_sweep >= max(1, self.max_disk_entries // 10)))
+        if due and self._sweep_lock.acquire(blocking=False):
+            try:
+                self.sweep_disk()
+            finally:
+                self._sweep_lock.release()
+
+    def sweep_disk(self) -> int:
+        """
+        清理磁盘层：删除已过期文件（写入时间 + TTL），再按写入时间从旧到新删除超出 max_disk_entries 的部分。
+        返回删除的文件数。
+        """
+        if not self.disk_dir:
+            return 0
+        with self._lock:
+            self._last_sweep = time.monotonic()
+            self._writes_since_sweep = 0
+        files = []
+        for path in self.disk_dir.glob("*.json"):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except OSError:
+                continue  # 并发删除
+        files.sort()
+
+        cutoff = time.time() - self.ttl_seconds
+        excess = len(files) - self.max_disk_entries if self.max_disk_entries > 0 else 0
+        removed = 0
+        for index, (mtime, path) in enumerate(files):
+            if mtime >= cutoff and index >= excess:
+                break
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass
+        if removed:
+            with self._lock:
+                self._stats["disk_evictions"] += removed
+        return removed
+
+
+# -------------------------
+# 🔧 全局默认缓存（环境变量配置）
+# -------------------------
+_default_cache: Optional[ResponseCache] = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> ResponseCache:
+    """
+    获取进程级共享缓存。
+    环境变量：
+      - INTENT_CACHE_SIZE：内存条目上限（默认 512）；
+      - INTENT_CACHE_TTL：过期秒数（默认 3600）；
+      - INTENT_CACHE_DIR：磁盘层目录（为空则不启用）；
+      - INTENT_CACHE_DISK_MAX_ENTRIES：磁盘层文件数上限（默认 10000，0 为不限）。
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache(
+                max_entries=int(os.environ.get("INTENT_CACHE_SIZE", "512")),
+                ttl_seconds=float(os.environ.get("INTENT_CACHE_TTL", "3600")),
+                disk_dir=os.environ.get("INTENT_CACHE_DIR") or None,
+                max_disk_entries=int(os.environ.get("INTENT_CACHE_DISK_MAX_ENTRIES", "10000")),
+            )
+        return _default_cache
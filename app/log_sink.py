@@ -0,0 +1,168 @@
+# ==========================================
+# Module: Structured Request Log Sink
+# File: app/log_sink.py
+# ==========================================
+# 🧩 功能概述：
+#   - 每个事件写一行 JSON（含 request_id），替代 last_*.json 的整文件覆盖；
+#   - 请求线程只负责入队，序列化与磁盘写入由后台线程完成；
+#   - Base64 大字段替换为摘要 + 大小，日志体积与媒体大小无关；
+#   - 按文件大小自动轮转。
+#   - 流式生成器经 bind_request_id 在每次恢复时保持同一请求 ID。
+# ==========================================
+
+import atexit
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Any, Iterator, Optional, TypeVar
+
+LOG_PATH = os.environ.get("REQUEST_LOG_PATH", "output/logs/requests.jsonl")
+LOG_MAX_BYTES = int(os.environ.get("REQUEST_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.environ.get("REQUEST_LOG_BACKUPS", "5"))
+
+T = TypeVar("T")
+
+# 当前请求 ID（随 contextvars 在线程 / 协程间传递）
+_request_id: ContextVar[str] = ContextVar("request_id", default="")
+
+
+def make_request_id() -> str:
+    """生成新的请求 ID（不修改当前上下文）"""
+    return uuid.uuid4().hex[:16]
+
+
+def new_request_id() -> str:
+    """生成新的请求 ID 并设为当前上下文的请求 ID"""
+    rid = make_request_id()
+    _request_id.set(rid)
+    return rid
+
+
+def get_request_id() -> str:
+    return _request_id.get()
+
+
+def set_request_id(rid: str):
+    """设置当前上下文的请求 ID（返回 token，可用于 reset）"""
+    return _request_id.set(rid)
+
+
+def bind_request_id(rid: str, iterator: Iterator[T]) -> Iterator[T]:
+    """
+    在每次恢复生成器时重新进入请求 ID。
+    Gradio / anyio 每次 next() 都在新复制的上下文中执行，生成器内部设置的 contextvar 不会保留到下一步。
+    """
+    try:
+        while True:
+            token = _request_id.set(rid)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                _request_id.reset(token)
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            token = _request_id.set(rid)
+            try:
+                close()
+            finally:
+                _request_id.reset(token)
+
+
+def redact_blobs(obj: Any) -> Any:
+    """
+    递归替换 *_base64 字段为 {"sha256", "bytes"}。
+    若同级存在 *_digest 字段则直接复用，避免重复哈希。
+    """
+    if isinstance(obj, dict):
+        out = {}
+        for key, value in obj.items():
+            if key.endswith("_base64") and isinstance(value, str):
+                if not value:
+                    out[key] = None
+                    continue
+                digest = obj.get(key[:-len("_base64")] + "_digest")
+                out[key] = {
+                    "sha256": digest or hashlib.sha256(value.encode("utf-8")).hexdigest(),
+                    "bytes": len(value),
+                }
+            else:
+                out[key] = redact_blobs(value)
+        return out
+    if isinstance(obj, list):
+        return [redact_blobs(v) for v in obj]
+    return obj
+
+
+class _JsonLineFormatter(logging.Formatter):
+    """在后台线程中将事件字典序列化为单行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, ensure_ascii=False, default=str)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """直接入队原始记录，将格式化推迟到监听线程"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_logger: Optional[logging.Logger] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_init_lock = threading.Lock()
+
+
+def _get_logger() -> logging.Logger:
+    global _logger, _listener
+    if _logger is not None:
+        return _logger
+    with _init_lock:
+        if _logger is None:
+            Path(LOG_PATH).parent.mkdir(parents=True, exist_ok=True)
+            file_handler = logging.handlers.RotatingFileHandler(
+                LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+            )
+            file_handler.setFormatter(_JsonLineFormatter())
+
+            log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+            _listener = logging.handlers.QueueListener(log_queue, file_handler)
+            _listener.start()
+            atexit.register(shutdown)
+
+            logger = logging.getLogger("emergency.requests")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(_DeferredQueueHandler(log_queue))
+            _logger = logger
+    return _logger
+
+
+def log_event(event: str, **fields: Any):
+    """记录一条结构化事件（非阻塞，仅入队）"""
+    record: Dict[str, Any] = {
+        "ts": round(time.time(), 3),
+        "request_id": get_request_id(),
+        "event": event,
+    }
+    record.update(fields)
+    _get_logger().info(record)
+
+
+def shutdown():
+    """停止后台线程并刷新剩余日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
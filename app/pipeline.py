@@ -3,34 +3,267 @@
 # File: app/pipeline.py
 # ==========================================
 # 🧩 功能概述：
-#   - 串联系统主执行流程；
+#   - 以依赖图（DAG）串联系统主执行流程，独立的智能体阶段并发执行；
+#   - 各阶段结果由增量聚合器合并为决策摘要，可视化在后台渲染；
+#   - 端到端与各阶段耗时计入 telemetry（/metrics）；
 #   - 负责模块间数据传递与日志；
-#   - 提供给可视化界面的统一调用入口。
+#   - 提供给可视化界面的统一调用入口；
+#   - 提供 asyncio 原生的异步入口；
+#   - 提供按阶段推送进度事件的流式入口；
+#   - 每次完成的结果写入事件库（app/incident_store.py），供历史查询。
 # ==========================================
 
+import asyncio
+import os
+import queue
+import threading
+import time
+from contextvars import copy_context
+from typing import Dict, Any, Iterator, Iterable, List, Callable, Optional
+from app.log_sink import new_request_id, make_request_id, bind_request_id, log_event
+from executor import DAGScheduler, Stage, STATUS_OK
+from aggregator import IncrementalAggregator
+from app.telemetry import span, record_span, STAGE_SECONDS, REQUESTS
+from app.incident_store import record_incident
 from planner.multimodal_input import parse_multimodal_input
-from planner.intent_recognition import recognize_intent
+from planner.intent_recognition import recognize_intent, recognize_intent_async, recognize_intent_stream
 
+# 默认端到端截止时间（秒），为空表示不限
+DEFAULT_DEADLINE_S = float(os.environ["PIPELINE_DEADLINE_S"]) if os.environ.get("PIPELINE_DEADLINE_S") else None
+# 流式入口在 "done" 之后等待可视化渲染的最长时间（秒），超时未完成的图表不返回
+RENDER_WAIT_S = float(os.environ.get("RENDER_WAIT_S", "2"))
 
-def run_full_pipeline(text, image, audio, api_key=None):
+
+# 下游智能体阶段注册表（如风险评估 / 疏散规划 / 资源调度），由调度器按依赖并发执行
+AGENT_STAGES: List[Stage] = []
+
+
+def register_agent_stage(name: str,
+                         fn: Callable[[Dict[str, Any]], Any],
+                         deps: Iterable[str] = ("intent",),
+                         timeout: Optional[float] = None):
+    """
+    注册下游智能体阶段。
+    fn 接收 {"input": 原始输入, "parse": 解析结果, "intent": 意图结果, <其他上游>: ...}。
+    """
+    AGENT_STAGES.append(Stage(name, fn, deps=deps, timeout=timeout))
+
+
+def build_pipeline_dag(api_key=None, deadline: Optional[float] = None) -> DAGScheduler:
+    """构建主流程依赖图：parse → intent → 已注册的智能体阶段"""
+
+    def parse_stage(inputs: Dict[str, Any]) -> Dict[str, Any]:
+        print("🔹 Step 1: Parsing multimodal input...")
+        return parse_multimodal_input(**inputs["input"])
+
+    def intent_stage(inputs: Dict[str, Any]) -> Dict[str, Any]:
+        print("🔹 Step 2: Recognizing intent (via GPT-4o)...")
+        return recognize_intent(inputs["parse"], api_key=api_key, deadline=deadline)
+
+    stages = [
+        Stage("parse", parse_stage),
+        Stage("intent", intent_stage, deps=("parse",)),
+    ] + list(AGENT_STAGES)
+    return DAGScheduler(stages)
+
+
+def run_full_pipeline(text, image, audio, api_key=None, deadline_s=DEFAULT_DEADLINE_S, visuals=False):
     """
     系统执行主流程：
       1️⃣ 多模态输入解析；
       2️⃣ 基于 GPT-4o 的意图识别；
-      3️⃣ 返回标准化输出。
+      3️⃣ 已注册的智能体阶段（按依赖图并发执行）；
+      4️⃣ 返回标准化输出。
+    deadline_s 为端到端时间预算（秒），下传至模型调用的重试 / 对冲策略。
+    visuals=True 时在后台渲染图表：visual_outputs 为返回时已完成的文件，
+    visual_pending 为仍在渲染的文件路径（不等待）。
     """
+    deadline = time.monotonic() + deadline_s if deadline_s else None
+    request_id = new_request_id()
+    log_event("request_start", has_text=bool(text), has_image=image is not None, has_audio=bool(audio))
+
+    aggregator = IncrementalAggregator(request_id, render_visuals=visuals)
+    dag = build_pipeline_dag(api_key=api_key, deadline=deadline)
+    with span("pipeline", entry="sync"):
+        stage_results = dag.run({"text": text, "image": image, "audio": audio},
+                                on_stage_complete=_aggregate_callback(aggregator))
+    for core in ("parse", "intent"):
+        if stage_results[core]["status"] != STATUS_OK:
+            REQUESTS.inc(entry="sync", outcome=stage_results[core]["status"])
+            raise RuntimeError(f"Stage '{core}' {stage_results[core]['status']}: {stage_results[core]['error']}")
+
+    REQUESTS.inc(entry="sync", outcome="ok")
+    log_event("stages_done", stages={name: {"status": r["status"], "seconds": r["seconds"]}
+                                     for name, r in stage_results.items()})
+    final_summary = aggregator.snapshot()
+    record_incident(request_id, stage_results["parse"]["output"], stage_results["intent"]["output"], final_summary)
+    return {
+        "request_id": request_id,
+        "final_summary": final_summary,
+        "visual_outputs": aggregator.visual_outputs(),
+        "visual_pending": aggregator.pending_visuals(),
+    }
+
+
+def _aggregate_callback(aggregator: IncrementalAggregator, updates: "queue.Queue" = None, prefilled: bool = False):
+    """
+    阶段完成回调：合并结果、提交意图置信度图，并可选地推送字段增量。
+    prefilled=True 表示 parse / intent 已在依赖图之外完成（流式 / 异步入口），不记录其耗时。
+    """
+
+    def on_stage_complete(name: str, stage_result: Dict[str, Any]):
+        if not prefilled or name not in ("parse", "intent"):
+            STAGE_SECONDS.observe(stage_result["seconds"], stage=name, status=stage_result["status"])
+        aggregator.on_stage_complete(name, stage_result)
+        if name == "intent" and stage_result["status"] == STATUS_OK:
+            aggregator.request_visual("confidence_bar", stage_result["output"])
+        if updates is not None and name not in ("parse", "intent"):
+            updates.put((name, stage_result["status"]))
+
+    return on_stage_complete
+
+
+def _agent_dag(multimodal_data: Dict[str, Any], intent_result: Dict[str, Any]) -> DAGScheduler:
+    """以已完成的解析 / 意图结果作为前置阶段，构建已注册智能体阶段的依赖图"""
+    return DAGScheduler([
+        Stage("parse", lambda _: multimodal_data),
+        Stage("intent", lambda _: intent_result, deps=("parse",)),
+    ] + list(AGENT_STAGES))
+
+
+def _ok(output: Any) -> Dict[str, Any]:
+    return {"status": STATUS_OK, "output": output, "error": "", "seconds": 0.0}
+
+
+def run_full_pipeline_stream(text, image, audio, api_key=None, deadline_s=DEFAULT_DEADLINE_S,
+                             request_id: Optional[str] = None, visuals=False) -> Iterator[Dict[str, Any]]:
+    """
+    流式执行主流程，按阶段产出事件：
+      - {"stage": "input_parsed", ...}：输入解析完成；
+      - {"stage": "intent_partial", "text": ...}：模型输出片段（累计文本）；
+      - {"stage": "intent_final", "result": ...}：结构化意图结果；
+      - {"stage": "summary_update", "agent": ..., "summary": ...}：智能体完成后的合并摘要；
+      - {"stage": "done", "result": ...}：与 run_full_pipeline 相同的完整输出；
+      - {"stage": "visuals", "visual_outputs": [...]}：visuals=True 且 "done" 时仍有图表在渲染时，
+        最多等待 RENDER_WAIT_S 后推送全部已完成的图表。
+    deadline_s 同 run_full_pipeline：首段输出前可重试 / 对冲，之后按剩余时间限时。
+    request_id 可由调用方指定（默认新生成），每次恢复生成器时都会重新进入该 ID。
+    """
+    request_id = request_id or make_request_id()
+    return bind_request_id(request_id,
+                           _pipeline_stream(text, image, audio, api_key, deadline_s, request_id, visuals))
+
+
+def _pipeline_stream(text, image, audio, api_key, deadline_s, request_id: str,
+                     visuals: bool) -> Iterator[Dict[str, Any]]:
+    deadline = time.monotonic() + deadline_s if deadline_s else None
+    log_event("request_start", has_text=bool(text), has_image=image is not None, has_audio=bool(audio))
+    start = time.perf_counter()
+
     print("🔹 Step 1: Parsing multimodal input...")
     multimodal_data = parse_multimodal_input(text, image, audio)
+    yield {
+        "stage": "input_parsed",
+        "request_id": request_id,
+        "input_summary": multimodal_data.get("input_summary", ""),
+    }
 
-    print("🔹 Step 2: Recognizing intent (via GPT-4o)...")
-    intent_result = recognize_intent(multimodal_data, api_key=api_key)
+    print("🔹 Step 2: Recognizing intent (via GPT-4o, streaming)...")
+    intent_result: Dict[str, Any] = {}
+    for kind, payload in recognize_intent_stream(multimodal_data, api_key=api_key, deadline=deadline):
+        if kind == "partial":
+            yield {"stage": "intent_partial", "request_id": request_id, "text": payload}
+        else:
+            intent_result = payload
+            yield {"stage": "intent_final", "request_id": request_id, "result": intent_result}
 
-    # ⚙️ 预留后续模块
-    return {
-        "final_summary": intent_result,
-        "visual_outputs": []  # aggregator 接口占位
+    # 已注册的智能体阶段在后台按依赖图执行，每完成一个即推送合并后的摘要
+    aggregator = IncrementalAggregator(request_id, render_visuals=visuals)
+    updates: "queue.Queue" = queue.Queue()
+    callback = _aggregate_callback(aggregator, updates, prefilled=True)
+
+    if not AGENT_STAGES:
+        callback("intent", _ok(intent_result))
+    else:
+        dag = _agent_dag(multimodal_data, intent_result)
+        done_marker = object()
+
+        def run_agents():
+            try:
+                dag.run({"text": text, "image": image, "audio": audio}, on_stage_complete=callback)
+            finally:
+                updates.put(done_marker)
+
+        threading.Thread(target=copy_context().run, args=(run_agents,), name="agent-stages", daemon=True).start()
+        completed = 0
+        while True:
+            item = updates.get()
+            if item is done_marker:
+                break
+            completed += 1
+            name, status = item
+            yield {
+                "stage": "summary_update",
+                "request_id": request_id,
+                "agent": name,
+                "status": status,
+                "progress": f"{completed}/{len(AGENT_STAGES)}",
+                "summary": aggregator.snapshot(),
+            }
+
+    result = {
+        "request_id": request_id,
+        "final_summary": aggregator.snapshot(),
+        "visual_outputs": aggregator.visual_outputs(),
+        "visual_pending": aggregator.pending_visuals(),
     }
+    record_incident(request_id, multimodal_data, intent_result, result["final_summary"])
+    # 生成器跨多次 yield，不持有 span 上下文，结束时直接记录端到端耗时
+    record_span("pipeline", time.perf_counter() - start, entry="stream")
+    REQUESTS.inc(entry="stream", outcome="ok")
+    yield {"stage": "done", "request_id": request_id, "result": result}
+
+    if result["visual_pending"]:
+        yield {"stage": "visuals", "request_id": request_id,
+               "visual_outputs": aggregator.visual_outputs(timeout=RENDER_WAIT_S)}
+
+
+async def run_full_pipeline_async(text, image, audio, api_key=None, deadline_s=DEFAULT_DEADLINE_S, visuals=False):
+    """
+    异步执行主流程（输出与 run_full_pipeline 相同）：
+      - 输入解析（CPU/IO 密集）放入线程执行；
+      - 意图识别走共享连接池的异步客户端（deadline_s 同 run_full_pipeline）；
+      - 已注册的智能体阶段按依赖图在线程中执行，结果经增量聚合器合并。
+    """
+    deadline = time.monotonic() + deadline_s if deadline_s else None
+    request_id = new_request_id()
+    log_event("request_start", has_text=bool(text), has_image=image is not None, has_audio=bool(audio))
+
+    aggregator = IncrementalAggregator(request_id, render_visuals=visuals)
+    callback = _aggregate_callback(aggregator, prefilled=True)
+    with span("pipeline", entry="async"):
+        print("🔹 Step 1: Parsing multimodal input...")
+        multimodal_data = await asyncio.to_thread(parse_multimodal_input, text, image, audio)
+
+        print("🔹 Step 2: Recognizing intent (via GPT-4o, async)...")
+        intent_result = await recognize_intent_async(multimodal_data, api_key=api_key, deadline=deadline)
 
+        if AGENT_STAGES:
+            dag = _agent_dag(multimodal_data, intent_result)
+            await asyncio.to_thread(dag.run, {"text": text, "image": image, "audio": audio},
+                                    on_stage_complete=callback)
+        else:
+            callback("intent", _ok(intent_result))
+    REQUESTS.inc(entry="async", outcome="ok")
+
+    final_summary = aggregator.snapshot()
+    record_incident(request_id, multimodal_data, intent_result, final_summary)
+    return {
+        "request_id": request_id,
+        "final_summary": final_summary,
+        "visual_outputs": aggregator.visual_outputs(),
+        "visual_pending": aggregator.pending_visuals(),
+    }
 
 if __name__ == "__main__":
     demo = run_full_pipeline(
@@ -0,0 +1,325 @@
+# ==========================================
+# Module: Pipeline Telemetry
+# File: app/telemetry.py
+# ==========================================
+# 🧩 功能概述：
+#   - span()：热路径计时片段，按 request_id 与父片段关联，结束时写入 requests.jsonl；
+#   - 进程内指标：延迟 / 载荷大小直方图、token 与错误计数器；
+#   - 以 Prometheus 文本格式在独立 HTTP 端口暴露 /metrics（与 Gradio 并行运行）；
+#   - 抓取时附带响应缓存、JSON 解析与模型路由器统计。
+#
+# 用法：
+#   with span("parse_image"):
+#       ...
+#   start_metrics_server()   # 默认 127.0.0.1:9464，METRICS_PORT=0 关闭
+#   需由其他主机（如 Prometheus）抓取时显式设置 METRICS_HOST=0.0.0.0
+# ==========================================
+
+import functools
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+from app.log_sink import log_event
+
+# 默认仅本机可访问：指标含请求量与内部阶段信息，对外暴露需部署方显式开启
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9464"))
+# 是否将每个片段写入请求日志（指标始终记录）
+TRACE_SPANS = os.environ.get("TRACE_SPANS", "1") not in ("0", "false", "False")
+
+# 延迟桶（秒）与载荷大小桶（字节）
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = tuple(float(4 ** i * 256) for i in range(10))  # 256 B … 64 MB
+
+LabelValues = Tuple[str, ...]
+
+
+class Counter:
+    """单调递增计数器"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = tuple(str(labels.get(l, "")) for l in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, dict(zip(self.labels, key)), value) for key, value in items]
+
+
+class Histogram:
+    """累积分桶直方图（Prometheus 语义）"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [各桶计数..., +Inf 计数, 总和]
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels.get(l, "")) for l in self.labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            row[idx] += 1
+            row[-1] += value
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            items = [(key, list(row)) for key, row in self._values.items()]
+        out = []
+        for key, row in items:
+            base = dict(zip(self.labels, key))
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (math.inf,), row[:-1]):
+                cumulative += count
+                out.append((f"{self.name}_bucket", {**base, "le": _format_bound(bound)}, cumulative))
+            out.append((f"{self.name}_sum", base, row[-1]))
+            out.append((f"{self.name}_count", base, cumulative))
+        return out
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == math.inf else repr(float(bound))
+
+
+# -------------------------
+# 📏 指标定义
+# -------------------------
+SPAN_SECONDS = Histogram("pipeline_span_seconds", "Duration of instrumented pipeline spans.", ["span"])
+SPAN_ERRORS = Counter("pipeline_span_errors_total", "Spans that raised an exception.", ["span", "error"])
+STAGE_SECONDS = Histogram("pipeline_stage_seconds", "Duration of DAG stages by final status.", ["stage", "status"])
+PAYLOAD_BYTES = Histogram("pipeline_payload_bytes", "Payload sizes on the hot path.", ["kind"], buckets=SIZE_BUCKETS)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported by the model API.", ["model", "type"])
+REQUESTS = Counter("pipeline_requests_total", "Pipeline runs by entry point and outcome.", ["entry", "outcome"])
+
+_METRICS: List[Any] = [SPAN_SECONDS, SPAN_ERRORS, STAGE_SECONDS, PAYLOAD_BYTES, LLM_TOKENS, REQUESTS]
+
+# 抓取时调用的外部统计采集函数：返回 [(指标名, 类型, 说明, [(标签, 值), ...]), ...]
+_COLLECTORS: List[Callable[[], List[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]] = []
+
+
+def register_metric(metric: Any):
+    """注册其他模块定义的 Counter / Histogram，使其出现在 /metrics 中"""
+    if metric not in _METRICS:
+        _METRICS.append(metric)
+
+
+def register_collector(fn: Callable[[], List[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]):
+    """注册抓取时采集的外部统计"""
+    _COLLECTORS.append(fn)
+
+
+# -------------------------
+# ⏱️ 片段（Span）
+# -------------------------
+_current_span: ContextVar[Optional[Dict[str, Any]]] = ContextVar("current_span", default=None)
+_span_seq = 0
+_span_lock = threading.Lock()
+
+
+def _next_span_id() -> int:
+    global _span_seq
+    with _span_lock:
+        _span_seq += 1
+        return _span_seq
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """
+    计时片段。
+    yield 出的字典可在片段内追加属性（如载荷大小）；
+    结束时记录延迟直方图，异常时计入错误计数并原样抛出。
+    """
+    parent = _current_span.get()
+    current = {"span_id": _next_span_id(), "attrs": dict(attrs)}
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    error: Optional[BaseException] = None
+    try:
+        yield current["attrs"]
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_span.reset(token)
+        record_span(name, time.perf_counter() - start, error, span_id=current["span_id"],
+                    parent_id=parent["span_id"] if parent else None, **current["attrs"])
+
+
+def record_span(name: str, seconds: float, error: Optional[BaseException] = None,
+                span_id: Optional[int] = None, parent_id: Optional[int] = None, **attrs: Any):
+    """
+    记录一个已结束的片段。
+    供无法使用 with 块的场景（如跨多次 yield 的流式生成器）直接调用。
+    """
+    SPAN_SECONDS.observe(seconds, span=name)
+    if error is not None:
+        SPAN_ERRORS.inc(span=name, error=type(error).__name__)
+    if TRACE_SPANS:
+        if span_id is None:
+            parent = _current_span.get()
+            span_id, parent_id = _next_span_id(), parent["span_id"] if parent else None
+        log_event("span", span=name, span_id=span_id, parent_id=parent_id, seconds=round(seconds, 6),
+                  status="error" if error is not None else "ok", **attrs)
+
+
+def traced(name: str):
+    """将函数整体包裹为一个片段的装饰器"""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def observe_payload(kind: str, size: Optional[float]):
+    """记录载荷大小（字节 / 字符）"""
+    if size:
+        PAYLOAD_BYTES.observe(float(size), kind=kind)
+
+
+def record_tokens(model: str, usage: Optional[Dict[str, Any]]):
+    """记录模型 API 返回的 usage"""
+    if not usage:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage.get(kind):
+            LLM_TOKENS.inc(usage[kind], model=model, type=kind.replace("_tokens", ""))
+
+
+# -------------------------
+# 📤 Prometheus 文本输出
+# -------------------------
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_sample(name: str, labels: Dict[str, str], value: float) -> str:
+    label_text = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+    return f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}"
+
+
+def _builtin_collectors() -> List[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]:
+    """响应缓存 / JSON 解析 / 模型路由统计（抓取时延迟导入，避免循环依赖）"""
+    families = []
+    try:
+        from planner.intent_recognition import get_intent_cache_stats
+        stats = get_intent_cache_stats()
+        for key in ("hits", "disk_hits", "misses", "evictions", "expirations"):
+            families.append((f"intent_cache_{key}_total", "counter", f"Intent response cache {key}.",
+                             [({}, stats.get(key, 0))]))
+        families.append(("intent_cache_entries", "gauge", "Entries in the in-memory intent cache.",
+                         [({}, stats.get("size", 0))]))
+    except Exception as e:
+        print(f"[⚠️ Telemetry] Cache stats unavailable: {e}")
+    try:
+        from app.llm_service.json_extract import get_parse_stats
+        stats = get_parse_stats()
+        families.append(("llm_json_parses_total", "counter", "Model outputs parsed by outcome.",
+                         [({"outcome": k}, stats[k]) for k in ("direct", "extracted", "invalid_json", "schema_errors")]))
+    except Exception as e:
+        print(f"[⚠️ Telemetry] Parse stats unavailable: {e}")
+    try:
+        from app.llm_service.model_router import get_router
+        snapshot = get_router().snapshot()
+        for field in ("p50", "p95", "error_rate", "healthy"):
+            samples = [({"backend": name}, float(info[field])) for name, info in snapshot.items()]
+            if samples:
+                families.append((f"llm_backend_{field}", "gauge", f"Router backend {field} (recent window).", samples))
+    except Exception as e:
+        print(f"[⚠️ Telemetry] Router stats unavailable: {e}")
+    return families
+
+
+def render_prometheus() -> str:
+    """生成 Prometheus 文本格式（0.0.4）"""
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(_format_sample(n, labels, value) for n, labels, value in metric.samples())
+    for collector in [_builtin_collectors] + _COLLECTORS:
+        try:
+            families = collector()
+        except Exception as e:
+            print(f"[⚠️ Telemetry] Collector failed: {e}")
+            continue
+        for name, kind, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(_format_sample(name, labels, value) for labels, value in samples)
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------
+# 🌐 指标端点
+# -------------------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT) -> Optional[ThreadingHTTPServer]:
+    """在后台线程启动 /metrics 端点（幂等；port=0 时不启动）"""
+    global _server
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                print(f"[⚠️ Telemetry] Metrics endpoint not started on {host}:{port}: {e}")
+                return None
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+            _server = server
+            print(f"[INFO] Metrics available at http://{host}:{port}/metrics")
+    return _server
@@ -0,0 +1,497 @@
+# ==========================================
+# Module: Pipeline Worker Pool
+# File: app/worker_pool.py
+# ==========================================
+# 🧩 功能概述：
+#   - 多进程部署模式：run_full_pipeline 任务经本地任务队列分发给若干工作进程，
+#     图像编码 / Base64 等 CPU 密集步骤不再与界面事件循环争用同一个 GIL；
+#   - 工作进程预热启动：预先导入 pipeline / PIL / numpy / openai 并创建共享资源，
+#     首个任务无需承担导入开销；
+#   - 支持普通任务（返回 Future）与流式任务（逐个转发阶段事件到界面进程，
+#     界面提前关闭或长时间无事件时取消任务）；
+#   - 健康检查：心跳超时 / 任务超时 / 进程退出时终止并自动重启该进程，
+#     未产出事件的任务自动重试一次；
+#   - 进程池状态通过 /metrics 导出（存活数、排队数、重启次数）。
+#
+# 启用：PIPELINE_WORKERS=<进程数>（"auto" 为 CPU 核数，0 为在界面进程内执行，默认 0）
+# 说明：各工作进程的 telemetry 指标留在进程内，/metrics 只包含界面进程与进程池状态；
+#       通过 register_agent_stage 注册的智能体阶段需列入 PIPELINE_WORKER_INIT
+#       （逗号分隔的模块名），由工作进程启动时导入注册。
+# ==========================================
+
+import atexit
+import importlib
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, Any, Iterator, Optional, Sequence
+
+from app.telemetry import register_collector
+
+HEARTBEAT_INTERVAL = 1.0
+# 工作进程心跳超时（秒），超过视为卡死
+HEARTBEAT_TIMEOUT = float(os.environ.get("PIPELINE_WORKER_HEARTBEAT_TIMEOUT", "15"))
+# 单个任务最长执行时间（秒）
+JOB_TIMEOUT = float(os.environ.get("PIPELINE_WORKER_JOB_TIMEOUT", "300"))
+# 进程异常退出后重启的最长退避时间（秒）
+MAX_RESTART_BACKOFF = 30.0
+
+_DONE = object()
+
+
+class WorkerError(RuntimeError):
+    """任务在工作进程中失败，或工作进程崩溃 / 超时"""
+
+
+# -------------------------
+# 🧵 工作进程
+# -------------------------
+def _warm_start(init_modules: Sequence[str]) -> Dict[str, Any]:
+    """预先导入重型依赖并创建共享资源，返回各步耗时"""
+    timings = {}
+
+    def timed(name, fn):
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            print(f"[⚠️ Worker] Warm-up step '{name}' skipped: {e}")
+        timings[name] = round(time.perf_counter() - start, 3)
+
+    def import_media():
+        import numpy  # noqa: F401
+        from PIL import Image, JpegImagePlugin, PngImagePlugin, WebPImagePlugin  # noqa: F401
+
+    def import_llm_sdk():
+        # 客户端按请求创建（凭证随请求传入），此处只预先导入 SDK 与各客户端模块
+        import openai  # noqa: F401
+        import app.llm_service.model_registry  # noqa: F401
+
+    def create_stores():
+        from planner.media_store import get_media_store
+        from app.llm_service.response_cache import get_default_cache
+        get_media_store()
+        get_default_cache()
+
+    timed("pipeline", lambda: importlib.import_module("app.pipeline"))
+    timed("media", import_media)
+    timed("llm_sdk", import_llm_sdk)
+    timed("stores", create_stores)
+    for module in init_modules:
+        timed(module, lambda: importlib.import_module(module))
+    return timings
+
+
+def _worker_main(jobs, conn, init_modules: Sequence[str]):
+    """
+    工作进程入口：预热后循环执行任务，结果 / 事件经本进程专用管道写回。
+    每个进程使用独立管道：进程被强制终止时不会破坏其他进程的结果通道。
+    """
+    # 工作进程为守护进程，音频归一化在本进程内直接执行（见 media_preprocess.audio_workers）
+    send_lock = threading.Lock()
+
+    def send(*message):
+        with send_lock:
+            conn.send(message)
+
+    def heartbeat():
+        while True:
+            send("heartbeat", None, None)
+            time.sleep(HEARTBEAT_INTERVAL)
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+
+    start = time.perf_counter()
+    timings = _warm_start(init_modules)
+    send("ready", None, {"pid": os.getpid(), "warm_seconds": round(time.perf_counter() - start, 3),
+                         "warm_steps": timings})
+
+    from app.pipeline import run_full_pipeline, run_full_pipeline_stream
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, mode, kwargs = job
+        try:
+            if mode == "stream":
+                for event in run_full_pipeline_stream(**kwargs):
+                    send("event", job_id, event)
+                send("done", job_id, None)
+            else:
+                send("done", job_id, run_full_pipeline(**kwargs))
+        except Exception as e:
+            send("error", job_id, f"{type(e).__name__}: {e}")
+
+
+# -------------------------
+# 🧭 主进程侧
+# -------------------------
+class _Job:
+    __slots__ = ("job_id", "mode", "kwargs", "future", "events", "attempts", "emitted", "started_at")
+
+    def __init__(self, job_id: int, mode: str, kwargs: Dict[str, Any]):
+        self.job_id = job_id
+        self.mode = mode
+        self.kwargs = kwargs
+        self.future: Optional[Future] = Future() if mode == "run" else None
+        self.events: Optional["queue.Queue"] = queue.Queue() if mode == "stream" else None
+        self.attempts = 0
+        self.emitted = False
+        self.started_at = 0.0
+
+    def fail(self, error: BaseException):
+        if self.future is not None:
+            if not self.future.done():
+                self.future.set_exception(error)
+        else:
+            self.events.put(error)
+
+    def complete(self, result: Any):
+        if self.future is not None:
+            if not self.future.done():
+                self.future.set_result(result)
+        else:
+            self.events.put(_DONE)
+
+
+class _Worker:
+    __slots__ = ("worker_id", "process", "jobs", "conn", "state", "job", "last_heartbeat", "jobs_done",
+                 "restarts", "failures", "next_start_at", "warm_seconds", "pid")
+
+    def __init__(self, worker_id: int):
+        self.worker_id = worker_id
+        self.process = None
+        self.jobs = None
+        self.conn = None
+        self.state = "stopped"  # starting / idle / busy / stopped
+        self.job: Optional[_Job] = None
+        self.last_heartbeat = 0.0
+        self.jobs_done = 0
+        self.restarts = 0
+        self.failures = 0  # 连续启动失败次数（用于退避）
+        self.next_start_at = 0.0
+        self.warm_seconds: Optional[float] = None
+        self.pid: Optional[int] = None
+
+
+class WorkerPool:
+    """pipeline 多进程工作池"""
+
+    def __init__(self, workers: int = 2, init_modules: Sequence[str] = (),
+                 job_timeout: float = JOB_TIMEOUT, heartbeat_timeout: float = HEARTBEAT_TIMEOUT,
+                 max_retries: int = 1):
+        self.size = max(1, workers)
+        self.init_modules = tuple(init_modules)
+        self.job_timeout = job_timeout
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_retries = max_retries
+        self._ctx = multiprocessing.get_context("spawn")  # 服务进程为多线程，避免 fork
+        self._workers = [_Worker(i) for i in range(self.size)]
+        self._pending: "deque[_Job]" = deque()
+        self._jobs: Dict[int, _Job] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "retried": 0, "restarts": 0,
+                       "cancelled": 0}
+
+    # -------------------------
+    # 生命周期
+    # -------------------------
+    def start(self) -> "WorkerPool":
+        with self._lock:
+            for worker in self._workers:
+                self._spawn(worker)
+        threading.Thread(target=self._collect, name="worker-pool-results", daemon=True).start()
+        threading.Thread(target=self._supervise, name="worker-pool-supervisor", daemon=True).start()
+        return self
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """等待所有工作进程完成预热"""
+        end = None if timeout is None else time.monotonic() + timeout
+        while end is None or time.monotonic() < end:
+            with self._lock:
+                if all(w.state in ("idle", "busy") for w in self._workers):
+                    return True
+            time.sleep(0.05)
+        return False
+
+    def shutdown(self, timeout: float = 5.0):
+        """停止接收任务，通知工作进程退出（超时则强制终止）"""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        with self._lock:
+            for job in list(self._pending):
+                job.fail(WorkerError("Worker pool shut down"))
+            self._pending.clear()
+            workers = list(self._workers)
+        for worker in workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.jobs.put(None)
+        for worker in workers:
+            if worker.process is not None:
+                worker.process.join(timeout)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+
+    # -------------------------
+    # 任务接口
+    # -------------------------
+    def submit(self, text=None, image=None, audio=None, api_key=None, **kwargs) -> Future:
+        """提交 run_full_pipeline 任务，返回 Future"""
+        return self._enqueue("run", dict(text=text, image=image, audio=audio, api_key=api_key, **kwargs)).future
+
+    def run(self, text=None, image=None, audio=None, api_key=None, **kwargs) -> Dict[str, Any]:
+        """提交任务并等待结果"""
+        return self.submit(text, image, audio, api_key, **kwargs).result()
+
+    def stream(self, text=None, image=None, audio=None, api_key=None, **kwargs) -> Iterator[Dict[str, Any]]:
+        """
+        在工作进程中执行 run_full_pipeline_stream，逐个产出阶段事件。
+        超过 job_timeout 未收到任何事件时取消任务并抛出 WorkerError；
+        调用方提前关闭生成器时同样取消任务（排队中的直接移除，执行中的不再转发事件）。
+        """
+        job = self._enqueue("stream", dict(text=text, image=image, audio=audio, api_key=api_key, **kwargs))
+        finished = False
+        try:
+            while True:
+                try:
+                    item = job.events.get(timeout=self.job_timeout)
+                except queue.Empty:
+                    raise WorkerError(f"No events from pipeline worker for {self.job_timeout:.0f}s") from None
+                if item is _DONE:
+                    finished = True
+                    return
+                if isinstance(item, BaseException):
+                    finished = True
+                    raise item
+                yield item
+        finally:
+            if not finished:
+                self._cancel(job)
+
+    def health(self) -> Dict[str, Any]:
+        """进程池健康状态"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "size": self.size,
+                "pending": len(self._pending),
+                **self._stats,
+                "workers": [{
+                    "worker_id": w.worker_id,
+                    "pid": w.pid,
+                    "state": w.state,
+                    "alive": w.process is not None and w.process.is_alive(),
+                    "jobs_done": w.jobs_done,
+                    "restarts": w.restarts,
+                    "warm_seconds": w.warm_seconds,
+                    "heartbeat_age": round(now - w.last_heartbeat, 3) if w.last_heartbeat else None,
+                } for w in self._workers],
+            }
+
+    # -------------------------
+    # 内部实现
+    # -------------------------
+    def _enqueue(self, mode: str, kwargs: Dict[str, Any]) -> _Job:
+        if self._stopped.is_set():
+            raise WorkerError("Worker pool is shut down")
+        job = _Job(next(self._ids), mode, kwargs)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._pending.append(job)
+            self._stats["submitted"] += 1
+            self._dispatch()
+        return job
+
+    def _cancel(self, job: _Job):
+        """取消任务：从排队中移除并停止转发其结果（已在执行的任务在工作进程中自然结束）"""
+        with self._lock:
+            if self._jobs.pop(job.job_id, None) is None:
+                return
+            try:
+                self._pending.remove(job)
+            except ValueError:
+                pass
+            self._stats["cancelled"] += 1
+
+    def _spawn(self, worker: _Worker):
+        """启动（或重启）工作进程（调用方持有锁）"""
+        worker.jobs = self._ctx.Queue()
+        worker.conn, child_conn = self._ctx.Pipe(duplex=False)
+        worker.process = self._ctx.Process(
+            target=_worker_main, args=(worker.jobs, child_conn, self.init_modules),
+            name=f"pipeline-worker-{worker.worker_id}", daemon=True,
+        )
+        worker.process.start()
+        child_conn.close()
+        worker.pid = worker.process.pid
+        worker.state = "starting"
+        worker.job = None
+        worker.last_heartbeat = time.monotonic()
+
+    def _dispatch(self):
+        """把排队任务分配给空闲进程（调用方持有锁）"""
+        for worker in self._workers:
+            if not self._pending:
+                return
+            if worker.state == "idle":
+                job = self._pending.popleft()
+                job.attempts += 1
+                job.started_at = time.monotonic()
+                worker.job = job
+                worker.state = "busy"
+                worker.jobs.put((job.job_id, job.mode, job.kwargs))
+
+    def _collect(self):
+        """读取工作进程消息：就绪 / 心跳 / 流式事件 / 结果 / 错误"""
+        while not self._stopped.is_set():
+            with self._lock:
+                conns = {w.conn: w for w in self._workers if w.conn is not None}
+            if not conns:
+                time.sleep(0.1)
+                continue
+            try:
+                ready = multiprocessing.connection.wait(list(conns), timeout=0.5)
+            except (OSError, ValueError):
+                continue  # 管道在等待期间被重启流程关闭
+            for conn in ready:
+                worker = conns[conn]
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    # 进程已退出：由健康检查负责重启
+                    with self._lock:
+                        if worker.conn is conn:
+                            worker.conn = None
+                    continue
+                self._handle(worker, conn, *message)
+
+    def _handle(self, worker: _Worker, conn, kind: str, job_id: Optional[int], payload: Any):
+        with self._lock:
+            if worker.conn is not conn:
+                return  # 已被重启的旧进程残留消息
+            worker.last_heartbeat = time.monotonic()
+            if kind == "ready":
+                worker.state = "idle"
+                worker.failures = 0
+                worker.warm_seconds = payload["warm_seconds"]
+                print(f"[INFO] Pipeline worker {worker.worker_id} ready (pid {payload['pid']}, "
+                      f"warm start {payload['warm_seconds']}s)")
+            elif kind == "event":
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    job.emitted = True
+                    job.events.put(payload)
+            elif kind in ("done", "error"):
+                job = self._jobs.pop(job_id, None)
+                if worker.job is not None and worker.job.job_id == job_id:
+                    worker.job = None
+                    worker.state = "idle"
+                    worker.jobs_done += 1
+                if job is not None:
+                    if kind == "done":
+                        self._stats["completed"] += 1
+                        job.complete(payload)
+                    else:
+                        self._stats["failed"] += 1
+                        job.fail(WorkerError(payload))
+            self._dispatch()
+
+    def _supervise(self):
+        """健康检查：进程退出、心跳超时、任务超时时重启进程"""
+        while not self._stopped.wait(0.5):
+            now = time.monotonic()
+            with self._lock:
+                for worker in self._workers:
+                    if worker.state == "stopped":
+                        if now >= worker.next_start_at:
+                            self._spawn(worker)
+                        continue
+                    reason = None
+                    if not worker.process.is_alive():
+                        reason = f"exited with code {worker.process.exitcode}"
+                    elif now - worker.last_heartbeat > self.heartbeat_timeout:
+                        reason = f"no heartbeat for {now - worker.last_heartbeat:.0f}s"
+                    elif worker.job is not None and now - worker.job.started_at > self.job_timeout:
+                        reason = f"job exceeded {self.job_timeout:.0f}s"
+                    if reason:
+                        self._restart(worker, reason)
+                self._dispatch()
+
+    def _restart(self, worker: _Worker, reason: str):
+        """终止并重启进程；其当前任务未产出事件时重新排队，否则失败（调用方持有锁）"""
+        print(f"[⚠️ WorkerPool] Worker {worker.worker_id} (pid {worker.pid}) {reason}; restarting")
+        if worker.process.is_alive():
+            worker.process.terminate()
+            worker.process.join(1.0)
+        if worker.conn is not None:
+            worker.conn.close()
+            worker.conn = None
+        job = worker.job
+        if job is not None and job.job_id in self._jobs:  # 已取消的任务不再重试
+            if job.attempts <= self.max_retries and not job.emitted:
+                self._stats["retried"] += 1
+                self._pending.appendleft(job)
+            else:
+                self._jobs.pop(job.job_id, None)
+                self._stats["failed"] += 1
+                job.fail(WorkerError(f"Pipeline worker {reason}"))
+        if worker.state == "starting":
+            worker.failures += 1  # 预热阶段就退出：退避后再启动，避免重启风暴
+        worker.restarts += 1
+        self._stats["restarts"] += 1
+        worker.job = None
+        worker.state = "stopped"
+        worker.next_start_at = time.monotonic() + min(MAX_RESTART_BACKOFF, 0.5 * 2 ** worker.failures)
+
+
+# -------------------------
+# 🔧 全局实例（环境变量配置）
+# -------------------------
+def configured_workers() -> int:
+    """PIPELINE_WORKERS：工作进程数（"auto" 为 CPU 核数，0 为不启用）"""
+    value = os.environ.get("PIPELINE_WORKERS", "0").strip().lower()
+    return (os.cpu_count() or 1) if value == "auto" else int(value or 0)
+
+
+def worker_pool_enabled() -> bool:
+    return configured_workers() > 0
+
+
+_pool: Optional[WorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> WorkerPool:
+    """获取（首次调用时启动）进程级共享工作池"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            init_modules = [m.strip() for m in os.environ.get("PIPELINE_WORKER_INIT", "").split(",") if m.strip()]
+            _pool = WorkerPool(workers=max(1, configured_workers()), init_modules=init_modules).start()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def _pool_collector():
+    """/metrics 抓取时导出进程池状态（未启用时不导出）"""
+    if _pool is None:
+        return []
+    health = _pool.health()
+    return [
+        ("pipeline_workers_alive", "gauge", "Live pipeline worker processes.",
+         [({}, float(sum(1 for w in health["workers"] if w["alive"])))]),
+        ("pipeline_jobs_pending", "gauge", "Jobs waiting for a pipeline worker.", [({}, float(health["pending"]))]),
+        ("pipeline_worker_restarts_total", "counter", "Pipeline worker restarts.", [({}, float(health["restarts"]))]),
+    ]
+
+
+register_collector(_pool_collector)
@@ -0,0 +1,8 @@
+# ==========================================
+# Module: Benchmarks Initialization
+# File: benchmarks/__init__.py
+# ==========================================
+# 🧩 模块功能：
+#   - 基准测试套件：本地模拟 LLM 服务 + 延迟 / 吞吐 / 资源基准；
+#   - 入口：python -m benchmarks.run_benchmarks
+# ==========================================
@@ -0,0 +1,245 @@
+# ==========================================
+# Module: Mock LLM Server
+# File: benchmarks/mock_llm_server.py
+# ==========================================
+# 🧩 模块功能：
+#   - 本地模拟 OpenAI chat-completions 接口（含 stream=True 的 SSE 输出）；
+#   - 可配置响应延迟分布（fixed / uniform / exp / lognormal）；
+#   - 按比例注入 HTTP 500 错误与非 JSON 的畸形输出；
+#   - 固定随机种子时延迟与错误序列可复现；
+#   - 识别微批 Prompt（[Reports] 数组），按 index 返回结果列表。
+#
+# 用法：
+#   python -m benchmarks.mock_llm_server --port 8765 --latency lognormal:0.3,0.4 --error-rate 0.05
+#   OPENAI_API_BASE=http://127.0.0.1:8765/v1 python -m app.pipeline
+# ==========================================
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, Callable, Optional
+
+# 模拟的意图识别结果
+MOCK_INTENT = {
+    "explicit_intent": "Predict fire spread and generate an optimal rescue dispatch plan.",
+    "implicit_intent": "Minimize casualties and response time.",
+    "environment_context": "Multi-floor building fire with trapped occupants.",
+    "intent_confidence": 0.9,
+}
+
+
+def _mock_content(body: Dict[str, Any]) -> Dict[str, Any]:
+    """按请求生成回复：微批 Prompt（含 [Reports] 数组）返回按 index 排列的结果列表"""
+    messages = body.get("messages") or [{}]
+    prompt = str(messages[-1].get("content", ""))
+    match = re.search(r"\[Reports\]: (\[.*\])\s*\n", prompt, re.S)
+    if match:
+        try:
+            reports = json.loads(match.group(1))
+            return {"results": [{"index": i, **MOCK_INTENT} for i in range(len(reports))]}
+        except ValueError:
+            pass
+    return MOCK_INTENT
+
+
+def parse_latency_spec(spec: str) -> Callable[[random.Random], float]:
+    """
+    解析延迟分布描述，返回采样函数（秒）：
+      - fixed:S            固定 S 秒；
+      - uniform:A,B        [A, B] 均匀分布；
+      - exp:MEAN           指数分布；
+      - lognormal:MEDIAN,SIGMA  对数正态分布（长尾）。
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()] if params else []
+    try:
+        if kind == "fixed":
+            (seconds,) = values
+            return lambda rng: seconds
+        if kind == "uniform":
+            low, high = values
+            return lambda rng: rng.uniform(low, high)
+        if kind == "exp":
+            (mean,) = values
+            return lambda rng: rng.expovariate(1.0 / mean) if mean > 0 else 0.0
+        if kind == "lognormal":
+            median, sigma = values
+            return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid latency spec: {spec!r}")
+
+
+class MockLLMServer:
+    """可在进程内启动 / 停止的模拟 LLM 服务"""
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 latency: str = "fixed:0.05",
+                 error_rate: float = 0.0,
+                 malformed_rate: float = 0.0,
+                 chunk_chars: int = 16,
+                 chunk_delay: float = 0.005,
+                 seed: Optional[int] = None):
+        self.sample_latency = parse_latency_spec(latency)
+        self.latency_spec = latency
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.chunk_chars = max(1, chunk_chars)
+        self.chunk_delay = chunk_delay
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "streamed": 0, "errors_injected": 0, "malformed_injected": 0}
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def api_base(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def config(self) -> Dict[str, Any]:
+        return {"latency": self.latency_spec, "error_rate": self.error_rate,
+                "malformed_rate": self.malformed_rate, "chunk_chars": self.chunk_chars,
+                "chunk_delay": self.chunk_delay}
+
+    def _plan(self, stream: bool) -> Dict[str, Any]:
+        """为一次请求抽取延迟与注入的故障（持锁保证序列可复现）"""
+        with self._lock:
+            self.stats["requests"] += 1
+            if stream:
+                self.stats["streamed"] += 1
+            latency = max(0.0, self.sample_latency(self._rng))
+            roll = self._rng.random()
+            if roll < self.error_rate:
+                fault = "error"
+                self.stats["errors_injected"] += 1
+            elif roll < self.error_rate + self.malformed_rate:
+                fault = "malformed"
+                self.stats["malformed_injected"] += 1
+            else:
+                fault = None
+        return {"latency": latency, "fault": fault}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/stats":
+                    with server._lock:
+                        self._send_json(200, dict(server.stats))
+                else:
+                    self._send_json(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": {"message": "invalid JSON body"}})
+                    return
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+
+                stream = bool(body.get("stream"))
+                plan = server._plan(stream)
+                time.sleep(plan["latency"])
+                if plan["fault"] == "error":
+                    self._send_json(500, {"error": {"message": "injected server error", "type": "server_error"}})
+                    return
+                if plan["fault"] == "malformed":
+                    content = "Sorry, I cannot provide a structured answer right now."
+                else:
+                    content = json.dumps(_mock_content(body), ensure_ascii=False)
+
+                if stream:
+                    self._send_stream(content, body.get("model", "mock"))
+                else:
+                    self._send_json(200, {
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion",
+                        "model": body.get("model", "mock"),
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": content}}],
+                        "usage": {"prompt_tokens": length // 4, "completion_tokens": len(content) // 4},
+                    })
+
+            def _send_json(self, status: int, payload: Dict[str, Any]):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, content: str, model: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                for i in range(0, len(content), server.chunk_chars):
+                    chunk = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "model": model,
+                             "choices": [{"index": 0, "delta": {"content": content[i:i + server.chunk_chars]},
+                                          "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    if server.chunk_delay:
+                        time.sleep(server.chunk_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock chat-completions server for benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="fixed:0.05", help="fixed:S | uniform:A,B | exp:MEAN | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fraction of requests answered with non-JSON text")
+    parser.add_argument("--chunk-chars", type=int, default=16, help="Characters per streamed chunk")
+    parser.add_argument("--chunk-delay", type=float, default=0.005, help="Delay between streamed chunks (seconds)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = MockLLMServer(host=args.host, port=args.port, latency=args.latency, error_rate=args.error_rate,
+                           malformed_rate=args.malformed_rate, chunk_chars=args.chunk_chars,
+                           chunk_delay=args.chunk_delay, seed=args.seed)
+    print(f"[MockLLM] Serving on {server.api_base} ({args.latency}, error_rate={args.error_rate}, "
+          f"malformed_rate={args.malformed_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
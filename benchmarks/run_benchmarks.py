@@ -0,0 +1,465 @@
+# ==========================================
+# Module: Pipeline Benchmarks
+# File: benchmarks/run_benchmarks.py
+# ==========================================
+# 🧩 功能概述：
+#   - 在本地模拟 LLM 服务上驱动 run_full_pipeline / handle_run，无需真实 API；
+#   - 输入来自 test/example1、JSONL 事件流（默认 requests.jsonl）与不同尺寸的合成图像 / 音频；
+#   - 统计各阶段 p50 / p95 / p99 延迟、N 个并发会话下的吞吐、峰值 RSS 与磁盘写入字节；
+#   - 与已保存的基线比较，超出容差即报告回归并以非零状态码退出。
+#
+# 用法：
+#   python -m benchmarks.run_benchmarks --samples 10 --concurrency 1,4,8
+#   python -m benchmarks.run_benchmarks --latency lognormal:0.3,0.5 --error-rate 0.05
+#   python -m benchmarks.run_benchmarks --update-baseline     # 以本次结果覆盖基线
+#   python -m benchmarks.run_benchmarks --cassette output/cassettes/bench.jsonl   # 首次经模拟服务录制，之后离线回放
+# ==========================================
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from benchmarks.mock_llm_server import MockLLMServer
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = ROOT / "benchmarks" / "baseline.json"
+DEFAULT_REPORT = ROOT / "output" / "benchmarks" / "latest.json"
+EXAMPLE_DIR = ROOT / "test" / "example1"
+
+# 合成媒体规格：图像边长（像素）、音频时长（秒）
+SYNTHETIC_IMAGE_SIDES = (256, 1024, 2048, 4096)
+SYNTHETIC_AUDIO_SECONDS = (5, 30)
+
+# 回归判定：相对容差之外，还需超过绝对下限，避免毫秒级抖动误报
+LATENCY_FLOOR_S = 0.005
+RSS_FLOOR_MB = 5.0
+DISK_FLOOR_MB = 1.0
+
+
+# -------------------------
+# 📐 统计工具
+# -------------------------
+def percentile(samples: List[float], q: float) -> float:
+    """线性插值分位数（q ∈ [0, 100]）"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    pos = (len(ordered) - 1) * q / 100.0
+    low = math.floor(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    return {
+        "count": len(samples),
+        "p50": round(percentile(samples, 50), 4),
+        "p95": round(percentile(samples, 95), 4),
+        "p99": round(percentile(samples, 99), 4),
+        "max": round(max(samples), 4) if samples else 0.0,
+    }
+
+
+def peak_rss_mb() -> Dict[str, Optional[float]]:
+    """本进程与已回收子进程（音频进程池）的峰值 RSS（MB）"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return {"self": None, "children": None}
+    # Linux 下 ru_maxrss 单位为 KB，macOS 为字节
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 2),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 2),
+    }
+
+
+def io_write_bytes() -> Optional[int]:
+    """本进程累计写入存储层的字节数（仅 Linux /proc 可用）"""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("write_bytes:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+# -------------------------
+# 🧪 输入构造
+# -------------------------
+def synth_image(path: Path, side: int, rng: random.Random) -> Path:
+    """生成带噪声的渐变图像（噪声使 PNG 难以压缩，接近真实照片体积）"""
+    from PIL import Image
+
+    base = Image.linear_gradient("L").resize((side, side)).convert("RGB")
+    noise = Image.frombytes("RGB", (side, side), rng.randbytes(side * side * 3))
+    Image.blend(base, noise, 0.3).save(path, format="PNG")
+    return path
+
+
+def synth_audio(path: Path, seconds: int, sample_rate: int = 44100) -> Path:
+    """生成 16-bit 单声道正弦波 WAV（中间插入静音段）"""
+    frames = bytearray()
+    for i in range(seconds * sample_rate):
+        t = i / sample_rate
+        silent = seconds / 3 <= t < seconds / 3 + 1
+        value = 0 if silent else int(8000 * math.sin(2 * math.pi * 440 * t))
+        frames += struct.pack("<h", value)
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(bytes(frames))
+    return path
+
+
+def build_cases(work_dir: Path, feed: Optional[Path], feed_limit: int, seed: int) -> List[Dict[str, Any]]:
+    """组装基准输入：示例用例、事件流记录与合成媒体"""
+    rng = random.Random(seed)
+    cases: List[Dict[str, Any]] = []
+
+    text_file = EXAMPLE_DIR / "user_input1.txt"
+    example_text = text_file.read_text(encoding="utf-8") if text_file.exists() else "Building fire, people trapped."
+    cases.append({"name": "example1_text", "text": example_text, "image": None, "audio": None})
+    image_file, audio_file = EXAMPLE_DIR / "image1.png", EXAMPLE_DIR / "voice.mp3"
+    if image_file.exists() and audio_file.exists():
+        cases.append({"name": "example1_full", "text": example_text,
+                      "image": str(image_file), "audio": str(audio_file)})
+
+    if feed is not None and feed.exists():
+        from app.batch_runner import iter_jsonl, record_to_inputs
+
+        for idx, (_, record, _) in enumerate(r for r in iter_jsonl(str(feed)) if r[1] is not None):
+            if idx >= feed_limit:
+                break
+            cases.append({"name": f"feed_{idx}", **record_to_inputs(record)})
+
+    media_dir = work_dir / "synthetic"
+    media_dir.mkdir(parents=True, exist_ok=True)
+    for side in SYNTHETIC_IMAGE_SIDES:
+        path = synth_image(media_dir / f"image_{side}.png", side, rng)
+        cases.append({"name": f"image_{side}px", "text": example_text, "image": str(path), "audio": None})
+    for seconds in SYNTHETIC_AUDIO_SECONDS:
+        path = synth_audio(media_dir / f"audio_{seconds}s.wav", seconds)
+        cases.append({"name": f"audio_{seconds}s", "text": example_text, "image": None, "audio": str(path)})
+    return cases
+
+
+# -------------------------
+# ⏱️ 基准阶段
+# -------------------------
+def bench_stages(cases: List[Dict[str, Any]], samples: int) -> Dict[str, Any]:
+    """逐用例执行流式 pipeline、run_full_pipeline 与 handle_run，记录各阶段耗时"""
+    from app.pipeline import run_full_pipeline, run_full_pipeline_stream
+    from interface.callbacks.run_pipeline import handle_run
+
+    stages: Dict[str, List[float]] = {}
+    per_case: Dict[str, Dict[str, Any]] = {}
+    errors: Dict[str, int] = {}
+
+    def record(stage: str, seconds: float):
+        stages.setdefault(stage, []).append(seconds)
+
+    for case in cases:
+        inputs = {"text": case["text"], "image": case["image"], "audio": case["audio"]}
+        case_totals: List[float] = []
+        for i in range(samples):
+            # 流式 pipeline：按事件到达时间拆分阶段（首轮为冷启动，媒体尚未进入缓存）
+            start = time.perf_counter()
+            marks: Dict[str, float] = {}
+            try:
+                for event in run_full_pipeline_stream(api_key="bench", **inputs):
+                    marks.setdefault(event["stage"], time.perf_counter() - start)
+            except Exception:
+                errors["stream"] = errors.get("stream", 0) + 1
+            if "input_parsed" in marks:
+                record("parse_cold" if i == 0 else "parse", marks["input_parsed"])
+                if "intent_partial" in marks:
+                    record("first_token", marks["intent_partial"] - marks["input_parsed"])
+                if "intent_final" in marks:
+                    record("intent", marks["intent_final"] - marks["input_parsed"])
+                if "done" in marks and "intent_final" in marks:
+                    record("aggregate", marks["done"] - marks["intent_final"])
+
+            start = time.perf_counter()
+            try:
+                run_full_pipeline(api_key="bench", **inputs)
+                elapsed = time.perf_counter() - start
+                record("pipeline", elapsed)
+                case_totals.append(elapsed)
+            except Exception:
+                errors["pipeline"] = errors.get("pipeline", 0) + 1
+
+            start = time.perf_counter()
+            first_update = None
+            status = ""
+            for updates in handle_run("bench", inputs["text"], inputs["image"], inputs["audio"]):
+                status = updates[2]
+                # 第一次输出是即时的“解析中”提示，之后的首个输出才包含实际进度
+                if first_update is None and updates[0]:
+                    first_update = time.perf_counter() - start
+            record("handle_run", time.perf_counter() - start)
+            if first_update is not None:
+                record("handle_run_first_update", first_update)
+            if not status.startswith("✅"):
+                errors["handle_run"] = errors.get("handle_run", 0) + 1
+
+        per_case[case["name"]] = summarize(case_totals)
+
+    return {"stages": {name: summarize(values) for name, values in stages.items()},
+            "cases": per_case, "errors": errors}
+
+
+def bench_throughput(cases: List[Dict[str, Any]], concurrency_levels: List[int], requests_per_session: int) -> Dict[str, Any]:
+    """N 个并发会话各自连续执行 requests_per_session 次 run_full_pipeline"""
+    from app.pipeline import run_full_pipeline
+
+    results: Dict[str, Any] = {}
+    for sessions in concurrency_levels:
+        latencies: List[float] = []
+        failures = 0
+
+        def session(idx: int):
+            nonlocal failures
+            for j in range(requests_per_session):
+                case = cases[(idx + j) % len(cases)]
+                start = time.perf_counter()
+                try:
+                    run_full_pipeline(case["text"], case["image"], case["audio"], api_key="bench")
+                    latencies.append(time.perf_counter() - start)
+                except Exception:
+                    failures += 1
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions) as pool:
+            list(pool.map(session, range(sessions)))
+        wall = time.perf_counter() - start
+        total = sessions * requests_per_session
+        results[str(sessions)] = {
+            "requests": total,
+            "failures": failures,
+            "seconds": round(wall, 3),
+            "rps": round((total - failures) / wall, 3) if wall > 0 else 0.0,
+            "latency": summarize(latencies),
+        }
+        print(f"[Bench] {sessions:>3} sessions: {results[str(sessions)]['rps']} req/s, "
+              f"p95 {results[str(sessions)]['latency']['p95']}s, {failures} failures")
+    return results
+
+
+# -------------------------
+# 📊 基线比较
+# -------------------------
+def flatten_metrics(report: Dict[str, Any]) -> Dict[str, float]:
+    """提取参与回归比较的指标（越小越好，吞吐取负值统一方向）"""
+    metrics: Dict[str, float] = {}
+    for stage, stats in report["stages"].items():
+        metrics[f"latency.{stage}.p50"] = stats["p50"]
+        metrics[f"latency.{stage}.p95"] = stats["p95"]
+    for sessions, stats in report["throughput"].items():
+        metrics[f"throughput.{sessions}.rps"] = -stats["rps"]
+    if report["resources"]["peak_rss_mb"]["self"] is not None:
+        metrics["resources.peak_rss_mb"] = report["resources"]["peak_rss_mb"]["self"]
+    if report["resources"]["disk_write_mb"] is not None:
+        metrics["resources.disk_write_mb"] = report["resources"]["disk_write_mb"]
+    return metrics
+
+
+def _floor_for(name: str) -> float:
+    if name.startswith("latency."):
+        return LATENCY_FLOOR_S
+    if name == "resources.peak_rss_mb":
+        return RSS_FLOOR_MB
+    if name == "resources.disk_write_mb":
+        return DISK_FLOOR_MB
+    return 0.0
+
+
+def compare_with_baseline(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """返回超出容差的回归项"""
+    if baseline.get("config") != report["config"]:
+        print("[⚠️ Bench] Baseline was recorded with a different configuration; comparison may be misleading.")
+    current, previous = flatten_metrics(report), flatten_metrics(baseline)
+    regressions = []
+    for name, value in current.items():
+        if name not in previous:
+            continue
+        base = previous[name]
+        worse_by = value - base
+        if worse_by > abs(base) * tolerance and worse_by > _floor_for(name):
+            regressions.append({
+                "metric": name,
+                "baseline": abs(base),
+                "current": abs(value),
+                "change": f"{worse_by / abs(base) * 100:+.1f}%" if base else "n/a",
+            })
+    return regressions
+
+
+def print_report(report: Dict[str, Any]):
+    print("\n📈 Stage latency (seconds)")
+    print(f"  {'stage':<26}{'n':>5}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for stage, stats in report["stages"].items():
+        print(f"  {stage:<26}{stats['count']:>5}{stats['p50']:>10}{stats['p95']:>10}{stats['p99']:>10}")
+    print("\n📦 Per-case pipeline latency (seconds)")
+    for name, stats in report["cases"].items():
+        print(f"  {name:<26}p50 {stats['p50']:<8} p95 {stats['p95']}")
+    print("\n🚦 Throughput")
+    for sessions, stats in report["throughput"].items():
+        print(f"  {sessions:>3} sessions  {stats['rps']:>8} req/s  p95 {stats['latency']['p95']}s  "
+              f"failures {stats['failures']}")
+    res = report["resources"]
+    print(f"\n💾 Peak RSS: {res['peak_rss_mb']['self']} MB (children {res['peak_rss_mb']['children']} MB), "
+          f"disk written: {res['disk_write_mb']} MB, output footprint: {res['output_mb']} MB")
+    if report["errors"]:
+        print(f"⚠️ Errors: {report['errors']}")
+
+
+# -------------------------
+# 🚀 入口
+# -------------------------
+def run(args) -> int:
+    work_dir = Path(args.work_dir) if args.work_dir else Path(tempfile.mkdtemp(prefix="pipeline-bench-"))
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    server = None
+    if args.mock_url:
+        api_base = args.mock_url
+    else:
+        server = MockLLMServer(latency=args.latency, error_rate=args.error_rate,
+                               malformed_rate=args.malformed_rate, seed=args.seed).start()
+        api_base = server.api_base
+
+    # 必须在导入 app / planner 之前设置：这些模块在导入时读取配置
+    os.environ["OPENAI_API_BASE"] = api_base
+    os.environ["MEDIA_STORE_DIR"] = str(work_dir / "media")
+    os.environ["REQUEST_LOG_PATH"] = str(work_dir / "logs" / "requests.jsonl")
+    os.environ["VISUAL_OUTPUT_DIR"] = str(work_dir / "visuals")
+    os.environ["INCIDENT_DB_PATH"] = str(work_dir / "incidents.db")
+    if not args.cache:
+        os.environ["INTENT_CACHE_SIZE"] = "0"  # 每次请求都真正经过模拟服务
+        os.environ["INTENT_COALESCE"] = "0"
+    if not args.fast_tier:
+        os.environ["INTENT_FAST_THRESHOLD"] = "2"  # 示例输入都能被本地分类器回答，基准默认只测模型路径
+    if args.cassette:
+        os.environ["LLM_DEFAULT_MODEL"] = "replay"
+        os.environ["LLM_CASSETTE"] = args.cassette
+
+    config = {
+        "samples": args.samples,
+        "concurrency": args.concurrency,
+        "requests_per_session": args.requests_per_session,
+        "feed_limit": args.feed_limit,
+        "cache": args.cache,
+        "fast_tier": args.fast_tier,
+        "cassette": args.cassette,
+        "seed": args.seed,
+        "mock": server.config() if server else {"url": api_base},
+    }
+    print(f"[Bench] Mock LLM at {api_base}; work dir {work_dir}")
+
+    write_start = io_write_bytes()
+    try:
+        cases = build_cases(work_dir, Path(args.feed) if args.feed else None, args.feed_limit, args.seed)
+        print(f"[Bench] {len(cases)} cases × {args.samples} samples")
+        stage_report = bench_stages(cases, args.samples)
+        throughput = bench_throughput(cases, args.concurrency, args.requests_per_session)
+    finally:
+        if server is not None:
+            server.stop()
+    write_end = io_write_bytes()
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+        "config": config,
+        "stages": stage_report["stages"],
+        "cases": stage_report["cases"],
+        "errors": stage_report["errors"],
+        "throughput": throughput,
+        "resources": {
+            "peak_rss_mb": peak_rss_mb(),
+            "disk_write_mb": round((write_end - write_start) / 1e6, 3) if write_start is not None else None,
+            "output_mb": round(dir_size(work_dir) / 1e6, 3),
+        },
+        "mock_stats": dict(server.stats) if server else None,
+    }
+    print_report(report)
+
+    report_path = Path(args.output)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n[Bench] Report written to {report_path}")
+
+    if not args.work_dir and not args.keep_work_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"[Bench] Baseline updated: {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print(f"[Bench] No baseline at {baseline_path}; run with --update-baseline to record one.")
+        return 0
+
+    regressions = compare_with_baseline(report, json.loads(baseline_path.read_text(encoding="utf-8")), args.tolerance)
+    if not regressions:
+        print(f"✅ No regressions against baseline (tolerance {args.tolerance:.0%}).")
+        return 0
+    print(f"❌ {len(regressions)} regression(s) against baseline (tolerance {args.tolerance:.0%}):")
+    for item in regressions:
+        print(f"  {item['metric']:<40} {item['baseline']} → {item['current']} ({item['change']})")
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency / throughput benchmarks against a local mock LLM.")
+    parser.add_argument("--samples", type=int, default=5, help="Runs per input case")
+    parser.add_argument("--concurrency", type=lambda s: [int(v) for v in s.split(",")], default=[1, 4, 8],
+                        help="Comma-separated concurrent session counts")
+    parser.add_argument("--requests-per-session", type=int, default=5)
+    parser.add_argument("--feed", default=str(ROOT / "requests.jsonl"), help="JSONL incident feed for text inputs")
+    parser.add_argument("--feed-limit", type=int, default=5, help="Max records taken from the feed")
+    parser.add_argument("--latency", default="lognormal:0.2,0.3", help="Mock latency distribution")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--mock-url", default=None, help="Use an already running mock server instead")
+    parser.add_argument("--cache", action="store_true", help="Keep the intent response cache and request coalescing enabled")
+    parser.add_argument("--fast-tier", action="store_true",
+                        help="Let the local intent classifier answer confident inputs without the model")
+    parser.add_argument("--cassette", default=None,
+                        help="Route model calls through the record/replay client with this cassette "
+                             "(records misses via the mock, replays hits without model latency)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--work-dir", default=None, help="Directory for media store / logs (default: temp dir)")
+    parser.add_argument("--keep-work-dir", action="store_true")
+    parser.add_argument("--output", default=str(DEFAULT_REPORT), help="Where to write the JSON report")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--update-baseline", action="store_true", help="Overwrite the baseline with this run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression (0.2 = 20%%)")
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+# ==========================================
+# Module: Executor Initialization
+# File: executor/__init__.py
+# ==========================================
+# 🧩 模块功能：
+#   - 对外暴露 DAG 智能体调度器；
+# ==========================================
+
+from executor.dag_scheduler import (
+    DAGScheduler,
+    Stage,
+    STATUS_OK,
+    STATUS_ERROR,
+    STATUS_TIMEOUT,
+    STATUS_SKIPPED,
+    STATUS_CANCELLED,
+)
+
+__all__ = [
+    "DAGScheduler",
+    "Stage",
+    "STATUS_OK",
+    "STATUS_ERROR",
+    "STATUS_TIMEOUT",
+    "STATUS_SKIPPED",
+    "STATUS_CANCELLED",
+]
@@ -0,0 +1,257 @@
+# ==========================================
+# Module: DAG Agent Scheduler
+# File: executor/dag_scheduler.py
+# ==========================================
+# 🧩 模块功能：
+#   - 按声明的依赖图调度各智能体阶段（如 风险评估 / 疏散规划 / 资源调度）；
+#   - 无依赖关系的阶段并发执行（线程池或 asyncio 后端）；
+#   - 上游输出沿边传递给下游阶段；
+#   - 支持单阶段超时与整体取消，失败 / 超时阶段的下游自动跳过。
+# ==========================================
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+from contextvars import copy_context
+from typing import Dict, Any, Callable, Iterable, List, Optional
+
+# 阶段状态
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+STATUS_TIMEOUT = "timeout"
+STATUS_SKIPPED = "skipped"
+STATUS_CANCELLED = "cancelled"
+
+# 初始输入在阶段输入字典中的键
+INPUT_KEY = "input"
+
+# 等待阶段完成时检查取消信号的间隔（秒）
+_CANCEL_POLL = 0.25
+
+
+class Stage:
+    """
+    DAG 中的一个阶段。
+    fn 接收输入字典：{"input": 初始输入, <上游阶段名>: 上游输出, ...}。
+    asyncio 后端下 fn 可为协程函数。
+    """
+
+    def __init__(self,
+                 name: str,
+                 fn: Callable[[Dict[str, Any]], Any],
+                 deps: Iterable[str] = (),
+                 timeout: Optional[float] = None):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.timeout = timeout
+
+
+class DAGScheduler:
+    """依赖图调度器"""
+
+    def __init__(self, stages: List[Stage], max_workers: int = 8):
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self.stages or stage.name == INPUT_KEY:
+                raise ValueError(f"Duplicate or reserved stage name: {stage.name}")
+            self.stages[stage.name] = stage
+        self.max_workers = max_workers
+        self.order = self._topological_order()
+        self._cancel_event = threading.Event()
+
+    # -------------------------
+    # 图校验
+    # -------------------------
+    def _topological_order(self) -> List[str]:
+        """Kahn 拓扑排序，同时校验未知依赖与环"""
+        indegree = {name: 0 for name in self.stages}
+        for stage in self.stages.values():
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+                indegree[stage.name] += 1
+
+        ready = [name for name, deg in indegree.items() if deg == 0]
+        order = []
+        while ready:
+            name = ready.pop(0)
+            order.append(name)
+            for other in self.stages.values():
+                if name in other.deps:
+                    indegree[other.name] -= 1
+                    if indegree[other.name] == 0:
+                        ready.append(other.name)
+        if len(order) != len(self.stages):
+            raise ValueError("Stage dependency graph contains a cycle")
+        return order
+
+    def cancel(self):
+        """取消执行：不再启动新阶段，未完成阶段标记为 cancelled"""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    # -------------------------
+    # 公共辅助
+    # -------------------------
+    def _inputs_for(self, stage: Stage, initial: Any, results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        inputs = {INPUT_KEY: initial}
+        for dep in stage.deps:
+            inputs[dep] = results[dep]["output"]
+        return inputs
+
+    def _next_ready(self, results: Dict[str, Dict[str, Any]], running: Iterable[str]) -> List[str]:
+        """返回可启动的阶段；上游非 ok 的阶段直接标记为 skipped"""
+        ready = []
+        for name in self.order:
+            if name in results or name in running:
+                continue
+            stage = self.stages[name]
+            dep_status = [results[d]["status"] if d in results else None for d in stage.deps]
+            if any(s is not None and s != STATUS_OK for s in dep_status):
+                results[name] = {"status": STATUS_SKIPPED, "output": None,
+                                 "error": "upstream stage did not succeed", "seconds": 0.0}
+            elif all(s == STATUS_OK for s in dep_status):
+                ready.append(name)
+        return ready
+
+    @staticmethod
+    def _notify(callback, name: str, result: Dict[str, Any]):
+        if callback is None:
+            return
+        try:
+            callback(name, result)
+        except Exception as e:
+            print(f"[⚠️ DAGScheduler] on_stage_complete callback failed for '{name}': {e}")
+
+    # -------------------------
+    # 线程池后端
+    # -------------------------
+    def run(self,
+            initial: Any = None,
+            on_stage_complete: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        线程池后端执行。
+        返回 {阶段名: {"status", "output", "error", "seconds"}}。
+        on_stage_complete(阶段名, 结果) 在每个阶段结束时回调。
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        running: Dict[Future, str] = {}
+        started: Dict[str, float] = {}
+
+        # 不使用 with：退出时不等待已超时 / 已取消但仍在运行的线程
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="dag-stage")
+        try:
+            while len(results) < len(self.stages):
+                if not self.cancelled:
+                    for name in self._next_ready(results, running.values()):
+                        stage = self.stages[name]
+                        inputs = self._inputs_for(stage, initial, results)
+                        started[name] = time.monotonic()
+                        running[pool.submit(copy_context().run, stage.fn, inputs)] = name
+
+                if not running:
+                    break
+
+                # 等待任一阶段完成，或最近的阶段超时
+                now = time.monotonic()
+                deadlines = [started[n] + self.stages[n].timeout - now
+                             for n in running.values() if self.stages[n].timeout is not None]
+                # 最长等待 _CANCEL_POLL 秒，以便及时响应 cancel()
+                timeout = max(0.0, min(deadlines + [_CANCEL_POLL]))
+                if self.cancelled:
+                    timeout = 0.0
+                done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    name = running.pop(future)
+                    elapsed = round(time.monotonic() - started[name], 4)
+                    error = future.exception()
+                    if error is None:
+                        results[name] = {"status": STATUS_OK, "output": future.result(), "error": "", "seconds": elapsed}
+                    else:
+                        results[name] = {"status": STATUS_ERROR, "output": None, "error": str(error), "seconds": elapsed}
+                    self._notify(on_stage_complete, name, results[name])
+
+                # 处理超时 / 取消（线程无法强制终止，放弃其结果）
+                now = time.monotonic()
+                for future, name in list(running.items()):
+                    stage = self.stages[name]
+                    timed_out = stage.timeout is not None and now - started[name] >= stage.timeout
+                    if timed_out or self.cancelled:
+                        future.cancel()
+                        running.pop(future)
+                        status = STATUS_TIMEOUT if timed_out else STATUS_CANCELLED
+                        results[name] = {"status": status, "output": None,
+                                         "error": f"stage {status}", "seconds": round(now - started[name], 4)}
+                        self._notify(on_stage_complete, name, results[name])
+
+                if self.cancelled:
+                    break
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        for name in self.order:
+            results.setdefault(name, {"status": STATUS_CANCELLED, "output": None,
+                                      "error": "scheduler cancelled", "seconds": 0.0})
+        return results
+
+    # -------------------------
+    # asyncio 后端
+    # -------------------------
+    async def run_async(self,
+                        initial: Any = None,
+                        on_stage_complete: Optional[Callable[[str, Dict[str, Any]], None]] = None
+                        ) -> Dict[str, Dict[str, Any]]:
+        """asyncio 后端执行：协程阶段直接 await，同步阶段放入线程执行"""
+        results: Dict[str, Dict[str, Any]] = {}
+        running: Dict[asyncio.Task, str] = {}
+        started: Dict[str, float] = {}
+
+        async def invoke(stage: Stage, inputs: Dict[str, Any]):
+            if asyncio.iscoroutinefunction(stage.fn):
+                coro = stage.fn(inputs)
+            else:
+                coro = asyncio.to_thread(stage.fn, inputs)
+            return await asyncio.wait_for(coro, timeout=stage.timeout)
+
+        while len(results) < len(self.stages):
+            if not self.cancelled:
+                for name in self._next_ready(results, running.values()):
+                    stage = self.stages[name]
+                    started[name] = time.monotonic()
+                    running[asyncio.ensure_future(invoke(stage, self._inputs_for(stage, initial, results)))] = name
+            if not running:
+                break
+
+            done, _ = await asyncio.wait(list(running), timeout=_CANCEL_POLL if not self.cancelled else 0,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                elapsed = round(time.monotonic() - started[name], 4)
+                error = task.exception()
+                if error is None:
+                    results[name] = {"status": STATUS_OK, "output": task.result(), "error": "", "seconds": elapsed}
+                elif isinstance(error, asyncio.TimeoutError):
+                    results[name] = {"status": STATUS_TIMEOUT, "output": None, "error": "stage timeout", "seconds": elapsed}
+                else:
+                    results[name] = {"status": STATUS_ERROR, "output": None, "error": str(error), "seconds": elapsed}
+                self._notify(on_stage_complete, name, results[name])
+
+            if self.cancelled:
+                for task, name in list(running.items()):
+                    task.cancel()
+                    results[name] = {"status": STATUS_CANCELLED, "output": None, "error": "stage cancelled",
+                                     "seconds": round(time.monotonic() - started[name], 4)}
+                    self._notify(on_stage_complete, name, results[name])
+                running.clear()
+                break
+
+        for name in self.order:
+            results.setdefault(name, {"status": STATUS_CANCELLED, "output": None,
+                                      "error": "scheduler cancelled", "seconds": 0.0})
+        return results
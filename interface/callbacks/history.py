@@ -0,0 +1,59 @@
+# ==========================================
+# Module: History Callbacks
+# File: interface/callbacks/history.py
+# ==========================================
+# 🧩 模块功能：
+#   - 按筛选条件查询事件库并转换为表格行；
+#   - 按 request_id 读取单条记录的完整摘要；
+#   - 事件库未启用（INCIDENT_DB_PATH 为空）时给出提示；
+# ==========================================
+
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Tuple
+
+from app.incident_store import get_incident_store
+
+# 单次查询返回的最大行数
+HISTORY_LIMIT = 200
+
+
+def handle_history_search(category: str,
+                          last_minutes: float,
+                          min_confidence: float,
+                          keyword: str) -> Tuple[List[List[Any]], str]:
+    """查询历史事件"""
+    store = get_incident_store()
+    if store is None:
+        return [], "⚠️ Incident store is disabled (INCIDENT_DB_PATH is empty)."
+    start = time.perf_counter()
+    records = store.query(
+        category=None if category in (None, "", "all") else category,
+        last_seconds=float(last_minutes) * 60 if last_minutes else None,
+        min_confidence=float(min_confidence) if min_confidence else None,
+        text_contains=(keyword or "").strip() or None,
+        limit=HISTORY_LIMIT,
+    )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    rows = [[
+        datetime.fromtimestamp(r["ts"]).strftime("%Y-%m-%d %H:%M:%S"),
+        r["request_id"],
+        r["category"],
+        r["explicit_intent"],
+        r["intent_confidence"],
+        r["intent_tier"],
+        r["input_summary"],
+    ] for r in records]
+    more = " (limit reached)" if len(rows) >= HISTORY_LIMIT else ""
+    return rows, f"✅ {len(rows)} incident(s){more} in {elapsed_ms:.1f} ms."
+
+
+def handle_history_detail(request_id: str) -> Tuple[Dict[str, Any], str]:
+    """读取单条记录"""
+    store = get_incident_store()
+    if store is None:
+        return {}, "⚠️ Incident store is disabled (INCIDENT_DB_PATH is empty)."
+    record = store.get((request_id or "").strip())
+    if record is None:
+        return {}, f"❌ No incident recorded for '{request_id}'."
+    return record, f"✅ Loaded {record['request_id']}."
@@ -4,40 +4,96 @@
 # ==========================================
 # 🧩 模块功能：
 #   - 执行 pipeline 并返回结果；
+#   - 以生成器形式逐阶段推送进度（输入解析 → 意图片段 → 智能体合并摘要 → 最终结果）；
 #   - 校验输入、捕获异常；
+#   - 经准入控制排队：按关键词严重度优先执行，超出容量时丢弃 / 延后并提示；
+#   - 启用工作进程池（PIPELINE_WORKERS）时在工作进程中执行，事件转发回界面进程；
 #   - 提供执行状态与安全提示。
 # ==========================================
 
-from app.pipeline import run_full_pipeline
-from typing import Dict, Any, List, Tuple
+from app.pipeline import run_full_pipeline_stream
+from app.admission import estimate_severity, get_admission_controller, AdmissionRejected
+from app.worker_pool import worker_pool_enabled, get_worker_pool
+from typing import Dict, Any, List, Tuple, Iterator
+import time
 import traceback
 
 # 延迟注入不美观，直接用顶层的init函数来直接导入
 from interface import gr
 
+# 模型输出片段的最小刷新间隔（秒），避免高频刷新界面
+STREAM_UPDATE_INTERVAL = 0.1
+# 排队时刷新排队位置的间隔（秒）
+QUEUE_STATUS_INTERVAL = 1.0
+
 def handle_run(api_key: str,
                user_text: str,
                user_image: Any,
                user_audio: Any
-                    ) -> Tuple[Dict[str, Any], List[Any], str]:
+                    ) -> Iterator[Tuple[Dict[str, Any], List[Any], str]]:
     # 解决循环导入的问题，如果放在函数外导入，则和gradio_app中的gradio循环导入了
     # import gradio as gr
 
-    """运行主流程"""
+    """运行主流程（流式）"""
     try:
         if not api_key:
-            return {"error": "Missing API Key."}, [], "❌ Please input your OpenAI API Key."
+            yield {"error": "Missing API Key."}, [], "❌ Please input your OpenAI API Key."
+            return
         if not (user_text or user_image or user_audio):
-            return {"error": "No valid input."}, [], "❌ Provide at least one input."
+            yield {"error": "No valid input."}, [], "❌ Provide at least one input."
+            return
 
-        # ✅ 执行主流程
-        result = run_full_pipeline(text=user_text, image=user_image, audio=user_audio, api_key=api_key)
+        # 🚦 准入控制：危急报告优先获得执行槽位
+        severity = estimate_severity(user_text)
+        controller = get_admission_controller()
+        ticket = controller.submit(severity.level)
+        try:
+            while not controller.wait(ticket, timeout=QUEUE_STATUS_INTERVAL):
+                yield (severity.to_dict(), [],
+                       f"⏳ Queued ({severity.label} priority, position {controller.position(ticket)})...")
 
-        summary = result.get("final_summary", {})
-        visuals = result.get("visual_outputs", [])
-        return summary, visuals, "✅ Analysis complete."
+            yield from _run_stream(api_key, user_text, user_image, user_audio)
+        finally:
+            controller.release(ticket)
 
+    except AdmissionRejected as e:
+        yield {"error": e.reason, "retry_after": e.retry_after}, [], f"🚦 {e}"
     except Exception as e:
-        import traceback
         tb = traceback.format_exc(limit=2)
-        return {"error": str(e), "trace": tb}, [], "❌ Pipeline execution failed."
+        yield {"error": str(e), "trace": tb}, [], "❌ Pipeline execution failed."
+
+
+def _run_stream(api_key: str, user_text: str, user_image: Any, user_audio: Any
+                ) -> Iterator[Tuple[Dict[str, Any], List[Any], str]]:
+    """执行流式主流程并转换为界面更新"""
+    yield {}, [], "⏳ Parsing multimodal input..."
+
+    # ✅ 执行主流程
+    input_summary = ""
+    last_update = 0.0
+    run_stream = get_worker_pool().stream if worker_pool_enabled() else run_full_pipeline_stream
+    summary: Dict[str, Any] = {}
+    for event in run_stream(text=user_text, image=user_image, audio=user_audio, api_key=api_key, visuals=True):
+        stage = event["stage"]
+        if stage == "input_parsed":
+            input_summary = event["input_summary"]
+            yield {"input_summary": input_summary}, [], f"⏳ Input parsed ({input_summary}). Recognizing intent..."
+        elif stage == "intent_partial":
+            now = time.monotonic()
+            if now - last_update >= STREAM_UPDATE_INTERVAL:
+                last_update = now
+                yield ({"input_summary": input_summary, "streaming": event["text"]}, [],
+                       "⏳ Receiving model output...")
+        elif stage == "intent_final":
+            yield event["result"], [], "⏳ Intent recognized. Finalizing..."
+        elif stage == "summary_update":
+            yield (event["summary"], [],
+                   f"⏳ Agent '{event['agent']}' {event['status']} ({event['progress']}).")
+        elif stage == "done":
+            result = event["result"]
+            summary = result.get("final_summary", {})
+            visuals = result.get("visual_outputs", [])
+            yield summary, visuals, "✅ Analysis complete."
+        elif stage == "visuals":
+            # 图表在结果之后渲染完成：只刷新图表
+            yield summary, event["visual_outputs"], "✅ Analysis complete."
@@ -0,0 +1,40 @@
+# ==========================================
+# Module: History Panel
+# File: interface/components/history_panel.py
+# ==========================================
+# 🧩 模块功能：
+#   - 定义"历史事件"页：按类别 / 时间范围 / 最低置信度 / 关键词筛选；
+#   - 结果表格展示事件库（app/incident_store.py）中的历史记录；
+#   - 按 request_id 查看单条记录的完整决策摘要；
+# ==========================================
+
+# 延迟注入不美观，直接用顶层的init函数来直接导入
+from interface import gr
+from planner.fast_intent import CATEGORY_NAMES
+
+HISTORY_COLUMNS = ["Time", "Request ID", "Category", "Explicit Intent", "Confidence", "Tier", "Input"]
+
+
+def build_history_panel():
+    """构建历史事件查询区域组件"""
+    with gr.Row():
+        category = gr.Dropdown(
+            label="Category",
+            choices=["all"] + list(CATEGORY_NAMES) + ["unknown"],
+            value="all",
+        )
+        last_minutes = gr.Number(label="Last N minutes (0 = all time)", value=60, minimum=0, precision=0)
+        min_confidence = gr.Slider(label="Min confidence", minimum=0.0, maximum=1.0, step=0.05, value=0.0)
+        keyword = gr.Textbox(label="Keyword", placeholder="e.g. lab B")
+    search_btn = gr.Button("🔍 Search", variant="primary")
+
+    results_table = gr.Dataframe(headers=HISTORY_COLUMNS, label="Incidents", interactive=False, wrap=True)
+    history_status = gr.Textbox(label="Status", value="", interactive=False)
+
+    with gr.Row():
+        request_id = gr.Textbox(label="Request ID", placeholder="Paste a request ID to view its full summary")
+        detail_btn = gr.Button("📄 View")
+    detail_json = gr.JSON(label="Recorded Summary", value={})
+
+    return (category, last_minutes, min_confidence, keyword, search_btn, results_table, history_status,
+            request_id, detail_btn, detail_json)
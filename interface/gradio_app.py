@@ -6,6 +6,10 @@
 #   - 整合所有界面组件与回调逻辑；
 #   - 提供项目交互式可视化入口；
 #   - 负责界面布局与逻辑绑定；
+#   - 启动时在独立端口暴露 /metrics（METRICS_PORT，0 为关闭）；
+#   - 配置 Gradio 队列：容量与并发由准入控制器决定，排队顺序按严重度；
+#   - PIPELINE_WORKERS > 0 时启动即预热 pipeline 工作进程池；
+#   - "History" 页查询事件库中的历史决策记录；
 # ==========================================
 
 import gradio as gr
@@ -19,9 +23,14 @@ if ROOT_DIR not in sys.path:
 
 from interface.components.input_panel import build_input_panel
 from interface.components.output_panel import build_output_panel
+from interface.components.history_panel import build_history_panel
 from interface.components.layout_manager import create_layout
 from interface.callbacks.run_pipeline import handle_run
 from interface.callbacks.update_report import handle_clear, handle_load_example
+from interface.callbacks.history import handle_history_search, handle_history_detail
+from app.telemetry import start_metrics_server
+from app.admission import get_admission_controller
+from app.worker_pool import worker_pool_enabled, get_worker_pool
 
 
 def launch_ui():
@@ -35,32 +44,48 @@ def launch_ui():
             """
         )
 
-        # ========== 页面布局 ==========
-        left_col, right_col = create_layout()
-        with left_col:
-            api_key, user_text, user_image, user_audio, run_btn, clear_btn, examples = build_input_panel()
-        with right_col:
-            summary_json, visual_gallery, status_box = build_output_panel()
+        with gr.Tabs():
+            with gr.Tab("Decision"):
+                # ========== 页面布局 ==========
+                left_col, right_col = create_layout()
+                with left_col:
+                    api_key, user_text, user_image, user_audio, run_btn, clear_btn, examples = build_input_panel()
+                with right_col:
+                    summary_json, visual_gallery, status_box = build_output_panel()
 
-        # ========== 绑定交互 ==========
-        run_btn.click(
-            fn=handle_run,
-            inputs=[api_key, user_text, user_image, user_audio],
-            outputs=[summary_json, visual_gallery, status_box],
-        )
+                # ========== 绑定交互 ==========
+                run_btn.click(
+                    fn=handle_run,
+                    inputs=[api_key, user_text, user_image, user_audio],
+                    outputs=[summary_json, visual_gallery, status_box],
+                )
 
-        clear_btn.click(
-            fn=handle_clear,
-            inputs=[],
-            outputs=[user_text, user_image, user_audio, summary_json, visual_gallery, status_box],
-        )
+                clear_btn.click(
+                    fn=handle_clear,
+                    inputs=[],
+                    outputs=[user_text, user_image, user_audio, summary_json, visual_gallery, status_box],
+                )
+
+                for i, btn in enumerate(examples, start=1):
+                    btn.click(
+                        fn=lambda x=i: handle_load_example(x),
+                        inputs=[],
+                        outputs=[user_text, user_image, user_audio],
+                    )
 
-        for i, btn in enumerate(examples, start=1):
-            btn.click(
-                fn=lambda x=i: handle_load_example(x),
-                inputs=[],
-                outputs=[user_text, user_image, user_audio],
-            )
+            with gr.Tab("History"):
+                (category, last_minutes, min_confidence, keyword, search_btn, results_table, history_status,
+                 request_id, detail_btn, detail_json) = build_history_panel()
+                search_btn.click(
+                    fn=handle_history_search,
+                    inputs=[category, last_minutes, min_confidence, keyword],
+                    outputs=[results_table, history_status],
+                )
+                detail_btn.click(
+                    fn=handle_history_detail,
+                    inputs=[request_id],
+                    outputs=[detail_json, history_status],
+                )
 
         gr.Markdown(
             "<div style='text-align:center; color:gray;'>"
@@ -68,11 +93,21 @@ def launch_ui():
             "</div>"
         )
 
+    # Gradio 仅做容量上限，执行顺序交给准入控制器（按严重度优先），
+    # 因此 Gradio 并发需覆盖"执行中 + 排队中"的全部请求，避免在其 FIFO 队列中先被阻塞
+    controller = get_admission_controller()
+    demo.queue(
+        max_size=controller.max_queue * 2,
+        default_concurrency_limit=controller.max_concurrency + controller.max_queue,
+    )
     return demo
 
 
 if __name__ == "__main__":
     print("✅ Launching Gradio UI ...")
+    start_metrics_server()
+    if worker_pool_enabled():
+        get_worker_pool()  # 启动时即预热，首个请求无需等待工作进程导入
     ui = launch_ui()
     ui.launch(server_name="localhost", server_port=7860, share=True)
     print("✅ Gradio UI started successfully.")
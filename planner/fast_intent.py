@@ -0,0 +1,169 @@
+# ==========================================
+# Module: Fast Intent Classifier (Local Tier)
+# File: planner/fast_intent.py
+# ==========================================
+# 🧩 模块功能：
+#   - 本地第一层意图识别：基于关键词 / 规则，微秒级完成，无需网络；
+#   - 输出与 LLM 识别相同的字段（explicit / implicit intent、environment_context、
+#     intent_confidence），并附带事件类别 category；
+#   - 置信度由类别命中数、行动指令、地点、歧义 / 否定线索综合得出，
+#     低于阈值时由调用方升级到 LLM；
+#   - 上游不可用时可作为兜底结果。
+# ==========================================
+
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+# 事件类别：(类别, 关键词, 默认目标, 隐式意图)；英文按词边界匹配，中文按子串匹配
+_CATEGORIES: List[Tuple[str, Tuple[str, ...], str, str]] = [
+    ("fire",
+     ("fire", "fires", "blaze", "burning", "flames", "smoke", "wildfire",
+      "火灾", "起火", "着火", "火情", "浓烟"),
+     "Respond to the fire and protect occupants",
+     "Protect lives and prevent the fire from spreading"),
+    ("flood",
+     ("flood", "flooding", "flooded", "inundation", "storm surge", "levee",
+      "洪水", "内涝", "积水", "决堤"),
+     "Respond to the flooding and protect residents",
+     "Minimize harm to residents and infrastructure from rising water"),
+    ("chemical_leak",
+     ("chemical", "chemicals", "toxic", "hazmat", "spill", "corrosive", "fumes",
+      "化学品", "有毒", "泄漏", "泄露", "危化品"),
+     "Contain the hazardous material release",
+     "Prevent toxic exposure and environmental contamination"),
+    ("gas_leak",
+     ("gas leak", "gas smell", "smell of gas", "natural gas", "carbon monoxide",
+      "燃气泄漏", "煤气", "一氧化碳"),
+     "Isolate the gas leak and prevent ignition",
+     "Prevent explosion and poisoning"),
+    ("earthquake",
+     ("earthquake", "aftershock", "tremor", "seismic", "地震", "余震"),
+     "Respond to earthquake damage",
+     "Locate survivors and prevent secondary disasters"),
+    ("structural_collapse",
+     ("collapse", "collapsed", "structural failure", "caved in", "坍塌", "倒塌"),
+     "Respond to the structural collapse",
+     "Rescue trapped people and secure unstable structures"),
+    ("medical",
+     ("unconscious", "not breathing", "cardiac", "heart attack", "stroke", "bleeding", "overdose", "seizure",
+      "昏迷", "心脏", "中风", "出血", "抽搐"),
+     "Provide emergency medical assistance",
+     "Keep the patient alive until professional care arrives"),
+    ("traffic_accident",
+     ("car accident", "crash", "collision", "pileup", "vehicle overturned", "车祸", "追尾", "相撞"),
+     "Respond to the traffic accident",
+     "Treat the injured and prevent further collisions"),
+]
+
+# 行动指令 → 显式目标短语
+_ACTIONS: List[Tuple[Tuple[str, ...], str]] = [
+    (("evacuate", "evacuation", "evacuating", "escape route", "escape routes", "疏散", "撤离"), "plan evacuation"),
+    (("rescue", "rescuing", "save", "救援", "营救", "搜救"), "coordinate rescue"),
+    (("contain", "containment", "isolate", "控制", "隔离", "封堵"), "contain the hazard"),
+    (("assess", "assessment", "analyze", "analyse", "evaluate", "评估", "分析"), "assess the situation"),
+    (("guidance", "advice", "instructions", "safety", "指导", "建议"), "provide safety guidance"),
+    (("dispatch", "allocate", "resources", "调度", "调配", "物资"), "allocate resources"),
+]
+
+# 伤亡 / 被困线索（写入 environment_context）
+_CUES: Tuple[str, ...] = (
+    "trapped", "injured", "injuries", "casualties", "missing", "children", "elderly",
+    "被困", "受伤", "伤亡", "失踪",
+)
+
+# 否定 / 演习 / 误报：规则无法可靠判断，交给 LLM
+_NEGATIONS: Tuple[str, ...] = (
+    "no fire", "not a fire", "false alarm", "drill", "exercise", "test alarm", "resolved", "extinguished",
+    "误报", "演习", "演练", "已扑灭", "已解决",
+)
+
+_LOCATION_RE = re.compile(
+    r"\b(?:in|at|near|on|inside)\s+((?:the\s+)?(?:[A-Za-z0-9-]+\s+){0,2}?"
+    r"(?:building|district|lab|laboratory|area|floor|street|road|highway|plant|factory|school|hospital|"
+    r"station|tunnel|bridge|warehouse|mall|zone|block|village|river|park|campus)"
+    r"(?:\s+(?:[A-Z]|\d+)\b)?)",
+    re.IGNORECASE,
+)
+_LOCATION_ZH_RE = re.compile(r"([一-鿿A-Za-z0-9]{1,6}?(?:楼|区|实验室|工厂|医院|学校|街|路|站|村|仓库|商场|小区))")
+
+
+def _compile(words: Tuple[str, ...]) -> "re.Pattern[str]":
+    parts = [r"\b" + re.escape(w) + r"\b" if w.isascii() else re.escape(w) for w in words]
+    return re.compile("|".join(parts), re.IGNORECASE)
+
+
+CATEGORY_NAMES: Tuple[str, ...] = tuple(name for name, *_ in _CATEGORIES)
+_CATEGORY_PATTERNS = [(name, _compile(words), goal, implicit) for name, words, goal, implicit in _CATEGORIES]
+_ACTION_PATTERNS = [(_compile(words), phrase) for words, phrase in _ACTIONS]
+_CUE_PATTERN = _compile(_CUES)
+_NEGATION_PATTERN = _compile(_NEGATIONS)
+
+
+def _find(pattern: "re.Pattern[str]", text: str) -> List[str]:
+    return sorted({m.group(0).lower() for m in pattern.finditer(text)})
+
+
+def _location(text: str) -> Optional[str]:
+    match = _LOCATION_RE.search(text) or _LOCATION_ZH_RE.search(text)
+    if not match:
+        return None
+    location = match.group(1).strip()
+    return location[4:] if location.lower().startswith("the ") else location
+
+
+def classify_intent(text: Optional[str], has_media: bool = False) -> Dict[str, Any]:
+    """
+    规则分类：返回与 LLM 识别相同的字段 + category / matched_keywords。
+    未命中任何类别时 intent_confidence 为 0。
+    """
+    text = (text or "").strip()
+    scored = []
+    for name, pattern, goal, implicit in _CATEGORY_PATTERNS:
+        hits = _find(pattern, text) if text else []
+        if hits:
+            scored.append((len(hits), name, goal, implicit, hits))
+    if not scored:
+        return {
+            "explicit_intent": "unknown",
+            "implicit_intent": "unknown",
+            "environment_context": "unknown",
+            "intent_confidence": 0.0,
+            "category": "unknown",
+            "matched_keywords": [],
+        }
+
+    scored.sort(key=lambda item: -item[0])
+    hits_count, category, goal, implicit, hits = scored[0]
+    actions = [phrase for pattern, phrase in _ACTION_PATTERNS if pattern.search(text)]
+    location = _location(text)
+    cues = _find(_CUE_PATTERN, text)
+
+    # 置信度：命中类别 0.6，多个关键词 / 行动指令 / 地点各 +0.1；多类别、否定、附带媒体时下调
+    confidence = 0.6 + (0.1 if hits_count >= 2 else 0.0) + (0.1 if actions else 0.0) + (0.1 if location else 0.0)
+    if len(scored) > 1:
+        # 多种险情并存（如火灾 + 化学品），同等命中时更难判断主次，交给模型
+        confidence -= 0.25 if scored[1][0] >= hits_count else 0.15
+    if _NEGATION_PATTERN.search(text):
+        confidence = min(confidence, 0.3)
+    if has_media:
+        confidence *= 0.85  # 图像 / 音频内容未被规则考虑
+    confidence = round(max(0.0, min(confidence, 0.95)), 2)
+
+    label = category.replace("_", " ")
+    where = f" at {location}" if location else ""
+    if actions:
+        explicit = f"{actions[0][0].upper()}{actions[0][1:]}" + "".join(f", {a}" for a in actions[1:-1]) + \
+                   (f" and {actions[-1]}" if len(actions) > 1 else "") + f" for the {label}{where}"
+    else:
+        explicit = f"{goal}{where}"
+    context = [f"{label} reported" + (f" at {location}" if location else "")]
+    if cues:
+        context.append("cues: " + ", ".join(cues))
+    return {
+        "explicit_intent": explicit,
+        "implicit_intent": implicit,
+        "environment_context": "; ".join(context),
+        "intent_confidence": confidence,
+        "category": category,
+        "matched_keywords": hits,
+    }
@@ -5,22 +5,131 @@
 # 🧩 功能概述：
 #   - 基于独立 LLM Service 模块实现显式/隐式意图识别；
 #   - 通过 Model Registry 动态选择模型；
-#   - 输出结构化 JSON。
+#   - 输出结构化 JSON（单遍提取 + 意图 Schema 校验）；
+#   - 提供 asyncio 原生的异步识别接口；
+#   - 相同 Prompt + 媒体内容命中响应缓存，跳过模型调用；
+#   - 在途请求合并：相同 Prompt 共享一次上游调用，时间窗口内的近重复报告
+#     聚类后共享分析结果，并在结果中标注 coalescing 信息；
+#   - 支持流式识别，逐段返回模型输出；
+#   - 模型调用带截止时间、退避重试与可选对冲；
+#   - Prompt 构建计时并记录长度（telemetry）；
+#   - 分层识别：本地规则分类器置信度达到阈值时直接返回，否则升级到 LLM；
+#     模型调用失败时以本地结果兜底，结果中 intent_tier 记录作答的层级；
+#   - 可选微批处理（INTENT_MICRO_BATCH=1）：并发的纯文本请求打包为一次模型调用。
 # ==========================================
 
-from typing import Dict, Any
-import json, os
-from app.llm_service.model_registry import get_llm_client
+from typing import Dict, Any, Optional, Iterator, Tuple
+import asyncio
+import hashlib
+import os
+import time
+from app.llm_service.model_registry import get_llm_client, get_async_llm_client, DEFAULT_MODEL
+from app.llm_service.base_client import BaseLLMClient, ThreadedAsyncClient
+from app.llm_service.json_extract import IncrementalJSONExtractor, parse_intent_response
+from app.llm_service.response_cache import ResponseCache, get_default_cache, make_cache_key, credential_scope
+from app.llm_service.coalescing import Coalescer, get_default_coalescer, coalescing_enabled
+from app.log_sink import log_event
+from app.telemetry import Counter, register_metric, span, observe_payload
+from planner.fast_intent import classify_intent
+from planner.micro_batcher import MicroBatcher, get_default_batcher, micro_batching_enabled
+
+# 本地分类器置信度达到该阈值时不调用模型（大于 1 表示始终调用模型）
+FAST_TIER_THRESHOLD = float(os.environ.get("INTENT_FAST_THRESHOLD", "0.75"))
+
+# intent_tier 取值：local（本地分类器）/ cache（响应缓存）/ llm（模型）/
+#                   local_fallback（模型失败，本地结果兜底）/ default（均无结果）
+INTENT_TIER = Counter("intent_tier_total", "Intent results by the tier that answered.", ["tier"])
+register_metric(INTENT_TIER)
 
 
 class IntentRecognition:
     """多模态意图识别器"""
 
-    def __init__(self, api_key: str = None, model_name: str = "gpt-4o", temperature: float = 0.3):
-        self.client = get_llm_client(model_name=model_name, api_key=api_key, temperature=temperature)
+    def __init__(self, api_key: str = None, model_name: str = DEFAULT_MODEL, temperature: float = 0.3,
+                 cache: Optional[ResponseCache] = None, use_cache: bool = True,
+                 coalescer: Optional[Coalescer] = None, coalesce: Optional[bool] = None,
+                 fast_threshold: Optional[float] = None,
+                 batcher: Optional[MicroBatcher] = None, micro_batch: Optional[bool] = None):
+        self._configure(get_llm_client(model_name=model_name, api_key=api_key, temperature=temperature),
+                        model_name, temperature, cache, use_cache, coalescer, coalesce, fast_threshold,
+                        batcher, micro_batch)
+
+    def _configure(self, client, model_name: str, temperature: float,
+                   cache: Optional[ResponseCache], use_cache: bool,
+                   coalescer: Optional[Coalescer], coalesce: Optional[bool],
+                   fast_threshold: Optional[float],
+                   batcher: Optional[MicroBatcher], micro_batch: Optional[bool]):
+        """同步 / 异步识别器共用的初始化（客户端之外的缓存、合并、分层与微批配置）"""
+        self.client = client
+        self.model_name = model_name
+        self.temperature = temperature
+        self.cache = (cache or get_default_cache()) if use_cache else None
+        if coalesce is None:
+            coalesce = coalescing_enabled()
+        self.coalescer = (coalescer or get_default_coalescer()) if coalesce else None
+        self.fast_threshold = FAST_TIER_THRESHOLD if fast_threshold is None else fast_threshold
+        if micro_batch is None:
+            micro_batch = micro_batching_enabled()
+        self.batcher = (batcher or get_default_batcher()) if micro_batch else None
+
+    @staticmethod
+    def _media_hash(multimodal_data: Dict[str, Any]) -> str:
+        """计算图像 / 音频内容哈希（参与缓存键）"""
+        h = hashlib.sha256()
+        for modality in ("image", "audio"):
+            data = multimodal_data.get(modality, {})
+            # 优先使用媒体库摘要，避免对 base64 重新哈希
+            marker = data.get(f"{modality}_digest") or data.get(f"{modality}_base64", "")
+            h.update(modality.encode("utf-8"))
+            h.update(marker.encode("utf-8"))
+        return h.hexdigest()
+
+    def _credential(self) -> str:
+        """当前客户端凭证的作用域哈希（不同账号 / 端点的结果互不共享）"""
+        return credential_scope(getattr(self.client, "api_key", None), getattr(self.client, "api_base", None))
+
+    def _cache_key(self, prompt: str, multimodal_data: Dict[str, Any]) -> str:
+        return make_cache_key(self.model_name, self.temperature, prompt, self._media_hash(multimodal_data),
+                              self._credential())
+
+    @staticmethod
+    def _is_valid(parsed: Dict[str, Any]) -> bool:
+        return "error" not in parsed and "schema_errors" not in parsed
+
+    def _cache_store(self, key: str, parsed: Dict[str, Any], cost_seconds: float):
+        """仅缓存有效结果（解析失败 / Schema 不符 / 默认结果不缓存）"""
+        if self.cache is not None and self._is_valid(parsed):
+            self.cache.set(key, parsed, cost_seconds)
+
+    def _begin_coalesce(self, key: str, multimodal_data: Dict[str, Any]):
+        """登记合并调用，返回 (flight, 是否由本请求执行, 标注信息)；未启用时返回 (None, True, None)"""
+        if self.coalescer is None:
+            return None, True, None
+        text = multimodal_data.get("text", {}).get("text_content", "")
+        return self.coalescer.begin(key, text=text, scope=self._media_hash(multimodal_data),
+                                    credential=self._credential())
+
+    def _finish_coalesce(self, flight, parsed: Optional[Dict[str, Any]] = None,
+                         error: Optional[BaseException] = None):
+        if flight is not None:
+            self.coalescer.finish(flight, parsed, error=error, share=parsed is not None and self._is_valid(parsed))
+
+    @staticmethod
+    def _annotate(parsed: Dict[str, Any], info: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """标注本报告与共享分析的关系（执行方 / 共享方、簇 ID、相似度）"""
+        if info and (info["role"] == "member" or "cluster_id" in info):
+            parsed["coalescing"] = dict(info)
+        return parsed
 
     def _build_prompt(self, multimodal_data: Dict[str, Any]) -> str:
-        """构建 Prompt"""
+        """构建 Prompt（计时并记录长度）"""
+        with span("build_prompt"):
+            prompt = self._render_prompt(multimodal_data)
+        observe_payload("prompt_chars", len(prompt))
+        return prompt
+
+    @staticmethod
+    def _render_prompt(multimodal_data: Dict[str, Any]) -> str:
         text_input = multimodal_data.get("text", {}).get("text_content", "")
         has_image = multimodal_data.get("image", {}).get("image_valid", False)
         has_audio = multimodal_data.get("audio", {}).get("audio_valid", False)
@@ -44,21 +153,140 @@ class IntentRecognition:
         [Audio Provided]: {has_audio}
         """
 
-    def recognize(self, multimodal_data: Dict[str, Any]) -> Dict[str, Any]:
-        """执行意图识别"""
+    def recognize(self, multimodal_data: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        """执行意图识别（deadline 为 time.monotonic() 绝对截止时间）"""
+        fast = self._fast_tier(multimodal_data)
+        if fast["intent_confidence"] >= self.fast_threshold:
+            return self._finish(fast, "local")
+
+        prompt = self._build_prompt(multimodal_data)
+        key = self._cache_key(prompt, multimodal_data)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            return self._finish(cached, "cache")
+
+        flight, leader, info = self._begin_coalesce(key, multimodal_data)
+        try:
+            if leader:
+                parsed = self._call(prompt, key, deadline, multimodal_data)
+                self._finish_coalesce(flight, parsed)
+            else:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                parsed = flight.wait(timeout)
+        except BaseException as e:
+            if leader:
+                self._finish_coalesce(flight, error=e)
+            if not isinstance(e, Exception):
+                raise
+            print(f"[ERROR] Intent recognition failed: {e}")
+            return self._fallback(fast)
+
+        self._annotate(parsed, info)
+        return self._finish(parsed, "llm")
+
+    def _call(self, prompt: str, key: str, deadline: Optional[float],
+              multimodal_data: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        parsed = self._call_batched(multimodal_data, deadline)
+        if parsed is None:
+            raw_text = self.client.send_with_policy(prompt, deadline=deadline)
+            parsed = parse_intent_response(raw_text)
+        self._cache_store(key, parsed, time.perf_counter() - start)
+        return parsed
+
+    def _call_batched(self, multimodal_data: Dict[str, Any], deadline: Optional[float]) -> Optional[Dict[str, Any]]:
+        """纯文本请求经微批处理器打包调用；返回 None 时由调用方单独请求（含失败条目的单独重试）"""
+        if self.batcher is None:
+            return None
+        if (multimodal_data.get("image", {}).get("image_valid", False)
+                or multimodal_data.get("audio", {}).get("audio_valid", False)):
+            return None
+        text = multimodal_data.get("text", {}).get("text_content", "")
+        client = self._batch_client()
+        # 仅合并凭证 / 接口 / 模型 / 温度相同的请求
+        group = (type(client).__name__, getattr(client, "api_key", None),
+                 getattr(client, "api_base", None), self.model_name, self.temperature)
+        return self.batcher.submit(group, client, text, deadline)
+
+    def _batch_client(self) -> BaseLLMClient:
+        """执行打包请求的同步客户端"""
+        return self.client
+
+    def recognize_stream(self, multimodal_data: Dict[str, Any],
+                         deadline: Optional[float] = None) -> Iterator[Tuple[str, Any]]:
+        """
+        流式执行意图识别（deadline 同 recognize）：
+          - ("partial", 已累计的模型输出文本)；
+          - ("final", 解析后的结构化结果)。
+        """
+        fast = self._fast_tier(multimodal_data)
+        if fast["intent_confidence"] >= self.fast_threshold:
+            yield "final", self._finish(fast, "local")
+            return
+
         prompt = self._build_prompt(multimodal_data)
+        key = self._cache_key(prompt, multimodal_data)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            yield "final", self._finish(cached, "cache")
+            return
+
+        flight, leader, info = self._begin_coalesce(key, multimodal_data)
         try:
-            raw_text = self.client.send_request(prompt)
-            parsed = self.client.safe_json_parse(raw_text)
-        except Exception as e:
+            if leader:
+                start = time.perf_counter()
+                extractor = IncrementalJSONExtractor()
+                raw_text = ""
+                for delta in self.client.stream_with_policy(prompt, deadline=deadline):
+                    raw_text += delta
+                    extractor.feed(delta)
+                    yield "partial", raw_text
+                parsed = parse_intent_response(raw_text, obj=extractor.result)
+                self._cache_store(key, parsed, time.perf_counter() - start)
+                self._finish_coalesce(flight, parsed)
+            else:
+                # 共享他人的调用：没有可转发的片段，直接等待最终结果
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                parsed = flight.wait(timeout)
+        except BaseException as e:
+            # 含生成器被提前关闭（GeneratorExit），须唤醒等待者
+            if leader:
+                self._finish_coalesce(flight, error=e)
+            if not isinstance(e, Exception):
+                raise
             print(f"[ERROR] Intent recognition failed: {e}")
-            parsed = self._default_result()
+            yield "final", self._fallback(fast)
+            return
+
+        self._annotate(parsed, info)
+        yield "final", self._finish(parsed, "llm")
+
+    @staticmethod
+    def _fast_tier(multimodal_data: Dict[str, Any]) -> Dict[str, Any]:
+        """本地规则分类（微秒级，不访问网络）"""
+        with span("fast_intent"):
+            has_media = (multimodal_data.get("image", {}).get("image_valid", False)
+                         or multimodal_data.get("audio", {}).get("audio_valid", False))
+            return classify_intent(multimodal_data.get("text", {}).get("text_content", ""), has_media)
+
+    def _fallback(self, fast: Dict[str, Any]) -> Dict[str, Any]:
+        """模型调用失败：本地分类器有结果时以其兜底，否则返回默认结果"""
+        if fast["intent_confidence"] > 0:
+            return self._finish(fast, "local_fallback")
+        return self._finish(self._default_result(), "default")
 
-        os.makedirs("output/logs", exist_ok=True)
-        with open("output/logs/last_intent.json", "w", encoding="utf-8") as f:
-            json.dump(parsed, f, ensure_ascii=False, indent=2)
+    def _finish(self, parsed: Dict[str, Any], tier: str) -> Dict[str, Any]:
+        """标注作答层级、计数并记录日志"""
+        parsed["intent_tier"] = tier
+        INTENT_TIER.inc(tier=tier)
+        self._save_result(parsed)
         return parsed
 
+    @staticmethod
+    def _save_result(parsed: Dict[str, Any]):
+        """记录识别结果日志（后台写入，不阻塞请求）"""
+        log_event("intent_result", result=dict(parsed))
+
     @staticmethod
     def _default_result() -> Dict[str, Any]:
         return {
@@ -69,9 +297,101 @@ class IntentRecognition:
         }
 
 
-def recognize_intent(multimodal_data: Dict[str, Any], api_key: str = None) -> Dict[str, Any]:
+class AsyncIntentRecognition(IntentRecognition):
+    """异步多模态意图识别器（共享连接池，凭证按请求隔离）"""
+
+    def __init__(self, api_key: str = None, model_name: str = DEFAULT_MODEL, temperature: float = 0.3,
+                 cache: Optional[ResponseCache] = None, use_cache: bool = True,
+                 coalescer: Optional[Coalescer] = None, coalesce: Optional[bool] = None,
+                 fast_threshold: Optional[float] = None,
+                 batcher: Optional[MicroBatcher] = None, micro_batch: Optional[bool] = None, **client_kwargs):
+        self._configure(get_async_llm_client(model_name=model_name, api_key=api_key,
+                                             temperature=temperature, **client_kwargs),
+                        model_name, temperature, cache, use_cache, coalescer, coalesce, fast_threshold,
+                        batcher, micro_batch)
+        self._sync_client: Optional[BaseLLMClient] = None
+
+    def _batch_client(self) -> BaseLLMClient:
+        """
+        微批处理器在线程中同步调用：线程适配的客户端直接使用其同步客户端，
+        原生异步客户端按相同凭证创建同步客户端（与同步识别器的请求进入同一批次）。
+        """
+        if isinstance(self.client, ThreadedAsyncClient):
+            return self.client.client
+        if self._sync_client is None:
+            self._sync_client = get_llm_client(model_name=self.model_name, api_key=self.client.api_key,
+                                               temperature=self.temperature)
+        return self._sync_client
+
+    async def recognize(self, multimodal_data: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        """异步执行意图识别（deadline 同 recognize：超时后使用本地分类结果）"""
+        fast = self._fast_tier(multimodal_data)
+        if fast["intent_confidence"] >= self.fast_threshold:
+            return self._finish(fast, "local")
+
+        prompt = self._build_prompt(multimodal_data)
+        key = self._cache_key(prompt, multimodal_data)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            return self._finish(cached, "cache")
+
+        flight, leader, info = self._begin_coalesce(key, multimodal_data)
+        try:
+            if leader:
+                start = time.perf_counter()
+                parsed = None
+                if self.batcher is not None:
+                    parsed = await asyncio.to_thread(self._call_batched, multimodal_data, deadline)
+                if parsed is None:
+                    raw_text = await self.client.send_with_policy(prompt, deadline=deadline)
+                    parsed = parse_intent_response(raw_text)
+                self._cache_store(key, parsed, time.perf_counter() - start)
+                self._finish_coalesce(flight, parsed)
+            else:
+                # 共享调用可能由其他线程 / 事件循环执行，在线程中等待以免阻塞本循环
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                parsed = await asyncio.to_thread(flight.wait, timeout)
+        except BaseException as e:
+            # 含任务被取消（CancelledError），须唤醒等待者
+            if leader:
+                self._finish_coalesce(flight, error=e)
+            if not isinstance(e, Exception):
+                raise
+            print(f"[ERROR] Intent recognition failed: {e}")
+            return self._fallback(fast)
+
+        self._annotate(parsed, info)
+        return self._finish(parsed, "llm")
+
+
+def recognize_intent(multimodal_data: Dict[str, Any], api_key: str = None,
+                     deadline: Optional[float] = None) -> Dict[str, Any]:
     """统一模块接口"""
     recognizer = IntentRecognition(api_key=api_key)
-    result = recognizer.recognize(multimodal_data)
+    result = recognizer.recognize(multimodal_data, deadline=deadline)
     result["input_summary"] = multimodal_data.get("input_summary", "")
     return result
+
+
+def recognize_intent_stream(multimodal_data: Dict[str, Any], api_key: str = None,
+                            deadline: Optional[float] = None) -> Iterator[Tuple[str, Any]]:
+    """统一模块接口（流式）"""
+    recognizer = IntentRecognition(api_key=api_key)
+    for kind, payload in recognizer.recognize_stream(multimodal_data, deadline=deadline):
+        if kind == "final":
+            payload["input_summary"] = multimodal_data.get("input_summary", "")
+        yield kind, payload
+
+
+async def recognize_intent_async(multimodal_data: Dict[str, Any], api_key: str = None,
+                                 deadline: Optional[float] = None) -> Dict[str, Any]:
+    """统一模块接口（异步）"""
+    recognizer = AsyncIntentRecognition(api_key=api_key)
+    result = await recognizer.recognize(multimodal_data, deadline=deadline)
+    result["input_summary"] = multimodal_data.get("input_summary", "")
+    return result
+
+
+def get_intent_cache_stats() -> Dict[str, Any]:
+    """返回意图识别响应缓存的命中统计"""
+    return get_default_cache().stats()
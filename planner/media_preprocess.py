@@ -0,0 +1,234 @@
+# ==========================================
+# Module: Media Preprocessing
+# File: planner/media_preprocess.py
+# ==========================================
+# 🧩 模块功能：
+#   - 在 Base64 编码前对图像做尺寸 / 体积预算控制；
+#   - 超出像素预算时等比缩放（JPEG 优先使用 draft 降采样解码）；
+#   - 自动选择编码格式（不透明 → JPEG，带透明通道 → WEBP/PNG）；
+#   - 重新编码时丢弃 EXIF 等元数据；
+#   - 返回压缩前后体积，便于观测收益；
+#   - 音频归一化：单声道、重采样、裁剪首尾静音、限制时长；
+#   - 音频解码 CPU 开销大，统一放入进程池执行，不阻塞界面事件循环；
+#   - PIL / pydub 在实际处理对应模态时才导入，纯文本请求无需加载。
+# ==========================================
+
+import io
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# 默认预算，可通过环境变量覆盖
+DEFAULT_IMAGE_MAX_PIXELS = int(os.environ.get("IMAGE_MAX_PIXELS", str(1024 * 1024)))
+DEFAULT_IMAGE_MAX_BYTES = int(os.environ.get("IMAGE_MAX_BYTES", str(300 * 1024)))
+
+# 音频归一化默认参数
+DEFAULT_AUDIO_SAMPLE_RATE = int(os.environ.get("AUDIO_SAMPLE_RATE", "16000"))
+DEFAULT_AUDIO_MAX_SECONDS = float(os.environ.get("AUDIO_MAX_SECONDS", "120"))
+DEFAULT_AUDIO_SILENCE_DBFS = float(os.environ.get("AUDIO_SILENCE_DBFS", "-40"))
+DEFAULT_AUDIO_FORMAT = os.environ.get("AUDIO_EXPORT_FORMAT", "mp3")
+DEFAULT_AUDIO_BITRATE = os.environ.get("AUDIO_EXPORT_BITRATE", "32k")
+
+# 逐级降低的编码质量
+_QUALITY_STEPS = (85, 75, 65, 50, 40)
+# 质量降到底仍超预算时的缩放系数与最大次数
+_DOWNSCALE_FACTOR = 0.75
+_MAX_DOWNSCALES = 4
+
+
+def _has_alpha(img: "Image.Image") -> bool:
+    return img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+
+
+def _fit_pixels(size: Tuple[int, int], max_pixels: int) -> Tuple[int, int]:
+    """计算满足像素预算的目标尺寸（保持宽高比）"""
+    w, h = size
+    if w * h <= max_pixels:
+        return w, h
+    scale = math.sqrt(max_pixels / float(w * h))
+    return max(1, int(w * scale)), max(1, int(h * scale))
+
+
+def _encode(img: "Image.Image", fmt: str, quality: int) -> bytes:
+    """编码图像（不传入 exif / icc 等参数，即丢弃元数据）"""
+    buf = io.BytesIO()
+    if fmt == "JPEG":
+        img.save(buf, format="JPEG", quality=quality, optimize=True, progressive=True)
+    elif fmt == "WEBP":
+        img.save(buf, format="WEBP", quality=quality, method=4)
+    else:
+        img.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+
+def image_variant(max_pixels: int, max_bytes: int) -> str:
+    """图像预处理参数标识（用于媒体库复用产物）"""
+    return f"image:v1:{max_pixels}:{max_bytes}"
+
+
+def preprocess_image(img: "Image.Image",
+                     original_bytes: int,
+                     max_pixels: int = DEFAULT_IMAGE_MAX_PIXELS,
+                     max_bytes: int = DEFAULT_IMAGE_MAX_BYTES) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    按像素 / 字节预算压缩图像。
+    返回 (编码后字节, 压缩信息)。
+    """
+    from PIL import Image, ImageOps, features
+
+    original_size = img.size
+    target_size = _fit_pixels(original_size, max_pixels)
+
+    # JPEG 源文件可在解码阶段直接降采样，节省解码 CPU
+    if img.format == "JPEG" and target_size != original_size:
+        img.draft(img.mode, target_size)
+
+    img = ImageOps.exif_transpose(img)  # 丢弃元数据前先应用方向信息
+    target_size = _fit_pixels(img.size, max_pixels)
+    if img.size != target_size:
+        img = img.resize(target_size, Image.LANCZOS)
+
+    if _has_alpha(img):
+        fmt = "WEBP" if features.check("webp") else "PNG"
+        img = img.convert("RGBA")
+    else:
+        fmt = "JPEG"
+        img = img.convert("RGB")
+
+    data = b""
+    for _ in range(_MAX_DOWNSCALES + 1):
+        for quality in _QUALITY_STEPS:
+            data = _encode(img, fmt, quality)
+            if len(data) <= max_bytes or fmt == "PNG":
+                break
+        if len(data) <= max_bytes:
+            break
+        w, h = img.size
+        img = img.resize((max(1, int(w * _DOWNSCALE_FACTOR)), max(1, int(h * _DOWNSCALE_FACTOR))), Image.LANCZOS)
+
+    info = {
+        "image_format": fmt,
+        "image_original_size": list(original_size),
+        "image_size": list(img.size),
+        "image_original_bytes": original_bytes,
+        "image_compressed_bytes": len(data),
+    }
+    return data, info
+
+
+# -------------------------
+# 🎧 音频归一化
+# -------------------------
+def audio_variant(sample_rate: int = DEFAULT_AUDIO_SAMPLE_RATE,
+                  max_seconds: float = DEFAULT_AUDIO_MAX_SECONDS,
+                  silence_dbfs: float = DEFAULT_AUDIO_SILENCE_DBFS,
+                  export_format: str = DEFAULT_AUDIO_FORMAT,
+                  bitrate: str = DEFAULT_AUDIO_BITRATE) -> str:
+    """音频预处理参数标识（用于媒体库复用产物）"""
+    return f"audio:v1:{sample_rate}:{max_seconds}:{silence_dbfs}:{export_format}:{bitrate}"
+
+
+def preprocess_audio(path: str,
+                     sample_rate: int = DEFAULT_AUDIO_SAMPLE_RATE,
+                     max_seconds: float = DEFAULT_AUDIO_MAX_SECONDS,
+                     silence_dbfs: float = DEFAULT_AUDIO_SILENCE_DBFS,
+                     export_format: str = DEFAULT_AUDIO_FORMAT,
+                     bitrate: str = DEFAULT_AUDIO_BITRATE,
+                     source_format: Optional[str] = None) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    语音场景音频归一化（顶层函数，可在子进程中执行）。
+    source_format 为源文件格式提示（媒体库对象无扩展名时使用）。
+    返回 (编码后字节, 处理信息)。
+    """
+    from pydub import AudioSegment  # 🎧 用于多格式音频解析
+    from pydub.silence import detect_leading_silence
+
+    original_bytes = os.path.getsize(path)
+    seg = AudioSegment.from_file(path, format=source_format)
+    original_seconds = len(seg) / 1000.0
+    original_channels, original_rate = seg.channels, seg.frame_rate
+
+    seg = seg.set_channels(1).set_frame_rate(sample_rate)
+
+    # 裁剪首尾静音（全静音时保留原片段）
+    lead = detect_leading_silence(seg, silence_threshold=silence_dbfs)
+    trail = detect_leading_silence(seg.reverse(), silence_threshold=silence_dbfs)
+    if lead + trail < len(seg):
+        seg = seg[lead:len(seg) - trail]
+
+    if max_seconds and len(seg) > max_seconds * 1000:
+        seg = seg[:int(max_seconds * 1000)]
+
+    buf = io.BytesIO()
+    export_kwargs = {"bitrate": bitrate} if export_format != "wav" else {}
+    seg.export(buf, format=export_format, **export_kwargs)
+    data = buf.getvalue()
+
+    info = {
+        "audio_format": export_format,
+        "audio_original_bytes": original_bytes,
+        "audio_compressed_bytes": len(data),
+        "audio_original_seconds": round(original_seconds, 2),
+        "audio_seconds": round(len(seg) / 1000.0, 2),
+        "audio_original_channels": original_channels,
+        "audio_original_rate": original_rate,
+        "audio_rate": sample_rate,
+    }
+    return data, info
+
+
+_audio_pool: Optional[ProcessPoolExecutor] = None
+_audio_pool_lock = threading.Lock()
+
+
+def audio_workers() -> int:
+    """
+    音频进程池大小（调用时读取 AUDIO_WORKERS，默认 min(2, CPU 核数)）。
+    守护进程（如 pipeline 工作进程）不能创建子进程，此时返回 0，在当前进程内执行。
+    """
+    if multiprocessing.current_process().daemon:
+        return 0
+    return int(os.environ.get("AUDIO_WORKERS", str(min(2, os.cpu_count() or 1))))
+
+
+def get_audio_pool() -> ProcessPoolExecutor:
+    """获取共享的音频处理进程池（spawn 模式，避免在多线程服务进程中 fork）"""
+    global _audio_pool
+    with _audio_pool_lock:
+        if _audio_pool is None:
+            _audio_pool = ProcessPoolExecutor(
+                max_workers=max(1, audio_workers()),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _audio_pool
+
+
+def preprocess_audio_in_pool(path: str, timeout: float = 60.0, **kwargs) -> Tuple[bytes, Dict[str, Any]]:
+    """在进程池中执行音频归一化并等待结果（audio_workers() 为 0 时在当前进程执行，如 pipeline 工作进程内）"""
+    if audio_workers() <= 0:
+        return preprocess_audio(path, **kwargs)
+    for attempt in range(2):
+        pool = get_audio_pool()
+        try:
+            return pool.submit(preprocess_audio, path, **kwargs).result(timeout=timeout)
+        except BrokenProcessPool:
+            # 子进程崩溃（如解码异常退出）后进程池不可再用：替换为新进程池并重试一次
+            _discard_audio_pool(pool)
+            if attempt:
+                raise
+
+
+def _discard_audio_pool(pool: ProcessPoolExecutor):
+    """丢弃已损坏的进程池，下次调用 get_audio_pool 时重新创建"""
+    global _audio_pool
+    with _audio_pool_lock:
+        if _audio_pool is pool:
+            _audio_pool = None
+    pool.shutdown(wait=False)
@@ -0,0 +1,264 @@
+# ==========================================
+# Module: Content-Addressed Media Store
+# File: planner/media_store.py
+# ==========================================
+# 🧩 模块功能：
+#   - 以 SHA-256 摘要为键存储上传媒体（同一内容只存一份）；
+#   - 通过 mmap 分块流式计算文件摘要，避免整文件读入内存；
+#   - 记录预处理产物（压缩图像 / 归一化音频）与源摘要的映射，重复上传直接复用；
+#   - Base64 仅在使用方需要时生成，并按摘要做 LRU 缓存；
+#   - 总大小有上限（MEDIA_STORE_MAX_BYTES，默认 1 GiB，0 为不限）：超出时按最近使用时间
+#     （读写时更新文件 mtime）从旧到新淘汰，最近 MEDIA_STORE_MIN_AGE_S 秒内用过的对象不淘汰
+#     （进行中的请求仍可能按需读取）。
+# ==========================================
+
+import base64
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+DEFAULT_MEDIA_ROOT = os.environ.get("MEDIA_STORE_DIR", "output/media")
+DEFAULT_MAX_BYTES = int(os.environ.get("MEDIA_STORE_MAX_BYTES", str(1 << 30)))
+DEFAULT_MIN_AGE_S = float(os.environ.get("MEDIA_STORE_MIN_AGE_S", "600"))
+# 淘汰到上限的该比例为止，避免每次写入都触发清理
+_EVICT_TARGET = 0.9
+
+_HASH_CHUNK = 1 << 20  # 1 MiB
+
+
+def hash_file(path: str) -> str:
+    """mmap 分块计算文件 SHA-256"""
+    h = hashlib.sha256()
+    size = os.path.getsize(path)
+    if size == 0:
+        return h.hexdigest()
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = memoryview(mm)
+        try:
+            for offset in range(0, size, _HASH_CHUNK):
+                h.update(view[offset:offset + _HASH_CHUNK])
+        finally:
+            view.release()
+    return h.hexdigest()
+
+
+def hash_buffer(buf: Any) -> str:
+    """计算内存缓冲区（bytes / 连续 numpy 数组等）的 SHA-256，不产生拷贝"""
+    return hashlib.sha256(memoryview(buf)).hexdigest()
+
+
+class MediaStore:
+    """内容寻址媒体存储"""
+
+    def __init__(self, root: str = DEFAULT_MEDIA_ROOT, b64_cache_entries: int = 64,
+                 max_bytes: int = DEFAULT_MAX_BYTES, min_age: float = DEFAULT_MIN_AGE_S):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.derived_dir = self.root / "derived"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.derived_dir.mkdir(parents=True, exist_ok=True)
+        self.b64_cache_entries = b64_cache_entries
+        self._b64_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        self._total_bytes: Optional[int] = None  # 首次写入时扫描目录得到
+        self._evict_lock = threading.Lock()
+        self._stats = {"evicted": 0, "evicted_bytes": 0}
+
+    # -------------------------
+    # 原始对象
+    # -------------------------
+    def path_for(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest[2:]
+
+    def has(self, digest: str) -> bool:
+        return self.path_for(digest).exists()
+
+    def put_file(self, path: str) -> str:
+        """存入文件（已存在则跳过），返回摘要"""
+        digest = hash_file(path)
+        target = self.path_for(digest)
+        if self._touch(target):
+            return digest
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f"{target.name}.{threading.get_ident()}.tmp")
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, target)
+        self._added(target.stat().st_size)
+        return digest
+
+    def put_bytes(self, data: bytes) -> str:
+        """存入字节数据（已存在则跳过），返回摘要"""
+        digest = hash_buffer(data)
+        target = self.path_for(digest)
+        if self._touch(target):
+            return digest
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f"{target.name}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+        self._added(len(data))
+        return digest
+
+    def read_bytes(self, digest: str) -> bytes:
+        path = self.path_for(digest)
+        with open(path, "rb") as f:
+            data = f.read()
+        self._touch(path)
+        return data
+
+    def size(self, digest: str) -> int:
+        return self.path_for(digest).stat().st_size
+
+    # -------------------------
+    # Base64（按需生成 + LRU 缓存）
+    # -------------------------
+    def get_base64(self, digest: str) -> str:
+        with self._lock:
+            encoded = self._b64_cache.get(digest)
+            if encoded is not None:
+                self._b64_cache.move_to_end(digest)
+        if encoded is not None:
+            self._touch(self.path_for(digest))
+            return encoded
+
+        encoded = base64.b64encode(self.read_bytes(digest)).decode("utf-8")
+        with self._lock:
+            self._b64_cache[digest] = encoded
+            while len(self._b64_cache) > self.b64_cache_entries:
+                self._b64_cache.popitem(last=False)
+        return encoded
+
+    # -------------------------
+    # 预处理产物映射
+    # -------------------------
+    def _derived_path(self, source_digest: str, variant: str) -> Path:
+        variant_hash = hashlib.sha256(variant.encode("utf-8")).hexdigest()[:16]
+        return self.derived_dir / f"{source_digest}_{variant_hash}.json"
+
+    def get_derived(self, source_digest: str, variant: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """查询源对象在指定预处理参数下的产物 (摘要, 处理信息)"""
+        try:
+            with open(self._derived_path(source_digest, variant), "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not self._touch(self.path_for(record["digest"])):
+            return None  # 产物已被淘汰
+        return record["digest"], record.get("info", {})
+
+    def put_derived(self, source_digest: str, variant: str, data: bytes, info: Dict[str, Any]) -> str:
+        """存入预处理产物并记录映射，返回产物摘要"""
+        digest = self.put_bytes(data)
+        path = self._derived_path(source_digest, variant)
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"digest": digest, "variant": variant, "info": info}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        return digest
+
+    # -------------------------
+    # 容量上限（按最近使用淘汰）
+    # -------------------------
+    @staticmethod
+    def _touch(path: Path) -> bool:
+        """更新最近使用时间（mtime）；对象不存在时返回 False"""
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def _objects(self):
+        """遍历对象文件：(mtime, 字节数, 路径)"""
+        for path in self.objects_dir.glob("*/*"):
+            if path.name.endswith(".tmp"):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # 并发淘汰
+            yield stat.st_mtime, stat.st_size, path
+
+    def _added(self, size: int):
+        """记录新增字节数，超出上限时淘汰"""
+        if self.max_bytes <= 0:
+            return
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += size
+            over = self._total_bytes is None or self._total_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self) -> int:
+        """重新统计总大小；超出上限时按最近使用时间从旧到新删除对象，直至上限的 90%。返回删除数"""
+        if not self._evict_lock.acquire(blocking=False):
+            return 0  # 其他线程正在清理
+        try:
+            objects = sorted(self._objects())
+            total = sum(size for _, size, _ in objects)
+            removed = 0
+            if self.max_bytes > 0 and total > self.max_bytes:
+                target = int(self.max_bytes * _EVICT_TARGET)
+                cutoff = time.time() - self.min_age
+                for mtime, size, path in objects:
+                    if total <= target or mtime >= cutoff:
+                        break
+                    try:
+                        path.unlink()
+                    except OSError:
+                        continue
+                    total -= size
+                    removed += 1
+                    self._forget(path.parent.name + path.name, size)
+                if total > self.max_bytes:
+                    print(f"[⚠️ MediaStore] {total} bytes in use exceeds the {self.max_bytes}-byte cap; "
+                          f"remaining objects were used within {self.min_age:.0f}s")
+            with self._lock:
+                self._total_bytes = total
+            return removed
+        finally:
+            self._evict_lock.release()
+
+    def _forget(self, digest: str, size: int):
+        """对象被淘汰：移除 Base64 缓存与以其为源的预处理映射"""
+        with self._lock:
+            self._b64_cache.pop(digest, None)
+            self._stats["evicted"] += 1
+            self._stats["evicted_bytes"] += size
+        for derived in self.derived_dir.glob(f"{digest}_*.json"):
+            try:
+                derived.unlink()
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "bytes": self._total_bytes, "max_bytes": self.max_bytes}
+
+
+_default_store: Optional[MediaStore] = None
+_default_lock = threading.Lock()
+
+
+def get_media_store() -> MediaStore:
+    """
+    获取进程级共享媒体存储。
+    环境变量：MEDIA_STORE_DIR（默认 output/media）、MEDIA_STORE_MAX_BYTES（默认 1 GiB）、
+              MEDIA_STORE_MIN_AGE_S（默认 600）。
+    """
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = MediaStore()
+        return _default_store
@@ -0,0 +1,197 @@
+# ==========================================
+# Module: Intent Micro-Batcher
+# File: planner/micro_batcher.py
+# ==========================================
+# 🧩 模块功能：
+#   - 在短时间窗口内（默认 20 ms 或凑满 N 条）收集并发的纯文本意图识别请求；
+#   - 打包为一次多条目 Prompt，要求模型按 index 返回 STRICT JSON 数组；
+#   - 拆分结果并逐条按意图 Schema 校验后交还各调用方；
+#   - 缺失 / 校验失败的条目（或整批调用失败）由调用方单独重试；
+#   - 窗口内只有一条请求时不打包，直接走单条路径。
+#
+# 启用：INTENT_MICRO_BATCH=1（默认关闭）；
+#       INTENT_BATCH_WINDOW_MS（默认 20）、INTENT_BATCH_MAX_ITEMS（默认 8）。
+# 说明：同一批次只合并凭证 / 模型 / 温度完全相同的请求；流式识别不参与批处理。
+# ==========================================
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Dict, Any, Hashable, List, Optional
+
+from app.llm_service.json_extract import parse_json_response, validate_intent
+from app.telemetry import Counter, Histogram, register_metric
+
+BATCH_ITEMS = Histogram("intent_micro_batch_items", "Requests packed into one upstream intent call.", [],
+                        buckets=(2, 4, 8, 16, 32, 64))
+BATCH_ITEM_RETRIES = Counter("intent_micro_batch_retries_total",
+                             "Packed items that had to be retried individually.", ["reason"])
+register_metric(BATCH_ITEMS)
+register_metric(BATCH_ITEM_RETRIES)
+
+
+def build_batch_prompt(texts: List[str]) -> str:
+    """多条目 Prompt：报告以 JSON 数组给出，避免条目之间互相串扰"""
+    return f"""
+        You are an emergency intent-understanding agent.
+        For EACH report in the JSON array below (index = position in the array), identify:
+        1. explicit_intent (direct user goal)
+        2. implicit_intent (hidden motivation)
+        3. environment_context (key scene info)
+
+        Return STRICT JSON only, with exactly {len(texts)} entries:
+        {{
+            "results": [
+                {{"index": 0, "explicit_intent": "", "implicit_intent": "", "environment_context": "", "intent_confidence": 0.0}}
+            ]
+        }}
+
+        [Reports]: {json.dumps(texts, ensure_ascii=False)}
+        [Image Provided]: False
+        [Audio Provided]: False
+        """
+
+
+def split_batch_response(raw_text: str, count: int) -> List[Optional[Dict[str, Any]]]:
+    """按 index 拆分批量结果；缺失、重复或不符合 Schema 的条目为 None"""
+    results: List[Optional[Dict[str, Any]]] = [None] * count
+    entries = parse_json_response(raw_text).get("results")
+    if not isinstance(entries, list):
+        return results
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        index = entry.get("index")
+        if not isinstance(index, int) or not 0 <= index < count or results[index] is not None:
+            continue
+        fields = {k: v for k, v in entry.items() if k != "index"}
+        parsed, errors = validate_intent(fields)
+        if not errors:
+            results[index] = parsed
+    return results
+
+
+class _Item:
+    __slots__ = ("text", "deadline", "future")
+
+    def __init__(self, text: str, deadline: Optional[float]):
+        self.text = text
+        self.deadline = deadline
+        self.future: Future = Future()
+
+
+class _Batch:
+    __slots__ = ("items", "closed")
+
+    def __init__(self):
+        self.items: List[_Item] = []
+        self.closed = False
+
+
+class MicroBatcher:
+    """按 (凭证, 模型, 温度) 分组的窗口批处理器：首个请求作为执行方，其余请求等待结果"""
+
+    def __init__(self, window_ms: float = 20.0, max_items: int = 8):
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_items = max(2, max_items)
+        self._open: Dict[Hashable, _Batch] = {}
+        self._cond = threading.Condition()
+        self._stats = {"batches": 0, "packed_items": 0, "single": 0, "item_failures": 0, "batch_failures": 0}
+
+    def submit(self, group: Hashable, client, text: str, deadline: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        加入当前窗口的批次并等待结果。
+        返回 None 表示需由调用方单独请求（窗口内仅此一条、整批失败、该条未通过校验或等待超时）。
+        """
+        item = _Item(text, deadline)
+        with self._cond:
+            batch = self._open.get(group)
+            leader = batch is None
+            if leader:
+                batch = self._open[group] = _Batch()
+            batch.items.append(item)
+            if len(batch.items) >= self.max_items:
+                self._close(group, batch)
+                self._cond.notify_all()
+
+        if leader:
+            with self._cond:
+                end = time.monotonic() + self.window
+                while not batch.closed and time.monotonic() < end:
+                    self._cond.wait(end - time.monotonic())
+                self._close(group, batch)
+            self._execute(client, batch.items)
+
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            return item.future.result(timeout)
+        except FutureTimeout:
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._stats)
+        stats["avg_batch_size"] = round(stats["packed_items"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
+
+    def _close(self, group: Hashable, batch: _Batch):
+        """关闭批次，之后到达的请求进入新批次（调用方持有锁）"""
+        batch.closed = True
+        if self._open.get(group) is batch:
+            del self._open[group]
+
+    def _execute(self, client, items: List[_Item]):
+        """发送打包请求并分发结果"""
+        if len(items) == 1:
+            with self._cond:
+                self._stats["single"] += 1
+            items[0].future.set_result(None)
+            return
+
+        deadlines = [i.deadline for i in items if i.deadline is not None]
+        try:
+            raw_text = client.send_with_policy(build_batch_prompt([i.text for i in items]),
+                                               deadline=min(deadlines) if deadlines else None)
+            results = split_batch_response(raw_text, len(items))
+            batch_failed = False
+        except Exception as e:
+            print(f"[⚠️ MicroBatcher] Packed call for {len(items)} items failed, retrying individually: {e}")
+            results = [None] * len(items)
+            batch_failed = True
+
+        BATCH_ITEMS.observe(len(items))
+        failures = sum(1 for r in results if r is None)
+        if failures:
+            BATCH_ITEM_RETRIES.inc(failures, reason="batch_failed" if batch_failed else "invalid_item")
+        with self._cond:
+            self._stats["batches"] += 1
+            self._stats["packed_items"] += len(items)
+            self._stats["batch_failures"] += batch_failed
+            self._stats["item_failures"] += failures
+        for item, result in zip(items, results):
+            item.future.set_result(result)
+
+
+# -------------------------
+# 🔧 全局默认实例（环境变量配置）
+# -------------------------
+def micro_batching_enabled() -> bool:
+    return os.environ.get("INTENT_MICRO_BATCH", "0") in ("1", "true", "True")
+
+
+_default_batcher: Optional[MicroBatcher] = None
+_default_lock = threading.Lock()
+
+
+def get_default_batcher() -> MicroBatcher:
+    """获取进程级共享批处理器"""
+    global _default_batcher
+    with _default_lock:
+        if _default_batcher is None:
+            _default_batcher = MicroBatcher(
+                window_ms=float(os.environ.get("INTENT_BATCH_WINDOW_MS", "20")),
+                max_items=int(os.environ.get("INTENT_BATCH_MAX_ITEMS", "8")),
+            )
+        return _default_batcher
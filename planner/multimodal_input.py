@@ -5,20 +5,118 @@
 # 🧩 模块功能：
 #   - 接收用户的文本 / 图像 / 音频多模态输入；
 #   - 自动检测并转换多种音频格式（mp3, wav, flac, m4a, ogg）；
-#   - 统一编码为 Base64，输出标准 JSON；
-#   - 可扩展至 video / sensor 等模态。
+#   - 图像按像素 / 体积预算压缩后再编码；
+#   - 媒体按内容摘要存入 output/media，重复上传复用预处理产物；
+#   - 输入日志经后台线程写入 output/logs/requests.jsonl；
+#   - 各模态解析计时（telemetry span），记录原始 / 编码后载荷大小；
+#   - numpy / PIL 仅在存在图像输入时才使用（延迟导入），纯文本请求冷启动更快；
+#   - 解析结果为紧凑的 MultiModalPayload（planner/payload.py）：媒体只保存内容摘要，
+#     Base64 在使用方读取时才生成；to_dict() 仍输出原标准 JSON 结构；
+#   - 各模态在共享线程池中并发解析，单个模态超时 / 失败时以无效结果降级，不拖住整个请求；
+#   - 模态解析器注册表（register_modality）：可扩展至 video / sensor 等模态，与内置模态并行解析。
+#
+# 环境变量：MODALITY_PARSE_WORKERS（线程数，默认 8）；
+#           MODALITY_PARSE_TIMEOUT_S（各模态超时秒数，默认 30，0 为不限），
+#           可按模态覆盖，如 AUDIO_PARSE_TIMEOUT_S / IMAGE_PARSE_TIMEOUT_S。
 # ==========================================
 
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, Mapping, Tuple
 from pathlib import Path
-import base64
-import json
-import os
-import numpy as np
-from PIL import Image
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeout
+from contextvars import copy_context
 import io
+import os
+import sys
+import threading
+import time
 from datetime import datetime
-from pydub import AudioSegment  # 🎧 用于多格式音频解析
+from planner.media_preprocess import (
+    preprocess_image, preprocess_audio_in_pool, image_variant, audio_variant,
+    DEFAULT_IMAGE_MAX_PIXELS, DEFAULT_IMAGE_MAX_BYTES,
+)
+from planner.media_store import get_media_store, hash_buffer
+from planner.payload import TextPayload, MediaPayload, MultiModalPayload
+from app.log_sink import log_event
+from app.telemetry import Histogram, span, traced, observe_payload, register_metric
+
+MODALITY_PARSE_SECONDS = Histogram("modality_parse_seconds", "Per-modality parse time by outcome.",
+                                   ["modality", "status"])
+register_metric(MODALITY_PARSE_SECONDS)
+
+# 共享模态解析线程池：超时的解析在后台自然结束，不阻塞调用方
+_PARSE_POOL = ThreadPoolExecutor(max_workers=int(os.environ.get("MODALITY_PARSE_WORKERS", "8")),
+                                 thread_name_prefix="modality-parse")
+
+
+def _default_timeout(name: str) -> Optional[float]:
+    raw = os.environ.get(f"{name.upper()}_PARSE_TIMEOUT_S") or os.environ.get("MODALITY_PARSE_TIMEOUT_S", "30")
+    return float(raw) if raw and float(raw) > 0 else None
+
+
+class ModalityParser:
+    """已注册的模态解析器"""
+
+    __slots__ = ("name", "parse", "fallback", "timeout", "builtin", "concurrent")
+
+    def __init__(self, name: str, parse: Callable[["MultiModalInput"], Mapping], fallback: Callable[[], Mapping],
+                 timeout: Optional[float], builtin: bool = False, concurrent: bool = True):
+        self.name = name
+        self.parse = parse
+        self.fallback = fallback
+        self.timeout = timeout
+        self.builtin = builtin
+        self.concurrent = concurrent
+
+
+class _ParseTask:
+    """一次并发解析任务的开始时间（在线程池中真正开始执行时记录）"""
+
+    __slots__ = ("started", "start")
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.start: Optional[float] = None
+
+    def begin(self):
+        self.start = time.monotonic()
+        self.started.set()
+
+    def elapsed(self) -> float:
+        return 0.0 if self.start is None else time.monotonic() - self.start
+
+
+# 模态解析器注册表：名称 → 解析器（按注册顺序解析并输出）
+MODALITY_PARSERS: Dict[str, ModalityParser] = {}
+
+
+def register_modality(name: str,
+                      parse: Callable[["MultiModalInput"], Mapping],
+                      fallback: Optional[Callable[[], Mapping]] = None,
+                      timeout: Optional[float] = None,
+                      concurrent: bool = True):
+    """
+    注册模态解析器。
+    parse 接收 MultiModalInput 实例（扩展模态的原始输入位于 instance.extra_inputs[name]），
+    返回 Mapping（建议含 "{name}_valid"，并提供 to_dict() 以控制日志 / 兼容输出）；
+    fallback 为超时 / 失败时的替代结果（默认 {"{name}_valid": False}）；
+    timeout 为秒数（None 读取环境变量配置，0 为不限）；concurrent=False 时在调用线程内直接解析。
+    扩展模态仅在请求提供了对应输入时解析。
+    """
+    if timeout is None:
+        timeout = _default_timeout(name)
+    MODALITY_PARSERS[name] = ModalityParser(
+        name, parse,
+        fallback or (lambda: {f"{name}_valid": False}),
+        timeout if timeout and timeout > 0 else None,
+        builtin=name in ("text", "image", "audio"),
+        concurrent=concurrent,
+    )
+
+
+def _is_ndarray(obj: Any) -> bool:
+    """判断是否为 numpy 数组（numpy 未被导入时不可能是数组，无需为此导入 numpy）"""
+    np = sys.modules.get("numpy")
+    return np is not None and isinstance(obj, np.ndarray)
 
 
 class MultiModalInput:
@@ -27,129 +125,233 @@ class MultiModalInput:
     def __init__(self,
                  text: Optional[str] = None,
                  image_input: Optional[Any] = None,
-                 audio_input: Optional[Any] = None):
+                 audio_input: Optional[Any] = None,
+                 image_max_pixels: int = DEFAULT_IMAGE_MAX_PIXELS,
+                 image_max_bytes: int = DEFAULT_IMAGE_MAX_BYTES,
+                 extra_inputs: Optional[Dict[str, Any]] = None):
         self.text = text.strip() if text else ""
         self.image_input = image_input
         self.audio_input = audio_input
+        self.extra_inputs = {k: v for k, v in (extra_inputs or {}).items() if v is not None}
+        self.image_max_pixels = image_max_pixels
+        self.image_max_bytes = image_max_bytes
 
     # -------------------------
     # 文本模态解析
     # -------------------------
-    def parse_text(self) -> Dict[str, Any]:
+    @traced("parse_text")
+    def parse_text(self) -> TextPayload:
         """文本输入解析"""
-        return {"text_valid": bool(self.text), "text_content": self.text or ""}
+        return TextPayload(self.text)
 
     # -------------------------
     # 图像模态解析
     # -------------------------
-    def parse_image(self) -> Dict[str, Any]:
-        """图像输入解析：支持路径 / dict / numpy 数组"""
+    @traced("parse_image")
+    def parse_image(self) -> MediaPayload:
+        """
+        图像输入解析：支持路径 / dict / numpy 数组。
+        按内容摘要复用已压缩的产物，编码前按预算压缩。
+        """
         try:
             # ✅ 只判断 None，不直接对 numpy 做布尔判断
             if self.image_input is None:
-                return {"image_valid": False, "image_base64": ""}
+                return MediaPayload.invalid("image")
+
+            from PIL import Image
+
+            store = get_media_store()
 
             # 1️⃣ Gradio dict 格式
             if isinstance(self.image_input, dict) and "data" in self.image_input:
                 img_data = self.image_input["data"]
-                if isinstance(img_data, np.ndarray):  # numpy数组
-                    img = Image.fromarray(img_data.astype("uint8"))
-                    buf = io.BytesIO()
-                    img.save(buf, format="PNG")
-                    encoded = base64.b64encode(buf.getvalue()).decode("utf-8")
+                if _is_ndarray(img_data):  # numpy数组
+                    import numpy as np
+                    source = np.ascontiguousarray(img_data.astype("uint8"))
+                    source_digest = hash_buffer(source)
+                    open_image = lambda: Image.fromarray(source)
+                    original_bytes = source.nbytes
                 elif isinstance(img_data, (bytes, bytearray)):
-                    encoded = base64.b64encode(img_data).decode("utf-8")
+                    source_digest = hash_buffer(img_data)
+                    open_image = lambda: Image.open(io.BytesIO(img_data))
+                    original_bytes = len(img_data)
                 else:
-                    return {"image_valid": False, "image_base64": ""}
+                    return MediaPayload.invalid("image")
                 name = self.image_input.get("name", "uploaded_image")
 
             # 2️⃣ numpy.ndarray 格式
-            elif isinstance(self.image_input, np.ndarray):
-                img = Image.fromarray(self.image_input.astype("uint8"))
-                buf = io.BytesIO()
-                img.save(buf, format="PNG")
-                encoded = base64.b64encode(buf.getvalue()).decode("utf-8")
-                name = "array_image.png"
-
-            # 3️⃣ 文件路径格式
+            elif _is_ndarray(self.image_input):
+                import numpy as np
+                source = np.ascontiguousarray(self.image_input.astype("uint8"))
+                source_digest = hash_buffer(source)
+                open_image = lambda: Image.fromarray(source)
+                original_bytes = source.nbytes
+                name = "array_image"
+
+            # 3️⃣ 文件路径格式（原始文件存入媒体库）
             elif isinstance(self.image_input, (str, Path)) and Path(self.image_input).exists():
-                with open(self.image_input, "rb") as f:
-                    encoded = base64.b64encode(f.read()).decode("utf-8")
+                source_digest = store.put_file(str(self.image_input))
+                source_path = store.path_for(source_digest)
+                open_image = lambda: Image.open(source_path)
+                original_bytes = source_path.stat().st_size
                 name = Path(self.image_input).name
 
             else:
-                return {"image_valid": False, "image_base64": ""}
+                return MediaPayload.invalid("image")
+
+            # 🗜️ 尺寸 / 体积预算压缩（丢弃元数据），同内容同参数直接复用
+            variant = image_variant(self.image_max_pixels, self.image_max_bytes)
+            derived = store.get_derived(source_digest, variant)
+            if derived is not None:
+                digest, info = derived
+            else:
+                data, info = preprocess_image(open_image(), original_bytes,
+                                              max_pixels=self.image_max_pixels,
+                                              max_bytes=self.image_max_bytes)
+                digest = store.put_derived(source_digest, variant, data, info)
 
-            print(f"[✅ ImageParse] Parsed: {name}")
-            return {
-                "image_valid": True,
-                "image_name": name,
-                "image_base64": encoded
-            }
+            print(f"[✅ ImageParse] Parsed: {name} "
+                  f"({info['image_original_bytes']} → {info['image_compressed_bytes']} bytes, {info['image_format']}"
+                  f"{', reused' if derived is not None else ''})")
+            return MediaPayload("image", digest, {"image_name": name, "image_source_digest": source_digest, **info})
 
         except Exception as e:
             print(f"[⚠️ ImageParse] Error: {e}")
-            return {"image_valid": False, "image_base64": ""}
+            return MediaPayload.invalid("image")
 
-    def parse_audio(self):
+    @traced("parse_audio")
+    def parse_audio(self) -> MediaPayload:
         """
-        ✅ 最简工程版音频解析：
+        ✅ 音频解析：
         - 支持 mp3 / wav / flac / m4a / ogg；
-        - Gradio 自动生成临时文件路径；
-        - 后端只需读取并 base64 编码；
-        - 不依赖 soundfile / pydub；
-        - 稳定且通用。
+        - Gradio 自动生成临时文件路径，原始文件按内容摘要存入媒体库；
+        - 在进程池中归一化（单声道 / 重采样 / 裁剪静音 / 限时长），Base64 按需生成；
+        - 同内容重复上传直接复用归一化产物；
+        - 归一化失败（如缺少 ffmpeg）时回退为原始文件。
         """
-        log_dir = Path("output/logs")
-        log_dir.mkdir(parents=True, exist_ok=True)
-        log_path = log_dir / "audio_parse.log"
-
         def log(msg):
             ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             print(f"[{ts}] {msg}")
-            with open(log_path, "a", encoding="utf-8") as f:
-                f.write(f"[{ts}] {msg}\n")
+            log_event("audio_parse", message=msg)
 
         # 检查文件有效性
         if not self.audio_input or not Path(self.audio_input).exists():
             log("❌ No valid audio file found.")
-            return {"audio_valid": False, "audio_base64": ""}
+            return MediaPayload.invalid("audio")
 
         try:
-            with open(self.audio_input, "rb") as f:
-                encoded = base64.b64encode(f.read()).decode("utf-8")
+            store = get_media_store()
+            source_digest = store.put_file(str(self.audio_input))
+            variant = audio_variant()
+            derived = store.get_derived(source_digest, variant)
+            if derived is not None:
+                digest, info = derived
+            else:
+                try:
+                    data, info = preprocess_audio_in_pool(
+                        str(store.path_for(source_digest)),
+                        source_format=Path(self.audio_input).suffix.lstrip(".").lower() or None,
+                    )
+                    info["audio_preprocessed"] = True
+                    digest = store.put_derived(source_digest, variant, data, info)
+                except Exception as e:
+                    log(f"⚠️ Audio preprocess skipped, using raw file: {e}")
+                    digest = source_digest
+                    size = store.size(digest)
+                    info = {"audio_preprocessed": False, "audio_original_bytes": size,
+                            "audio_compressed_bytes": size}
 
-            log(f"✅ Audio parsed successfully: {Path(self.audio_input).name}")
-            return {
-                "audio_valid": True,
-                "audio_name": Path(self.audio_input).name,
-                "audio_base64": encoded
-            }
+            log(f"✅ Audio parsed successfully: {Path(self.audio_input).name} "
+                f"({info['audio_original_bytes']} → {info['audio_compressed_bytes']} bytes"
+                f"{', reused' if derived is not None else ''})")
+            return MediaPayload("audio", digest, {"audio_name": Path(self.audio_input).name,
+                                                  "audio_source_digest": source_digest, **info})
 
         except Exception as e:
             log(f"⚠️ Audio parse failed: {e}")
-            return {"audio_valid": False, "audio_base64": ""}
-
-
-
-
+            return MediaPayload.invalid("audio")
 
     # -------------------------
     # 输出统一结构
     # -------------------------
-    def to_dict(self) -> Dict[str, Any]:
-        """输出标准化输入结构"""
-        parsed = {
-            "text": self.parse_text(),
-            "image": self.parse_image(),
-            "audio": self.parse_audio()
-        }
-        parsed["input_summary"] = self._summarize(parsed)
+    def to_payload(self) -> MultiModalPayload:
+        """输出标准化输入结构（紧凑表示，Base64 延迟生成）；各模态并发解析"""
+        results, timings = self._parse_modalities()
+        parsed = MultiModalPayload(results.pop("text"), results.pop("image"), results.pop("audio"),
+                                   extras=results, timings=timings)
+        parsed.input_summary = self._summarize(parsed)
+        self._record_payloads(parsed)
         self._log_input(parsed)
         return parsed
 
+    def _parse_modalities(self) -> Tuple[Dict[str, Mapping], Dict[str, Dict[str, Any]]]:
+        """
+        并发执行已注册的模态解析器，返回 (模态 → 结果, 模态 → {"seconds", "status"})。
+        超时从任务在线程池中真正开始执行时计（排队时间不计入，但排队本身同样以超时时间为上限）；
+        超时 / 失败的模态取消任务并使用 fallback 结果。
+        """
+        parsers = [p for p in MODALITY_PARSERS.values() if p.builtin or p.name in self.extra_inputs]
+        tasks = {p.name: _ParseTask() for p in parsers if p.concurrent}
+        futures = {name: _PARSE_POOL.submit(copy_context().run, self._timed_parse, MODALITY_PARSERS[name], task)
+                   for name, task in tasks.items()}
+
+        results: Dict[str, Mapping] = {}
+        timings: Dict[str, Dict[str, Any]] = {}
+        for parser in parsers:
+            task = tasks.get(parser.name)
+            try:
+                if task is not None:
+                    result, seconds = self._wait_parse(parser, task, futures[parser.name])
+                else:
+                    result, seconds = self._timed_parse(parser)
+                status = "ok"
+            except Exception as e:
+                # FutureTimeout 即内置 TimeoutError：仅等待超时（任务仍未结束）按超时处理，
+                # 解析器自身抛出的 TimeoutError 按失败处理
+                if isinstance(e, FutureTimeout) and task is not None and not futures[parser.name].done():
+                    futures[parser.name].cancel()
+                    status, seconds = "timeout", task.elapsed()
+                    print(f"[⚠️ ModalityParse] '{parser.name}' exceeded {parser.timeout}s, continuing without it")
+                else:
+                    status, seconds = "error", task.elapsed() if task is not None else 0.0
+                    print(f"[⚠️ ModalityParse] '{parser.name}' failed: {e}")
+                result = parser.fallback()
+            results[parser.name] = result
+            timings[parser.name] = {"seconds": round(seconds, 4), "status": status}
+            MODALITY_PARSE_SECONDS.observe(seconds, modality=parser.name, status=status)
+        return results, timings
+
     @staticmethod
-    def _summarize(parsed: Dict[str, Any]) -> str:
+    def _wait_parse(parser: ModalityParser, task: "_ParseTask", future: Future) -> Tuple[Mapping, float]:
+        """等待任务开始执行，再以开始时间为起点等待其超时时间"""
+        if parser.timeout is None:
+            return future.result()
+        if not task.started.wait(parser.timeout):
+            raise FutureTimeout()
+        remaining = max(0.0, task.start + parser.timeout - time.monotonic())
+        return future.result(remaining)
+
+    def _timed_parse(self, parser: ModalityParser, task: Optional["_ParseTask"] = None) -> Tuple[Mapping, float]:
+        start = time.perf_counter()
+        if task is not None:
+            task.begin()
+        result = parser.parse(self)
+        return result, time.perf_counter() - start
+
+    def to_dict(self) -> Dict[str, Any]:
+        """输出标准化输入结构（普通 dict，含完整 Base64，兼容旧调用方）"""
+        return self.to_payload().to_dict()
+
+    @staticmethod
+    def _record_payloads(parsed: MultiModalPayload):
+        """记录各模态原始 / 编码后大小，用于区分媒体编码与模型调用的耗时来源"""
+        observe_payload("text_chars", len(parsed.text.content))
+        for media in (parsed.image, parsed.audio):
+            observe_payload(f"{media.modality}_original_bytes", media.get(f"{media.modality}_original_bytes"))
+            observe_payload(f"{media.modality}_base64_chars", media.base64_chars)
+
+    @staticmethod
+    def _summarize(parsed: MultiModalPayload) -> str:
         """生成输入概览"""
         parts = []
         if parsed["text"]["text_valid"]:
@@ -158,14 +360,21 @@ class MultiModalInput:
             parts.append("Image ✓")
         if parsed["audio"]["audio_valid"]:
             parts.append("Audio ✓")
+        for name, value in parsed.extras.items():
+            if value.get(f"{name}_valid"):
+                parts.append(f"{name.capitalize()} ✓")
         return " | ".join(parts) if parts else "No valid input"
 
     @staticmethod
-    def _log_input(parsed: Dict[str, Any]):
-        """保存输入结构日志"""
-        os.makedirs("output/logs", exist_ok=True)
-        with open("output/logs/last_input.json", "w", encoding="utf-8") as f:
-            json.dump(parsed, f, ensure_ascii=False, indent=2)
+    def _log_input(parsed: MultiModalPayload):
+        """记录输入结构日志（Base64 字段替换为摘要与大小，不做编码，后台写入）"""
+        log_event("input_parsed", input=parsed.to_dict(materialize=False), parse_timings=parsed.timings)
+
+
+# 内置模态：文本解析为微秒级，直接在调用线程内完成（线程池拥塞时也不受影响）
+register_modality("text", MultiModalInput.parse_text, fallback=TextPayload, timeout=0, concurrent=False)
+register_modality("image", MultiModalInput.parse_image, fallback=lambda: MediaPayload.invalid("image"))
+register_modality("audio", MultiModalInput.parse_audio, fallback=lambda: MediaPayload.invalid("audio"))
 
 
 # -------------------------
@@ -174,12 +383,18 @@ class MultiModalInput:
 def parse_multimodal_input(
     text: Optional[str],
     image: Any,
-    audio: Any
-) -> Dict[str, Any]:
-    """兼容 Gradio 的统一输入解析函数"""
-    instance = MultiModalInput(
-        text=text,
-        image_input=image,
-        audio_input=audio
-    )
-    return instance.to_dict()
+    audio: Any,
+    **extra_inputs: Any
+) -> MultiModalPayload:
+    """
+    兼容 Gradio 的统一输入解析函数（返回只读 Mapping，按键访问与原 dict 一致）。
+    extra_inputs 为已注册扩展模态的原始输入（如 video=...）。
+    """
+    with span("parse_multimodal_input"):
+        instance = MultiModalInput(
+            text=text,
+            image_input=image,
+            audio_input=audio,
+            extra_inputs=extra_inputs
+        )
+        return instance.to_payload()
@@ -0,0 +1,217 @@
+# ==========================================
+# Module: Multimodal Payload
+# File: planner/payload.py
+# ==========================================
+# 🧩 模块功能：
+#   - 解析结果的紧凑表示（__slots__）：媒体只保存媒体库中的内容摘要与处理信息，
+#     不随请求携带 Base64 字符串；
+#   - Base64（或其他编码）仅在使用方真正读取时才生成（经媒体库 LRU 缓存）；
+#   - 实现只读 Mapping 接口，按键访问与原 dict 结构一致（如 image["image_valid"]），
+#     现有调用方无需修改；
+#   - to_dict() 输出与原先完全相同的嵌套 dict；to_dict(materialize=False)
+#     以 {"sha256", "bytes"} 代替 Base64，供日志使用且不触发编码。
+# ==========================================
+
+import base64
+import binascii
+from collections.abc import Mapping
+from typing import Dict, Any, Callable, Iterator, Optional
+
+from planner.media_store import get_media_store
+
+# 可选编码：名称 → bytes 编码函数（"base64" 走媒体库缓存，见 MediaPayload.encode）
+ENCODERS: Dict[str, Callable[[bytes], bytes]] = {
+    "base64": base64.b64encode,
+    "base64url": base64.urlsafe_b64encode,
+    "hex": binascii.hexlify,
+}
+
+
+class TextPayload(Mapping):
+    """文本模态：{"text_valid", "text_content"}"""
+
+    __slots__ = ("content",)
+    _KEYS = ("text_valid", "text_content")
+
+    def __init__(self, content: str = ""):
+        self.content = content or ""
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "text_valid":
+            return bool(self.content)
+        if key == "text_content":
+            return self.content
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._KEYS)
+
+    def __len__(self) -> int:
+        return len(self._KEYS)
+
+    def to_dict(self, materialize: bool = True) -> Dict[str, Any]:
+        return {"text_valid": bool(self.content), "text_content": self.content}
+
+    def __repr__(self) -> str:
+        return f"TextPayload({len(self.content)} chars)"
+
+
+class MediaPayload(Mapping):
+    """
+    图像 / 音频模态：引用媒体库中的对象（按摘要），附带名称与处理信息。
+    键与原 dict 一致：{m}_valid、{m}_digest、{m}_base64 及 fields 中的其余字段（m 为模态名）。
+    """
+
+    __slots__ = ("modality", "digest", "fields")
+
+    def __init__(self, modality: str, digest: Optional[str] = None, fields: Optional[Dict[str, Any]] = None):
+        self.modality = modality
+        self.digest = digest
+        self.fields = fields or {}
+
+    @classmethod
+    def invalid(cls, modality: str) -> "MediaPayload":
+        return cls(modality)
+
+    @property
+    def valid(self) -> bool:
+        return self.digest is not None
+
+    # -------------------------
+    # 按需编码
+    # -------------------------
+    def raw_bytes(self) -> bytes:
+        """读取媒体库中的原始字节"""
+        return get_media_store().read_bytes(self.digest) if self.valid else b""
+
+    def base64(self) -> str:
+        return self.encode("base64")
+
+    def encode(self, encoding: str = "base64") -> str:
+        """按需生成指定编码的字符串（无效模态为空串）"""
+        if not self.valid:
+            return ""
+        if encoding == "base64":
+            return get_media_store().get_base64(self.digest)
+        try:
+            encoder = ENCODERS[encoding]
+        except KeyError:
+            raise ValueError(f"Unsupported encoding '{encoding}', available: {sorted(ENCODERS)}") from None
+        return encoder(self.raw_bytes()).decode("ascii")
+
+    @property
+    def size(self) -> int:
+        """编码前字节数（优先使用处理信息，避免访问磁盘）"""
+        if not self.valid:
+            return 0
+        size = self.fields.get(f"{self.modality}_compressed_bytes")
+        return size if isinstance(size, int) else get_media_store().size(self.digest)
+
+    @property
+    def base64_chars(self) -> int:
+        """Base64 编码后长度（无需实际编码）"""
+        return 4 * ((self.size + 2) // 3)
+
+    # -------------------------
+    # Mapping 接口
+    # -------------------------
+    def __getitem__(self, key: str) -> Any:
+        m = self.modality
+        if key == f"{m}_valid":
+            return self.valid
+        if key == f"{m}_base64":
+            return self.base64()
+        if self.valid:
+            if key == f"{m}_digest":
+                return self.digest
+            if key in self.fields:
+                return self.fields[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        m = self.modality
+        yield f"{m}_valid"
+        if self.valid:
+            yield f"{m}_digest"
+            yield from self.fields
+        yield f"{m}_base64"
+
+    def __len__(self) -> int:
+        return 2 + (1 + len(self.fields) if self.valid else 0)
+
+    def __contains__(self, key: object) -> bool:
+        # Mapping 默认实现会调用 __getitem__，对 Base64 键会触发编码
+        m = self.modality
+        if key in (f"{m}_valid", f"{m}_base64"):
+            return True
+        return self.valid and (key == f"{m}_digest" or key in self.fields)
+
+    def to_dict(self, materialize: bool = True) -> Dict[str, Any]:
+        """
+        输出原 dict 结构。
+        materialize=False 时 Base64 字段替换为 {"sha256", "bytes"}（与 log_sink.redact_blobs 一致），不做编码。
+        """
+        m = self.modality
+        out: Dict[str, Any] = {f"{m}_valid": self.valid}
+        if self.valid:
+            out[f"{m}_digest"] = self.digest
+            out.update(self.fields)
+        if materialize:
+            out[f"{m}_base64"] = self.base64()
+        else:
+            out[f"{m}_base64"] = {"sha256": self.digest, "bytes": self.base64_chars} if self.valid else None
+        return out
+
+    def __repr__(self) -> str:
+        if not self.valid:
+            return f"MediaPayload({self.modality}, invalid)"
+        return f"MediaPayload({self.modality}, {self.digest[:12]}, {self.size} bytes)"
+
+
+class MultiModalPayload(Mapping):
+    """
+    一次请求的解析结果：{"text", "image", "audio", "input_summary"}，
+    以及经 register_modality 注册的扩展模态（extras，按名称作为键）。
+    timings 记录各模态解析耗时与状态，不参与 to_dict()。
+    """
+
+    __slots__ = ("text", "image", "audio", "input_summary", "extras", "timings")
+    _KEYS = ("text", "image", "audio", "input_summary")
+
+    def __init__(self, text: TextPayload, image: MediaPayload, audio: MediaPayload, input_summary: str = "",
+                 extras: Optional[Dict[str, Mapping]] = None, timings: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.text = text
+        self.image = image
+        self.audio = audio
+        self.input_summary = input_summary
+        self.extras = extras or {}
+        self.timings = timings or {}
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._KEYS:
+            return getattr(self, key)
+        return self.extras[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._KEYS[:3]
+        yield from self.extras
+        yield "input_summary"
+
+    def __len__(self) -> int:
+        return len(self._KEYS) + len(self.extras)
+
+    def to_dict(self, materialize: bool = True) -> Dict[str, Any]:
+        """输出与原 MultiModalInput.to_dict 相同的嵌套 dict（扩展模态附加在其后）"""
+        out = {
+            "text": self.text.to_dict(materialize),
+            "image": self.image.to_dict(materialize),
+            "audio": self.audio.to_dict(materialize),
+        }
+        for name, value in self.extras.items():
+            out[name] = value.to_dict(materialize) if hasattr(value, "to_dict") else dict(value)
+        out["input_summary"] = self.input_summary
+        return out
+
+    def __repr__(self) -> str:
+        extras = "".join(f", {name}={value!r}" for name, value in self.extras.items())
+        return f"MultiModalPayload({self.text!r}, {self.image!r}, {self.audio!r}{extras})"
@@ -0,0 +1,24 @@
+# ==========================================
+# Module: Test Configuration
+# File: test/conftest.py
+# ==========================================
+# 🧩 模块功能：
+#   - 将项目根目录加入 sys.path（可在任意目录运行 pytest）；
+#   - 日志 / 媒体库 / 可视化输出写入临时目录，不记录事件库；
+#   - 单元测试只覆盖无需网络 / API Key 的逻辑。
+# ==========================================
+
+import os
+import sys
+import tempfile
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+_TMP_DIR = tempfile.mkdtemp(prefix="emergency-tests-")
+for _name, _value in (("REQUEST_LOG_PATH", os.path.join(_TMP_DIR, "logs", "requests.jsonl")),
+                      ("MEDIA_STORE_DIR", os.path.join(_TMP_DIR, "media")),
+                      ("VISUAL_OUTPUT_DIR", os.path.join(_TMP_DIR, "visuals")),
+                      ("INCIDENT_DB_PATH", "")):
+    os.environ.setdefault(_name, _value)
@@ -0,0 +1,90 @@
+# ==========================================
+# Module: Admission Control Tests
+# File: test/test_admission.py
+# ==========================================
+# 🧩 测试范围：关键词严重度估计、按严重度放行顺序、critical 预留槽位、队满丢弃 / 挤出、排队超时延后。
+# ==========================================
+
+import pytest
+
+from app.admission import (
+    AdmissionController, AdmissionRejected, estimate_severity, CRITICAL, HIGH, NORMAL,
+)
+
+
+@pytest.mark.parametrize("text, level", [
+    ("Fire on the third floor, people trapped", CRITICAL),
+    ("化工厂发生泄漏", CRITICAL),
+    ("Heavy smoke, please evacuate", HIGH),
+    ("Firewall maintenance tonight", NORMAL),   # 英文按词边界匹配
+    ("", NORMAL),
+    (None, NORMAL),
+])
+def test_estimate_severity(text, level):
+    assert estimate_severity(text).level == level
+
+
+def test_severity_takes_highest_level():
+    severity = estimate_severity("Smoke and an explosion near the flood barrier")
+    assert severity.label == "critical"
+    assert severity.keywords == ["explosion"]
+
+
+def test_queue_admits_by_severity_then_arrival():
+    controller = AdmissionController(max_concurrency=1, max_queue=8, reserved_critical=0)
+    running = controller.submit(NORMAL)
+    assert running.state == "admitted"
+
+    normal, high_1, high_2, critical = (controller.submit(p) for p in (NORMAL, HIGH, HIGH, CRITICAL))
+    assert [controller.position(t) for t in (critical, high_1, high_2, normal)] == [1, 2, 3, 4]
+
+    order = []
+    holder = running
+    for _ in range(4):
+        controller.release(holder)
+        holder = next(t for t in (normal, high_1, high_2, critical) if t.state == "admitted")
+        order.append(holder)
+    assert order == [critical, high_1, high_2, normal]
+
+
+def test_reserved_slot_is_kept_for_critical():
+    controller = AdmissionController(max_concurrency=2, max_queue=8, reserved_critical=1)
+    first = controller.submit(NORMAL)
+    second = controller.submit(HIGH)
+    assert first.state == "admitted" and second.state == "waiting"
+    critical = controller.submit(CRITICAL)
+    assert critical.state == "admitted"
+    assert controller.stats()["active"] == 2
+
+
+def test_full_queue_sheds_lowest_priority():
+    controller = AdmissionController(max_concurrency=1, max_queue=1, reserved_critical=0)
+    controller.submit(CRITICAL)
+    queued = controller.submit(NORMAL)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.submit(NORMAL)
+    assert rejected.value.reason == "shed" and rejected.value.retry_after >= 1.0
+
+    urgent = controller.submit(HIGH)
+    assert controller.position(urgent) == 1
+    with pytest.raises(AdmissionRejected, match="displaced"):
+        controller.wait(queued, timeout=0)
+    assert controller.stats()["shed"] == 2
+
+
+def test_queue_timeout_defers():
+    controller = AdmissionController(max_concurrency=1, max_queue=8, reserved_critical=0,
+                                     queue_timeouts={CRITICAL: None, HIGH: None, NORMAL: 0.05})
+    holder = controller.submit(CRITICAL)
+    waiting = controller.submit(NORMAL)
+    assert controller.wait(waiting, timeout=0) is False
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.wait(waiting, timeout=1.0)
+    assert rejected.value.reason == "deferred"
+    assert controller.stats()["queued"]["normal"] == 0
+
+    controller.release(holder)
+    with controller.slot(HIGH) as ticket:
+        assert ticket.state == "admitted"
+    assert controller.stats()["active"] == 0
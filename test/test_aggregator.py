@@ -0,0 +1,74 @@
+# ==========================================
+# Module: Incremental Aggregator Tests
+# File: test/test_aggregator.py
+# ==========================================
+# 🧩 测试范围：可视化渲染按需开启、结果收集不阻塞，以及输出目录清理。
+# ==========================================
+
+import os
+import threading
+import time
+
+import pytest
+
+import aggregator.incremental_aggregator as agg
+
+
+@pytest.fixture
+def slow_renderer(monkeypatch, tmp_path):
+    """注册一个等待放行信号的渲染器，输出写入临时目录"""
+    release = threading.Event()
+
+    def render(data, out_path):
+        release.wait(5)
+        out_path.write_bytes(b"png")
+        return str(out_path)
+
+    monkeypatch.setattr(agg, "VISUAL_DIR", tmp_path)
+    monkeypatch.setitem(agg.RENDERERS, "slow", render)
+    yield release
+    release.set()
+
+
+def test_rendering_disabled_writes_nothing(slow_renderer, tmp_path):
+    aggregator = agg.IncrementalAggregator("r1", render_visuals=False)
+    aggregator.update("intent", {"explicit_intent": "x", "visuals": [{"kind": "slow", "data": {}}]})
+    assert aggregator.request_visual("slow", {}) is None
+    assert aggregator.visual_futures() == []
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_visual_outputs_does_not_block(slow_renderer):
+    aggregator = agg.IncrementalAggregator("r2")
+    future = aggregator.request_visual("slow", {})
+    start = time.monotonic()
+    assert aggregator.visual_outputs() == []
+    assert time.monotonic() - start < 0.1
+    assert len(aggregator.pending_visuals()) == 1
+
+    slow_renderer.set()
+    future.result(5)
+    assert aggregator.visual_outputs() == [future.result()]
+    assert aggregator.pending_visuals() == []
+
+
+def _write(path, size, age):
+    path.write_bytes(b"x" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+
+def test_prune_by_age_and_size(tmp_path):
+    _write(tmp_path / "expired.png", 10, age=1000)
+    _write(tmp_path / "oldest.png", 40, age=30)
+    _write(tmp_path / "older.png", 40, age=20)
+    _write(tmp_path / "newest.png", 40, age=10)
+
+    removed = agg.prune_visuals(tmp_path, max_bytes=100, max_age=500)
+    assert removed == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["newest.png", "older.png"]
+
+
+def test_prune_unlimited_keeps_everything(tmp_path):
+    _write(tmp_path / "a.png", 10, age=10 ** 6)
+    assert agg.prune_visuals(tmp_path, max_bytes=0, max_age=0) == 0
@@ -0,0 +1,75 @@
+# ==========================================
+# Module: Batch Runner Tests
+# File: test/test_batch_runner.py
+# ==========================================
+# 🧩 测试范围：结果按输入顺序写出；中途中断后按检查点续跑（截断残留输出、从输入偏移继续），
+#   输出不重复、不丢行。
+# ==========================================
+
+import json
+import random
+import time
+
+import pytest
+
+import app.batch_runner as batch_runner
+from app.batch_runner import BatchRunner
+
+
+class _Crash(BaseException):
+    """模拟进程中断（不被单条执行的异常处理捕获）"""
+
+
+def _write_input(path, count):
+    lines = [json.dumps({"request_id": f"r{i}", "text": f"report {i}"}) for i in range(count)]
+    lines.insert(5, "{not json")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def _fake_pipeline(crash_on=None):
+    def run(text, image, audio, api_key=None):
+        if text == crash_on:
+            raise _Crash()
+        time.sleep(random.uniform(0, 0.01))  # 完成顺序与输入顺序不同
+        return {"echo": text}
+    return run
+
+
+def _read_output(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_resume_after_interruption(tmp_path, monkeypatch):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_input(source, 20)
+
+    monkeypatch.setattr(batch_runner, "run_full_pipeline", _fake_pipeline(crash_on="report 12"))
+    with pytest.raises(_Crash):
+        BatchRunner(str(source), str(output), concurrency=3).run()
+    done = _read_output(output)
+    assert 0 < len(done) < 21
+
+    # 中断时写了一半的行（检查点之后的残留）在续跑时被截断
+    with open(output, "ab") as f:
+        f.write(b'{"request_id": "torn')
+
+    monkeypatch.setattr(batch_runner, "run_full_pipeline", _fake_pipeline())
+    state = BatchRunner(str(source), str(output), concurrency=3).run()
+
+    rows = _read_output(output)
+    assert state["records"] == len(rows) == 21
+    ids = [row.get("request_id") for row in rows]
+    assert ids == [f"r{i}" for i in range(5)] + [None] + [f"r{i}" for i in range(5, 20)]
+    assert rows[5]["status"] == "error" and rows[5]["error"].startswith("Invalid JSON")
+    assert all(row["result"] == {"echo": f"report {row['request_id'][1:]}"} for row in rows if row.get("request_id"))
+
+
+def test_no_resume_starts_over(tmp_path, monkeypatch):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_input(source, 4)
+    monkeypatch.setattr(batch_runner, "run_full_pipeline", _fake_pipeline())
+    BatchRunner(str(source), str(output), concurrency=2).run()
+    assert BatchRunner(str(source), str(output)).run()["records"] == 5  # 检查点已到末尾：无新记录
+    assert len(_read_output(output)) == 5
+    assert BatchRunner(str(source), str(output)).run(resume=False)["records"] == 5
+    assert len(_read_output(output)) == 5
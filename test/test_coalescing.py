@@ -0,0 +1,78 @@
+# ==========================================
+# Module: Request Coalescing Tests
+# File: test/test_coalescing.py
+# ==========================================
+# 🧩 测试范围：singleflight 共享、近重复聚类、凭证隔离、失败不复用。
+# ==========================================
+
+import threading
+import time
+
+import pytest
+
+from app.llm_service.coalescing import Coalescer
+
+FIRE = "Fire detected in east building, smoke on third floor"
+FIRE_REWORDED = "Fire detected in the east building, smoke on the third floor"
+FLOOD = "River flooding near the north bridge, cars stranded"
+
+
+def test_singleflight_shares_one_call():
+    coalescer = Coalescer(window_seconds=0)
+    flight, leader, _ = coalescer.begin("k")
+    assert leader
+
+    results = []
+
+    def member():
+        other, is_leader, info = coalescer.begin("k")
+        assert not is_leader and info["match"] == "exact"
+        results.append(other.wait(5))
+
+    threads = [threading.Thread(target=member) for _ in range(3)]
+    for t in threads:
+        t.start()
+    while coalescer.stats()["exact"] < 3:
+        time.sleep(0.01)
+    coalescer.finish(flight, {"intent": "fire"})
+    for t in threads:
+        t.join(5)
+    assert results == [{"intent": "fire"}] * 3
+    assert coalescer.stats()["in_flight"] == 0
+
+
+def test_near_duplicates_join_cluster():
+    coalescer = Coalescer(window_seconds=30, min_similarity=0.5)
+    flight, leader, info = coalescer.begin("k1", text=FIRE)
+    assert leader and info["cluster_reports"] == 1
+    coalescer.finish(flight, {"intent": "fire"})
+
+    shared, leader, info = coalescer.begin("k2", text=FIRE_REWORDED)
+    assert not leader and info["match"] == "near"
+    assert shared.wait(1) == {"intent": "fire"}
+
+    _, leader, _ = coalescer.begin("k3", text=FLOOD)
+    assert leader
+
+
+def test_credentials_are_not_shared():
+    coalescer = Coalescer(window_seconds=30, min_similarity=0.5)
+    flight, leader, _ = coalescer.begin("k", text=FIRE, credential="cred-a")
+    assert leader
+    _, leader, _ = coalescer.begin("k", text=FIRE, credential="cred-b")
+    assert leader
+    _, leader, _ = coalescer.begin("k", text=FIRE, credential="cred-a")
+    assert not leader
+    coalescer.finish(flight, {"intent": "fire"})
+
+
+def test_failures_are_not_reused():
+    coalescer = Coalescer(window_seconds=30, min_similarity=0.5)
+    flight, _, _ = coalescer.begin("k", text=FIRE)
+    waiter, leader, _ = coalescer.begin("k", text=FIRE)
+    assert not leader
+    coalescer.finish(flight, error=TimeoutError("upstream"))
+    with pytest.raises(TimeoutError):
+        waiter.wait(1)
+    _, leader, _ = coalescer.begin("k", text=FIRE)
+    assert leader
@@ -0,0 +1,99 @@
+# ==========================================
+# Module: DAG Scheduler Tests
+# File: test/test_dag_scheduler.py
+# ==========================================
+# 🧩 测试范围：图校验、上游输出传递、独立阶段并发、超时 / 失败跳过下游、取消（线程池与 asyncio 后端）。
+# ==========================================
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from executor import DAGScheduler, Stage, STATUS_OK, STATUS_ERROR, STATUS_TIMEOUT, STATUS_SKIPPED, STATUS_CANCELLED
+
+
+def _sleep(seconds, value=None):
+    def fn(inputs):
+        time.sleep(seconds)
+        return value
+    return fn
+
+
+def test_graph_validation():
+    with pytest.raises(ValueError, match="unknown"):
+        DAGScheduler([Stage("a", _sleep(0), deps=("missing",))])
+    with pytest.raises(ValueError, match="cycle"):
+        DAGScheduler([Stage("a", _sleep(0), deps=("b",)), Stage("b", _sleep(0), deps=("a",))])
+    with pytest.raises(ValueError, match="Duplicate"):
+        DAGScheduler([Stage("a", _sleep(0)), Stage("a", _sleep(0))])
+
+
+def test_outputs_flow_downstream():
+    dag = DAGScheduler([
+        Stage("parse", lambda inputs: inputs["input"] * 2),
+        Stage("intent", lambda inputs: inputs["parse"] + 1, deps=("parse",)),
+    ])
+    completed = []
+    results = dag.run(10, on_stage_complete=lambda name, result: completed.append(name))
+    assert results["intent"] == {"status": STATUS_OK, "output": 21, "error": "", "seconds": results["intent"]["seconds"]}
+    assert completed == ["parse", "intent"]
+
+
+def test_independent_stages_run_concurrently():
+    dag = DAGScheduler([Stage(f"agent{i}", _sleep(0.2, i)) for i in range(3)])
+    start = time.monotonic()
+    results = dag.run()
+    assert time.monotonic() - start < 0.5
+    assert [results[f"agent{i}"]["output"] for i in range(3)] == [0, 1, 2]
+
+
+def _failing(inputs):
+    raise RuntimeError("boom")
+
+
+def test_failure_and_timeout_skip_downstream():
+    dag = DAGScheduler([
+        Stage("bad", _failing),
+        Stage("after_bad", _sleep(0), deps=("bad",)),
+        Stage("slow", _sleep(1.0), timeout=0.1),
+        Stage("after_slow", _sleep(0), deps=("slow",)),
+        Stage("good", _sleep(0, "ok")),
+    ])
+    start = time.monotonic()
+    results = dag.run()
+    assert time.monotonic() - start < 0.8
+    assert results["bad"]["status"] == STATUS_ERROR and results["bad"]["error"] == "boom"
+    assert results["slow"]["status"] == STATUS_TIMEOUT
+    assert results["after_bad"]["status"] == STATUS_SKIPPED
+    assert results["after_slow"]["status"] == STATUS_SKIPPED
+    assert results["good"]["output"] == "ok"
+
+
+def test_cancel():
+    dag = DAGScheduler([Stage("slow", _sleep(1.0)), Stage("next", _sleep(0), deps=("slow",))])
+    threading.Timer(0.05, dag.cancel).start()
+    start = time.monotonic()
+    results = dag.run()
+    assert time.monotonic() - start < 0.8
+    assert results["slow"]["status"] == STATUS_CANCELLED
+    assert results["next"]["status"] == STATUS_CANCELLED
+
+
+def test_async_backend():
+    async def risk(inputs):
+        await asyncio.sleep(0.01)
+        return inputs["intent"] + "!"
+
+    async def slow(inputs):
+        await asyncio.sleep(1.0)
+
+    dag = DAGScheduler([
+        Stage("intent", lambda inputs: "fire"),
+        Stage("risk", risk, deps=("intent",)),
+        Stage("slow", slow, timeout=0.05),
+    ])
+    results = asyncio.run(dag.run_async())
+    assert results["risk"]["output"] == "fire!"
+    assert results["slow"]["status"] == STATUS_TIMEOUT
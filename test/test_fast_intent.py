@@ -0,0 +1,57 @@
+# ==========================================
+# Module: Fast Intent Classifier Tests
+# File: test/test_fast_intent.py
+# ==========================================
+# 🧩 测试范围：规则分类的类别 / 字段 / 置信度，以及需要升级到 LLM 的情形。
+# ==========================================
+
+import pytest
+
+from planner.fast_intent import classify_intent
+
+FIELDS = {"explicit_intent", "implicit_intent", "environment_context", "intent_confidence"}
+
+
+@pytest.mark.parametrize("text, category", [
+    ("Fire detected in east building, smoke on the third floor", "fire"),
+    ("River flooding near the north bridge", "flood"),
+    ("Toxic chemical spill at the plant", "chemical_leak"),
+    ("Strong smell of gas in the kitchen", "gas_leak"),
+    ("化工厂发生危化品泄漏，请疏散周边居民", "chemical_leak"),
+    ("Man unconscious and not breathing", "medical"),
+])
+def test_categories(text, category):
+    result = classify_intent(text)
+    assert result["category"] == category
+    assert FIELDS <= set(result)
+
+
+def test_confident_report():
+    result = classify_intent("Fire and heavy smoke at Building 5, evacuate now, people trapped")
+    assert result["intent_confidence"] >= 0.75
+    assert "Building 5" in result["explicit_intent"]
+    assert result["explicit_intent"].startswith("Plan evacuation")
+    assert "trapped" in result["environment_context"]
+
+
+def test_unknown_text():
+    result = classify_intent("Hello, how are you?")
+    assert result["category"] == "unknown"
+    assert result["intent_confidence"] == 0.0
+    assert classify_intent(None)["category"] == "unknown"
+
+
+@pytest.mark.parametrize("text", [
+    "Fire alarm drill at Building 5, evacuate",          # 演习
+    "False alarm, no fire in the east wing",             # 误报
+])
+def test_negations_defer_to_llm(text):
+    assert classify_intent(text)["intent_confidence"] <= 0.3
+
+
+def test_mixed_hazards_and_media_lower_confidence():
+    single = classify_intent("Fire at Building 5, evacuate")["intent_confidence"]
+    mixed = classify_intent("Fire and toxic chemical spill at Building 5, evacuate")["intent_confidence"]
+    with_media = classify_intent("Fire at Building 5, evacuate", has_media=True)["intent_confidence"]
+    assert mixed < single
+    assert with_media < single
@@ -0,0 +1,48 @@
+# ==========================================
+# Module: Incident Store Tests
+# File: test/test_incident_store.py
+# ==========================================
+# 🧩 测试范围：批量写入后的条件查询、文本子串匹配（LIKE 通配符按字面处理）。
+# ==========================================
+
+import pytest
+
+from app.incident_store import IncidentStore
+
+
+def _record(store, rid, text, category="fire", confidence=0.9):
+    store.record(rid, {"text": {"text_content": text}, "input_summary": "Text ✓"},
+                 {"category": category, "explicit_intent": "respond", "intent_confidence": confidence})
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = IncidentStore(str(tmp_path / "incidents.db"), flush_interval=0.01)
+    _record(store, "r1", "50% of the building evacuated")
+    _record(store, "r2", "500 people near gate_3")
+    _record(store, "r3", "path C:\\plant\\tank leaking", category="chemical_leak", confidence=0.4)
+    assert store.flush()
+    yield store
+    store.close()
+
+
+def _ids(rows):
+    return sorted(row["request_id"] for row in rows)
+
+
+def test_filters(store):
+    assert _ids(store.query(category="chemical_leak")) == ["r3"]
+    assert _ids(store.query(min_confidence=0.5)) == ["r1", "r2"]
+    assert store.get("r3")["summary"]["category"] == "chemical_leak"
+    assert store.count_by_category() == {"fire": 2, "chemical_leak": 1}
+
+
+@pytest.mark.parametrize("needle, expected", [
+    ("50%", ["r1"]),          # 未转义时 "50%" 也会匹配 "500"
+    ("gate_3", ["r2"]),
+    ("_", ["r2"]),            # 未转义时 "_" 匹配任意字符
+    ("C:\\plant", ["r3"]),
+    ("%", ["r1"]),
+])
+def test_text_contains_is_literal(store, needle, expected):
+    assert _ids(store.query(text_contains=needle)) == expected
@@ -0,0 +1,69 @@
+# ==========================================
+# Module: LLM JSON Extraction Tests
+# File: test/test_json_extract.py
+# ==========================================
+# 🧩 测试范围：从模型输出中提取 JSON 对象（整段 / 夹杂文本 / 流式分段）与意图 Schema 校验。
+# ==========================================
+
+import pytest
+
+from app.llm_service.json_extract import (
+    IncrementalJSONExtractor, extract_json_object, parse_json_response, parse_intent_response, validate_intent,
+)
+
+INTENT = ('{"explicit_intent": "evacuate {east} wing", "implicit_intent": "say \\"stop\\"", '
+          '"environment_context": "smoke", "intent_confidence": 0.8}')
+
+
+def test_direct_object():
+    obj, extracted = extract_json_object(f"  {INTENT}\n")
+    assert not extracted
+    assert obj["explicit_intent"] == "evacuate {east} wing"
+
+
+@pytest.mark.parametrize("text", [
+    f"Sure! Here is the result:\n```json\n{INTENT}\n```",
+    f"{{not json}} then {INTENT} and trailing {{",
+])
+def test_object_inside_text(text):
+    obj, extracted = extract_json_object(text)
+    assert extracted
+    assert obj["implicit_intent"] == 'say "stop"'
+
+
+def test_invalid_response():
+    assert parse_json_response("no json here") == {"error": "Invalid JSON response"}
+    assert parse_intent_response("{unterminated") == {"error": "Invalid JSON response"}
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64])
+def test_streaming_chunks_match_whole_text(size):
+    text = f"prefix {{ broken }} {INTENT} suffix"
+    extractor = IncrementalJSONExtractor()
+    results = [extractor.feed(text[i:i + size]) for i in range(0, len(text), size)]
+    assert extractor.result == extract_json_object(text)[0]
+    # 对象结束的那一段即返回结果，之后的片段不再处理
+    first = next(i for i, r in enumerate(results) if r is not None)
+    assert (first + 1) * size >= text.index(" suffix") > first * size
+
+
+def test_escaped_quote_split_across_chunks():
+    extractor = IncrementalJSONExtractor()
+    for chunk in ['{"a": "x\\', '"}', '"', ' , "b": 1}']:
+        extractor.feed(chunk)
+    assert extractor.result == {"a": 'x"}', "b": 1}
+
+
+def test_schema_normalisation():
+    result, errors = validate_intent({"explicit_intent": "rescue", "implicit_intent": ["a", "b"],
+                                      "intent_confidence": "85%"})
+    assert result["intent_confidence"] == pytest.approx(0.85)
+    assert result["implicit_intent"] == '["a", "b"]'
+    assert result["environment_context"] == "unknown"
+    assert errors == ["environment_context: missing"]
+
+
+def test_schema_errors_are_reported():
+    parsed = parse_intent_response('{"explicit_intent": "x", "intent_confidence": "high"}')
+    assert parsed["intent_confidence"] == 0.0
+    assert any(e.startswith("intent_confidence") for e in parsed["schema_errors"])
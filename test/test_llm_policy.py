@@ -0,0 +1,183 @@
+# ==========================================
+# Module: LLM Call Policy Tests
+# File: test/test_llm_policy.py
+# ==========================================
+# 🧩 测试范围：send_with_policy 的重试分类（仅重试暂时性错误）与截止时间；
+#   stream_with_policy 的首段前重试 / 对冲与首段后的截止时间；
+#   异步客户端（原生协程 / 线程适配）的同一策略。
+# ==========================================
+
+import asyncio
+import time
+
+import pytest
+
+from app.llm_service.base_client import (
+    AsyncBaseLLMClient, BaseLLMClient, DeadlineExceeded, ThreadedAsyncClient, is_transient_error,
+)
+
+
+class _ScriptedClient(BaseLLMClient):
+    """按预设序列返回结果或抛出异常的客户端"""
+
+    def __init__(self, script):
+        super().__init__()
+        self.script = list(script)
+        self.calls = 0
+
+    def send_request(self, prompt: str) -> str:
+        self.calls += 1
+        step = self.script.pop(0)
+        if isinstance(step, BaseException):
+            raise step
+        if callable(step):
+            return step()
+        return step
+
+
+class _HttpError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.http_status = status
+
+
+@pytest.mark.parametrize("error, transient", [
+    (TimeoutError(), True),
+    (ConnectionResetError(), True),
+    (_HttpError(503), True),
+    (_HttpError(429), True),
+    (_HttpError(401), False),
+    (_HttpError(400), False),
+    (ValueError("bad"), False),
+    (DeadlineExceeded("late"), False),
+])
+def test_is_transient_error(error, transient):
+    assert is_transient_error(error) is transient
+
+
+def test_transient_errors_are_retried():
+    client = _ScriptedClient([_HttpError(502), TimeoutError(), "ok"])
+    assert client.send_with_policy("p", max_retries=2, backoff_base=0.0, hedge_after=None) == "ok"
+    assert client.calls == 3
+
+
+def test_non_transient_error_fails_immediately():
+    client = _ScriptedClient([_HttpError(401), "ok"])
+    with pytest.raises(_HttpError):
+        client.send_with_policy("p", max_retries=2, backoff_base=0.0, hedge_after=None)
+    assert client.calls == 1
+
+
+def test_deadline_exceeded():
+    client = _ScriptedClient([lambda: time.sleep(0.5) or "late"])
+    with pytest.raises(DeadlineExceeded):
+        client.send_with_policy("p", deadline=time.monotonic() + 0.05, hedge_after=None)
+
+
+class _StreamingClient(BaseLLMClient):
+    """
+    每次流式调用取一段脚本：片段列表，元素为字符串（输出）、数字（停顿秒数）或异常（抛出）。
+    """
+
+    def __init__(self, script):
+        super().__init__()
+        self.script = list(script)
+        self.calls = 0
+
+    def send_request(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    def stream_request(self, prompt: str):
+        self.calls += 1
+        for step in self.script.pop(0):
+            if isinstance(step, BaseException):
+                raise step
+            if isinstance(step, (int, float)):
+                time.sleep(step)
+            else:
+                yield step
+
+
+def test_stream_retries_before_first_chunk():
+    client = _StreamingClient([[_HttpError(503)], ["a", "b"]])
+    chunks = list(client.stream_with_policy("p", max_retries=1, backoff_base=0.0, hedge_after=None))
+    assert chunks == ["a", "b"]
+    assert client.calls == 2
+
+
+def test_stream_non_transient_error_fails_immediately():
+    client = _StreamingClient([[_HttpError(401)], ["a"]])
+    with pytest.raises(_HttpError):
+        list(client.stream_with_policy("p", max_retries=2, backoff_base=0.0, hedge_after=None))
+    assert client.calls == 1
+
+
+def test_stream_hedges_slow_first_chunk():
+    client = _StreamingClient([[1.0, "slow"], ["fast"]])
+    start = time.monotonic()
+    chunks = list(client.stream_with_policy("p", hedge_after=0.05))
+    assert chunks == ["fast"]
+    assert time.monotonic() - start < 0.5
+    assert client.calls == 2
+
+
+def test_stream_deadline_after_first_chunk():
+    client = _StreamingClient([["a", 0.5, "b"]])
+    stream = client.stream_with_policy("p", deadline=time.monotonic() + 0.1, hedge_after=None)
+    assert next(stream) == "a"
+    with pytest.raises(DeadlineExceeded):
+        next(stream)
+
+
+class _AsyncScriptedClient(AsyncBaseLLMClient):
+    """异步版本：元素为字符串（返回）、(秒数, 字符串)（延迟后返回）或异常（抛出）"""
+
+    def __init__(self, script):
+        super().__init__()
+        self.script = list(script)
+        self.calls = 0
+
+    async def send_request(self, prompt: str) -> str:
+        self.calls += 1
+        step = self.script.pop(0)
+        if isinstance(step, BaseException):
+            raise step
+        if isinstance(step, tuple):
+            await asyncio.sleep(step[0])
+            return step[1]
+        return step
+
+
+def test_async_transient_errors_are_retried():
+    client = _AsyncScriptedClient([TimeoutError(), _HttpError(503), "ok"])
+    assert asyncio.run(client.send_with_policy("p", max_retries=2, backoff_base=0.0, hedge_after=None)) == "ok"
+    assert client.calls == 3
+
+
+def test_async_non_transient_error_fails_immediately():
+    client = _AsyncScriptedClient([_HttpError(400), "ok"])
+    with pytest.raises(_HttpError):
+        asyncio.run(client.send_with_policy("p", max_retries=2, backoff_base=0.0, hedge_after=None))
+    assert client.calls == 1
+
+
+def test_async_hedge_and_deadline():
+    client = _AsyncScriptedClient([(1.0, "slow"), (0.01, "fast")])
+    start = time.monotonic()
+    assert asyncio.run(client.send_with_policy("p", hedge_after=0.05)) == "fast"
+    assert time.monotonic() - start < 0.5
+
+    client = _AsyncScriptedClient([(1.0, "late")])
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(client.send_with_policy("p", deadline=time.monotonic() + 0.05, hedge_after=None))
+
+
+def test_threaded_client_stops_retrying_at_deadline():
+    sync_client = _ScriptedClient([TimeoutError()] * 50)
+    client = ThreadedAsyncClient(sync_client)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(client.send_with_policy("p", deadline=time.monotonic() + 0.2, max_retries=50,
+                                            backoff_base=0.05, backoff_max=0.05, hedge_after=None))
+    calls = sync_client.calls
+    time.sleep(0.2)
+    assert sync_client.calls == calls
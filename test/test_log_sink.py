@@ -0,0 +1,46 @@
+# ==========================================
+# Module: Request ID Binding Tests
+# File: test/test_log_sink.py
+# ==========================================
+# 🧩 测试范围：bind_request_id 在生成器每次于新上下文中恢复时保持同一请求 ID。
+# ==========================================
+
+from contextvars import copy_context, Context
+
+from app.log_sink import bind_request_id, get_request_id
+
+
+def _ids():
+    for _ in range(3):
+        yield get_request_id()
+
+
+def test_request_id_survives_fresh_contexts():
+    stream = bind_request_id("abc123", _ids())
+    # 模拟 Gradio / anyio：每次 next() 都在全新的上下文中执行
+    seen = [Context().run(next, stream) for _ in range(3)]
+    assert seen == ["abc123"] * 3
+
+
+def test_caller_context_is_restored():
+    def run():
+        stream = bind_request_id("inner", _ids())
+        next(stream)
+        return get_request_id()
+
+    assert copy_context().run(run) == ""
+
+
+def test_close_runs_with_request_id():
+    closed = []
+
+    def gen():
+        try:
+            yield 1
+        finally:
+            closed.append(get_request_id())
+
+    stream = bind_request_id("rid", gen())
+    next(stream)
+    Context().run(stream.close)
+    assert closed == ["rid"]
@@ -0,0 +1,44 @@
+# ==========================================
+# Module: Media Preprocessing Tests
+# File: test/test_media_preprocess.py
+# ==========================================
+# 🧩 测试范围：音频进程池损坏（子进程崩溃）后自动重建并继续归一化。
+# ==========================================
+
+import math
+import os
+import struct
+import wave
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import planner.media_preprocess as mp
+
+
+def _write_wav(path, seconds=0.5, rate=22050):
+    frames = b"".join(struct.pack("<h", int(12000 * math.sin(2 * math.pi * 440 * i / rate)))
+                      for i in range(int(rate * seconds)))
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(frames)
+
+
+def test_broken_audio_pool_is_replaced(tmp_path, monkeypatch):
+    pytest.importorskip("pydub")
+    monkeypatch.setenv("AUDIO_WORKERS", "1")
+    audio = tmp_path / "report.wav"
+    _write_wav(audio)
+
+    broken = mp.get_audio_pool()
+    with pytest.raises(BrokenProcessPool):
+        broken.submit(os._exit, 1).result(timeout=30)
+
+    try:
+        data, info = mp.preprocess_audio_in_pool(str(audio), export_format="wav", sample_rate=8000)
+        assert data[:4] == b"RIFF" and info["audio_rate"] == 8000
+        assert mp.get_audio_pool() is not broken
+    finally:
+        mp._discard_audio_pool(mp.get_audio_pool())
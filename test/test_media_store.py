@@ -0,0 +1,58 @@
+# ==========================================
+# Module: Media Store Tests
+# File: test/test_media_store.py
+# ==========================================
+# 🧩 测试范围：内容寻址去重、Base64 缓存，以及按最近使用时间的容量淘汰。
+# ==========================================
+
+import base64
+import os
+import time
+
+from planner.media_store import MediaStore
+
+
+def _age(store, digest, seconds):
+    path = store.path_for(digest)
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_put_is_content_addressed(tmp_path):
+    store = MediaStore(str(tmp_path))
+    digest = store.put_bytes(b"abc")
+    assert store.put_bytes(b"abc") == digest
+    assert store.read_bytes(digest) == b"abc"
+    assert store.get_base64(digest) == base64.b64encode(b"abc").decode()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    store = MediaStore(str(tmp_path), max_bytes=250, min_age=0)
+    old = store.put_bytes(b"a" * 100)
+    used = store.put_bytes(b"b" * 100)
+    _age(store, old, 30)
+    _age(store, used, 20)
+    store.read_bytes(used)  # 最近使用，保留
+
+    new = store.put_bytes(b"c" * 100)
+    assert not store.has(old)
+    assert store.has(used) and store.has(new)
+    assert store.stats()["evicted"] == 1
+
+
+def test_recently_used_objects_are_kept(tmp_path):
+    store = MediaStore(str(tmp_path), max_bytes=150, min_age=600)
+    first = store.put_bytes(b"a" * 100)
+    second = store.put_bytes(b"b" * 100)
+    assert store.has(first) and store.has(second)
+
+
+def test_eviction_drops_derived_mapping(tmp_path):
+    store = MediaStore(str(tmp_path), max_bytes=250, min_age=0)
+    source = store.put_bytes(b"s" * 100)
+    store.put_derived(source, "small", b"d" * 10, {"w": 1})
+    _age(store, source, 60)
+    store.put_bytes(b"x" * 100)
+    store.put_bytes(b"y" * 100)
+    assert not store.has(source)
+    assert store.get_derived(source, "small") is None
@@ -0,0 +1,111 @@
+# ==========================================
+# Module: Intent Micro-Batcher Tests
+# File: test/test_micro_batcher.py
+# ==========================================
+# 🧩 测试范围：批量结果按 index 拆分（缺失 / 重复 / 校验失败为 None）、单条直通、
+#   整批失败交由调用方单独重试、按凭证分组打包。
+# ==========================================
+
+import json
+import re
+import threading
+
+from planner.micro_batcher import MicroBatcher, build_batch_prompt, split_batch_response
+
+
+def _entry(index, intent="evacuate", **extra):
+    return {"index": index, "explicit_intent": intent, "implicit_intent": "safety",
+            "environment_context": "smoke", "intent_confidence": 0.8, **extra}
+
+
+class _BatchClient:
+    """按 Prompt 中的报告数组逐条回显结果的客户端"""
+
+    def __init__(self, api_key, error=None):
+        self.api_key = api_key
+        self.error = error
+        self.prompts = []
+
+    def send_with_policy(self, prompt, deadline=None):
+        self.prompts.append(prompt)
+        if self.error is not None:
+            raise self.error
+        reports = json.loads(re.search(r"\[Reports\]: (.*)", prompt).group(1))
+        return json.dumps({"results": [_entry(i, intent=text) for i, text in enumerate(reports)]})
+
+
+def _submit_all(batcher, requests):
+    """并发提交 (分组, 客户端, 文本)，按提交顺序返回结果"""
+    results = [None] * len(requests)
+
+    def run(i, group, client, text):
+        results[i] = batcher.submit(group, client, text)
+
+    threads = [threading.Thread(target=run, args=(i, *req)) for i, req in enumerate(requests)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    return results
+
+
+def test_split_by_index():
+    raw = json.dumps({"results": [
+        _entry(2, "third"),
+        _entry(0, "first"),
+        _entry(0, "duplicate"),                     # 重复 index：保留首个
+        _entry(5, "out of range"),
+        {"index": "1", "explicit_intent": "bad"},   # index 非整数
+        _entry(3, intent_confidence="high"),        # 置信度不合法
+        "not an object",
+    ]})
+    results = split_batch_response(raw, 4)
+    assert [r and r["explicit_intent"] for r in results] == ["first", None, "third", None]
+
+
+def test_split_unparseable_response():
+    assert split_batch_response("sorry, cannot help", 3) == [None, None, None]
+    assert split_batch_response('{"results": {"index": 0}}', 1) == [None]
+
+
+def test_batch_prompt_lists_reports_in_order():
+    prompt = build_batch_prompt(["fire \"east\"", "洪水"])
+    assert 'exactly 2 entries' in prompt
+    assert '[Reports]: ["fire \\"east\\"", "洪水"]' in prompt
+
+
+def test_single_item_passes_through():
+    batcher = MicroBatcher(window_ms=5)
+    client = _BatchClient("key")
+    assert batcher.submit("g", client, "fire") is None
+    assert client.prompts == []
+    assert batcher.stats()["single"] == 1
+
+
+def test_concurrent_items_are_packed_and_split():
+    batcher = MicroBatcher(window_ms=200, max_items=3)
+    client = _BatchClient("key")
+    results = _submit_all(batcher, [("g", client, f"report {i}") for i in range(3)])
+    assert len(client.prompts) == 1
+    assert sorted(r["explicit_intent"] for r in results) == ["report 0", "report 1", "report 2"]
+    assert batcher.stats()["avg_batch_size"] == 3.0
+
+
+def test_failed_packed_call_returns_none_for_all():
+    batcher = MicroBatcher(window_ms=200, max_items=2)
+    client = _BatchClient("key", error=TimeoutError("upstream"))
+    assert _submit_all(batcher, [("g", client, "a"), ("g", client, "b")]) == [None, None]
+    stats = batcher.stats()
+    assert stats["batch_failures"] == 1 and stats["item_failures"] == 2
+
+
+def test_groups_are_batched_separately_by_credential():
+    batcher = MicroBatcher(window_ms=300, max_items=2)
+    alice, bob = _BatchClient("alice"), _BatchClient("bob")
+    results = _submit_all(batcher, [(("OpenAIClient", "alice"), alice, "alice 1"),
+                                    (("OpenAIClient", "bob"), bob, "bob 1"),
+                                    (("OpenAIClient", "alice"), alice, "alice 2"),
+                                    (("OpenAIClient", "bob"), bob, "bob 2")])
+    assert [r["explicit_intent"] for r in results] == ["alice 1", "bob 1", "alice 2", "bob 2"]
+    assert len(alice.prompts) == len(bob.prompts) == 1
+    assert "bob" not in alice.prompts[0] and "alice" not in bob.prompts[0]
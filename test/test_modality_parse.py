@@ -0,0 +1,56 @@
+# ==========================================
+# Module: Modality Parse Tests
+# File: test/test_modality_parse.py
+# ==========================================
+# 🧩 测试范围：扩展模态的并发解析、超时计时（从任务开始执行时计）与 fallback。
+# ==========================================
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import planner.multimodal_input as mmi
+
+
+def _sleeper(seconds):
+    def parse(instance):
+        time.sleep(seconds)
+        return {"ok": True}
+    return parse
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(mmi, "MODALITY_PARSERS", dict(mmi.MODALITY_PARSERS))
+    return mmi.MODALITY_PARSERS
+
+
+def test_slow_modality_falls_back(registry):
+    mmi.register_modality("slow", _sleeper(0.5), timeout=0.1)
+    payload = mmi.parse_multimodal_input("hello", None, None, slow=object())
+    assert dict(payload["slow"]) == {"slow_valid": False}
+    assert payload.timings["slow"]["status"] == "timeout"
+
+
+def test_queue_time_does_not_count_against_timeout(registry, monkeypatch):
+    # 单线程池：第二个任务须排队等待第一个完成，排队时间不应计入其超时
+    monkeypatch.setattr(mmi, "_PARSE_POOL", ThreadPoolExecutor(max_workers=1))
+    mmi.register_modality("first", _sleeper(0.15), timeout=0.3)
+    mmi.register_modality("second", _sleeper(0.15), timeout=0.3)
+    payload = mmi.parse_multimodal_input("hello", None, None, first=1, second=2)
+    assert payload.timings["first"]["status"] == "ok"
+    assert payload.timings["second"]["status"] == "ok"
+    assert dict(payload["second"]) == {"ok": True}
+
+
+def _raise_timeout(instance):
+    raise TimeoutError("upstream OCR timed out")
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_parser_timeout_error_is_a_failure(registry, concurrent):
+    mmi.register_modality("ocr", _raise_timeout, timeout=1.0, concurrent=concurrent)
+    payload = mmi.parse_multimodal_input("hello", None, None, ocr=object())
+    assert dict(payload["ocr"]) == {"ocr_valid": False}
+    assert payload.timings["ocr"]["status"] == "error"
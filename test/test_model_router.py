@@ -0,0 +1,114 @@
+# ==========================================
+# Module: Model Router Tests
+# File: test/test_model_router.py
+# ==========================================
+# 🧩 测试范围：后端排序（无样本优先 / p50 升序 / 冷却靠后）、降级冷却与恢复、
+#   同步 / 流式故障切换、全部失败时保留原始异常（上层按暂时性错误重试）。
+# ==========================================
+
+import time
+
+import pytest
+
+from app.llm_service.base_client import BaseLLMClient
+from app.llm_service.model_router import ModelRouter, RoutedLLMClient
+
+
+class _Backend(BaseLLMClient):
+    """按预设序列返回结果或抛出异常的后端"""
+
+    def __init__(self, *script):
+        super().__init__()
+        self.script = list(script)
+        self.calls = 0
+
+    def _step(self):
+        self.calls += 1
+        step = self.script.pop(0) if len(self.script) > 1 else self.script[0]
+        if isinstance(step, BaseException):
+            raise step
+        return step
+
+    def send_request(self, prompt: str) -> str:
+        return self._step()
+
+    def stream_request(self, prompt: str):
+        for part in self._step():
+            if isinstance(part, BaseException):
+                raise part
+            yield part
+
+
+def _client(router, **backends):
+    client = RoutedLLMClient(router=router)
+    client._clients.update(backends)
+    return client
+
+
+def test_ranking_prefers_unprobed_then_fastest():
+    router = ModelRouter(backends=["a", "b", "c"])
+    router.record("a", 0.5, ok=True)
+    router.record("b", 0.1, ok=True)
+    assert router.ranked() == ["c", "b", "a"]
+
+
+def test_degraded_backend_cools_down_then_recovers():
+    router = ModelRouter(backends=["a", "b"], max_consecutive_failures=2, cooldown_seconds=0.1)
+    router.record("a", 0.1, ok=True)
+    router.record("b", 0.2, ok=True)
+    router.record("a", 0.1, ok=False)
+    assert router.ranked() == ["a", "b"]
+    router.record("a", 0.1, ok=False)
+    assert router.ranked() == ["b", "a"]
+    assert not router.snapshot()["a"]["healthy"]
+    time.sleep(0.15)
+    assert router.ranked()[0] == "a"  # 冷却结束后窗口已清空，优先重新探测
+
+
+def test_send_fails_over_in_rank_order():
+    router = ModelRouter(backends=["primary", "secondary"])
+    router.record("primary", 0.1, ok=True)
+    router.record("secondary", 0.5, ok=True)
+    primary, secondary = _Backend(ConnectionError("down")), _Backend("ok")
+    client = _client(router, primary=primary, secondary=secondary)
+    assert client.send_request("p") == "ok"
+    assert (primary.calls, secondary.calls) == (1, 1)
+    assert router.snapshot()["primary"]["error_rate"] == 0.5
+
+
+def test_all_backends_failing_keeps_transient_error_for_retry():
+    router = ModelRouter(backends=["a", "b"], max_consecutive_failures=10)
+    a = _Backend(TimeoutError("a slow"), "recovered")
+    b = _Backend(ConnectionError("b down"), ConnectionError("b down"))
+    client = _client(router, a=a, b=b)
+
+    with pytest.raises(ConnectionError) as raised:
+        client.send_request("p")
+    assert str(raised.value) == "b down"
+
+    a.script.insert(0, TimeoutError("a slow"))
+    assert client.send_with_policy("p", max_retries=1, backoff_base=0.0, hedge_after=None) == "recovered"
+
+
+def test_non_transient_failure_is_not_retried():
+    router = ModelRouter(backends=["a"], max_consecutive_failures=10)
+    a = _Backend(ValueError("bad request"))
+    client = _client(router, a=a)
+    with pytest.raises(ValueError):
+        client.send_with_policy("p", max_retries=3, backoff_base=0.0, hedge_after=None)
+    assert a.calls == 1
+
+
+def test_stream_fails_over_only_before_first_chunk():
+    router = ModelRouter(backends=["a", "b"])
+    router.record("a", 0.1, ok=True)
+    router.record("b", 0.5, ok=True)
+    client = _client(router, a=_Backend([TimeoutError("no first chunk")]), b=_Backend(["he", "llo"]))
+    assert "".join(client.stream_request("p")) == "hello"
+
+    broken = _client(ModelRouter(backends=["a", "b"]),
+                     a=_Backend(["he", ConnectionError("cut")]), b=_Backend(["unused"]))
+    stream = broken.stream_request("p")
+    assert next(stream) == "he"
+    with pytest.raises(ConnectionError):
+        next(stream)
@@ -0,0 +1,70 @@
+# ==========================================
+# Module: Multimodal Payload Tests
+# File: test/test_payload.py
+# ==========================================
+# 🧩 测试范围：紧凑 payload 与 to_dict() 输出一致（Mapping 访问 / 完整 Base64 / 日志脱敏形式）。
+# ==========================================
+
+import base64
+import os
+
+import pytest
+
+from app.log_sink import redact_blobs
+from planner.multimodal_input import MultiModalInput
+from planner.payload import MediaPayload, TextPayload
+
+IMAGE_PATH = os.path.join(os.path.dirname(__file__), "example1", "image1.png")
+
+
+def _plain(mapping):
+    """按 Mapping 接口递归展开为普通 dict（与旧调用方的访问方式一致）"""
+    return {k: _plain(v) if hasattr(v, "keys") and not isinstance(v, dict) else v for k, v in mapping.items()}
+
+
+@pytest.fixture(scope="module")
+def payload():
+    return MultiModalInput(text="  Fire at Building 5  ", image_input=IMAGE_PATH).to_payload()
+
+
+def test_to_dict_matches_mapping_view(payload):
+    full = payload.to_dict()
+    assert _plain(payload) == full
+    assert list(full) == ["text", "image", "audio", "input_summary"]
+    assert full["text"] == {"text_valid": True, "text_content": "Fire at Building 5"}
+    assert full["input_summary"] == "Text ✓ | Image ✓"
+    assert full["audio"] == {"audio_valid": False, "audio_base64": ""}
+
+
+def test_base64_round_trips_to_stored_bytes(payload):
+    image = payload["image"]
+    encoded = image["image_base64"]
+    assert base64.b64decode(encoded) == image.raw_bytes()
+    assert len(encoded) == image.base64_chars
+    assert image.encode("hex") == image.raw_bytes().hex()
+    with pytest.raises(ValueError):
+        image.encode("rot13")
+
+
+def test_unmaterialized_dict_matches_redacted_log(payload):
+    assert payload.to_dict(materialize=False) == redact_blobs(payload.to_dict())
+
+
+def test_legacy_to_dict_matches_payload():
+    source = MultiModalInput(text="Smoke on floor 3", image_input=IMAGE_PATH)
+    assert source.to_dict() == source.to_payload().to_dict()
+
+
+def test_membership_does_not_encode(monkeypatch):
+    image = MediaPayload("image", digest="0" * 64, fields={"image_name": "x.png"})
+    monkeypatch.setattr(MediaPayload, "base64", lambda self: pytest.fail("encoded on membership test"))
+    assert "image_base64" in image and "image_name" in image
+    assert "audio_base64" not in image
+    assert len(image) == len(list(image)) == 4
+
+
+def test_invalid_media_and_empty_text():
+    invalid = MediaPayload.invalid("audio")
+    assert dict(invalid) == invalid.to_dict() == {"audio_valid": False, "audio_base64": ""}
+    assert invalid.to_dict(materialize=False)["audio_base64"] is None
+    assert dict(TextPayload(None)) == {"text_valid": False, "text_content": ""}
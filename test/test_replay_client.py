@@ -0,0 +1,106 @@
+# ==========================================
+# Module: Record / Replay Client Tests
+# File: test/test_replay_client.py
+# ==========================================
+# 🧩 测试范围：cassette 写入与重新载入、Prompt 空白归一化命中、replay / record / auto 模式、流式回放分段。
+# ==========================================
+
+import pytest
+
+from app.llm_service.base_client import BaseLLMClient
+from app.llm_service.replay_client import (
+    Cassette, CassetteMiss, ReplayLLMClient, normalize_prompt, prompt_key,
+)
+
+RESPONSE = '{"explicit_intent": "evacuate", "intent_confidence": 0.9}' * 2
+
+
+class _Upstream(BaseLLMClient):
+    """记录调用次数的上游客户端"""
+
+    def __init__(self, response=RESPONSE):
+        super().__init__()
+        self.response = response
+        self.calls = 0
+
+    def send_request(self, prompt: str) -> str:
+        self.calls += 1
+        return self.response
+
+    def stream_request(self, prompt: str):
+        self.calls += 1
+        yield from (self.response[:10], self.response[10:])
+
+
+def _client(tmp_path, mode, upstream=None):
+    client = ReplayLLMClient(cassette=str(tmp_path / "llm.jsonl"), mode=mode, upstream="mock")
+    client._upstream = upstream
+    return client
+
+
+def test_normalize_prompt():
+    assert normalize_prompt("  Report:\n\t fire   at\n  Building 5 ") == "Report: fire at Building 5"
+    assert prompt_key("m", 0.3, "a  b") == prompt_key("m", 0.3, "a\nb")
+    assert prompt_key("m", 0.3, "a b") != prompt_key("m", 0.7, "a b")
+
+
+def test_cassette_round_trip(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    cassette = Cassette(str(path))
+    cassette.put("k1", "first", 0.12345)
+    cassette.put("k2", "第二条", 0.5)
+    cassette.put("k1", "updated", 0.2)
+    path.write_text(path.read_text(encoding="utf-8") + "not json\n\n", encoding="utf-8")
+
+    reloaded = Cassette(str(path))
+    assert len(reloaded) == 2
+    assert reloaded.get("k1") == ("updated", 0.2)
+    assert reloaded.get("k2") == ("第二条", 0.5)
+    assert reloaded.get("missing") is None
+
+
+def test_auto_records_then_replays(tmp_path):
+    upstream = _Upstream()
+    client = _client(tmp_path, "auto", upstream)
+    assert client.send_request("Fire at\n  Building 5") == RESPONSE
+    assert client.send_request("Fire at Building 5") == RESPONSE
+    assert upstream.calls == 1
+
+    # 重新载入后纯回放，不需要上游
+    replay = ReplayLLMClient(cassette=str(tmp_path / "llm.jsonl"), mode="replay", upstream="mock")
+    replay.cassette = Cassette(str(tmp_path / "llm.jsonl"))
+    assert replay.send_request("Fire at Building 5") == RESPONSE
+    assert replay._upstream is None
+
+
+def test_replay_miss_raises(tmp_path):
+    client = _client(tmp_path, "replay")
+    with pytest.raises(CassetteMiss):
+        client.send_request("never recorded")
+    with pytest.raises(CassetteMiss):
+        next(client.stream_request("never recorded"))
+
+
+def test_record_mode_always_calls_upstream(tmp_path):
+    upstream = _Upstream()
+    client = _client(tmp_path, "record", upstream)
+    client.send_request("p")
+    client.send_request("p")
+    assert upstream.calls == 2
+    assert client.stats()["recordings"] == 1
+
+
+def test_stream_records_and_replays_in_chunks(tmp_path):
+    upstream = _Upstream()
+    client = _client(tmp_path, "auto", upstream)
+    assert list(client.stream_request("stream prompt")) == [RESPONSE[:10], RESPONSE[10:]]
+
+    chunks = list(client.stream_request("stream  prompt"))
+    assert upstream.calls == 1
+    assert "".join(chunks) == RESPONSE
+    assert len(chunks) > 2 and all(len(c) <= 32 for c in chunks)
+
+
+def test_invalid_mode(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported replay mode"):
+        _client(tmp_path, "fast-forward")
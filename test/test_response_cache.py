@@ -0,0 +1,82 @@
+# ==========================================
+# Module: Response Cache Tests
+# File: test/test_response_cache.py
+# ==========================================
+# 🧩 测试范围：内存层 LRU / TTL、磁盘层命中与清理、缓存键的凭证隔离。
+# ==========================================
+
+import os
+import time
+
+from app.llm_service.response_cache import ResponseCache, make_cache_key, credential_scope
+
+
+def test_hit_returns_copy():
+    cache = ResponseCache()
+    cache.set("k", {"intent": ["a"]})
+    first = cache.get("k")
+    first["intent"].append("b")
+    assert cache.get("k") == {"intent": ["a"]}
+    assert cache.stats()["hits"] == 2
+
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    cache.get("a")  # a 变为最近使用
+    cache.set("c", {"v": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+    assert cache.get("c") == {"v": 3}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry():
+    cache = ResponseCache(ttl_seconds=0.05)
+    cache.set("k", {"v": 1})
+    time.sleep(0.1)
+    assert cache.get("k") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    ResponseCache(disk_dir=str(tmp_path)).set("k", {"v": 1}, cost_seconds=0.5)
+    cache = ResponseCache(disk_dir=str(tmp_path))
+    assert cache.get("k") == {"v": 1}
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_disk_sweep_bounds_entries(tmp_path):
+    cache = ResponseCache(disk_dir=str(tmp_path), max_disk_entries=3, sweep_interval=3600)
+    for i in range(5):
+        cache.set(f"k{i}", {"v": i})
+        path = tmp_path / f"k{i}.json"
+        os.utime(path, (time.time() - 10 + i, time.time() - 10 + i))
+    cache.sweep_disk()
+    assert sorted(p.stem for p in tmp_path.glob("*.json")) == ["k2", "k3", "k4"]
+
+
+def test_disk_sweep_removes_expired(tmp_path):
+    cache = ResponseCache(ttl_seconds=60, disk_dir=str(tmp_path), sweep_interval=3600)
+    cache.set("old", {"v": 1})
+    cache.set("new", {"v": 2})
+    os.utime(tmp_path / "old.json", (time.time() - 120, time.time() - 120))
+    assert cache.sweep_disk() == 1
+    assert [p.stem for p in tmp_path.glob("*.json")] == ["new"]
+
+
+def test_put_triggers_sweep(tmp_path):
+    cache = ResponseCache(disk_dir=str(tmp_path), max_disk_entries=10, sweep_interval=3600)
+    for i in range(25):
+        cache.set(f"k{i}", {"v": i})
+    assert len(list(tmp_path.glob("*.json"))) <= 10
+
+
+def test_cache_key_includes_credential():
+    key_a = make_cache_key("gpt-4o", 0.3, "prompt", "media", credential_scope("sk-a"))
+    key_b = make_cache_key("gpt-4o", 0.3, "prompt", "media", credential_scope("sk-b"))
+    key_base = make_cache_key("gpt-4o", 0.3, "prompt", "media", credential_scope("sk-a", "http://other/v1"))
+    assert len({key_a, key_b, key_base}) == 3
+    assert key_a == make_cache_key("gpt-4o", 0.3, "prompt", "media", credential_scope("sk-a"))
+    assert "sk-a" not in credential_scope("sk-a")
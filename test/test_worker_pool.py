@@ -0,0 +1,60 @@
+# ==========================================
+# Module: Pipeline Worker Pool Tests
+# File: test/test_worker_pool.py
+# ==========================================
+# 🧩 测试范围：工作进程（守护进程）内的音频归一化不依赖嵌套进程池。
+# ==========================================
+
+import math
+import struct
+import sys
+import wave
+
+import pytest
+
+from app.worker_pool import WorkerPool
+from planner.media_preprocess import audio_variant
+from planner.media_store import get_media_store
+
+
+def _write_wav(path, seconds=1.0, rate=44100):
+    """写入双声道正弦波，首尾各带 0.2 秒静音"""
+    silence = [0] * int(rate * 0.2)
+    tone = [int(12000 * math.sin(2 * math.pi * 440 * i / rate)) for i in range(int(rate * seconds))]
+    frames = b"".join(struct.pack("<hh", v, v) for v in silence + tone + silence)
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(frames)
+
+
+def test_audio_is_normalized_inside_worker(tmp_path, monkeypatch):
+    pytest.importorskip("pydub")
+    monkeypatch.setenv("AUDIO_EXPORT_FORMAT", "wav")  # wav 编解码无需 ffmpeg
+    monkeypatch.setenv("AUDIO_WORKERS", "2")
+    audio = tmp_path / "report.wav"
+    _write_wav(audio)
+
+    # 与 gradio_app 启动时相同：spawn 在工作进程入口之前重新导入主模块，媒体预处理模块已被加载
+    main = tmp_path / "main_entry.py"
+    main.write_text("import planner.media_preprocess\n", encoding="utf-8")
+    monkeypatch.setattr(sys.modules["__main__"], "__spec__", None, raising=False)
+    monkeypatch.setattr(sys.modules["__main__"], "__file__", str(main), raising=False)
+
+    pool = WorkerPool(workers=1, job_timeout=60).start()
+    try:
+        assert pool.wait_ready(timeout=60)
+        events = pool.stream(text="Fire at Building 5", audio=str(audio))
+        first = next(events)
+        events.close()  # 只需解析阶段
+    finally:
+        pool.shutdown()
+
+    assert first["stage"] == "input_parsed" and "Audio ✓" in first["input_summary"]
+    store = get_media_store()
+    derived = store.get_derived(store.put_file(str(audio)), audio_variant(export_format="wav"))
+    assert derived is not None, "audio fell back to the raw file in the worker"
+    _, info = derived
+    assert info["audio_preprocessed"] and info["audio_original_channels"] == 2
+    assert info["audio_seconds"] < info["audio_original_seconds"]